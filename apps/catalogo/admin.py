@@ -1,8 +1,16 @@
-from django.contrib import admin
+from django.conf import settings
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.db.models import Count, Q
+from django.shortcuts import redirect, render
 from django.utils.html import format_html
-from django.urls import reverse
+from django.urls import path, reverse
 from django.utils.safestring import mark_safe
-from .models import Categoria, Producto, Comentario
+from core.autocompletar import AutocompletarMixin
+from core.exportar import ExportarMixin
+from . import importar, reajustes
+from .forms import ReajustePreciosForm
+from .models import AjustePrecios, Categoria, Producto, Comentario
 
 # Register your models here.
 
@@ -40,10 +48,14 @@ class CategoriaAdmin(admin.ModelAdmin):
     )
     
     def get_queryset(self, request):
-        return super().get_queryset(request).prefetch_related('productos')
+        return super().get_queryset(request).annotate(
+            num_productos_activos=Count('productos', filter=Q(productos__activo=True))
+        )
     
     def productos_activos(self, obj):
-        count = obj.productos_activos
+        count = getattr(obj, 'num_productos_activos', None)
+        if count is None:
+            count = obj.productos_activos
         if count > 0:
             return format_html(
                 '<span style="color: green; font-weight: bold;">{}</span>',
@@ -54,6 +66,7 @@ class CategoriaAdmin(admin.ModelAdmin):
             count
         )
     productos_activos.short_description = 'Productos Activos'
+    productos_activos.admin_order_field = 'num_productos_activos'
     
     def imagen_preview(self, obj):
         if obj.imagen:
@@ -66,14 +79,21 @@ class CategoriaAdmin(admin.ModelAdmin):
 
 
 @admin.register(Producto)
-class ProductoAdmin(admin.ModelAdmin):
+class ProductoAdmin(ExportarMixin, AutocompletarMixin, admin.ModelAdmin):
     list_display = ('nombre', 'categoria', 'precio_formateado', 'moneda_precio', 'stock', 'stock_status', 'activo', 'destacado', 'created_at')
-    list_filter = ('activo', 'destacado', 'categoria', 'moneda_precio', 'created_at')
+    list_filter = ('activo', 'destacado', 'categoria', 'moneda_precio', 'indexado_usd', 'created_at')
     search_fields = ('nombre', 'descripcion', 'categoria__nombre')
+    # Widgets de autocompletar: prefijo de nombre/slug, productos activos primero
+    autocomplete_search_fields = ('^nombre', '^slug')
+    autocomplete_ordering = ('-activo', 'nombre', 'pk')
+    autocomplete_fields = ('categoria',)
+    list_select_related = ('categoria',)
+    exportacion = 'productos'
     list_editable = ('activo', 'destacado', 'stock')
     prepopulated_fields = {'slug': ('nombre',)}
     readonly_fields = ('created_at', 'updated_at', 'imagen_preview', 'precio_formateado', 'precios_multiple_monedas')
     filter_horizontal = ()
+    change_list_template = 'admin/catalogo/producto/change_list.html'
     
     fieldsets = (
         ('Información Básica', {
@@ -82,6 +102,10 @@ class ProductoAdmin(admin.ModelAdmin):
         ('Precio y Stock', {
             'fields': ('precio', 'moneda_precio', 'precio_formateado', 'precios_multiple_monedas', 'stock', 'stock_minimo')
         }),
+        ('Indexación al USD', {
+            'fields': ('indexado_usd', 'precio_referencia_usd'),
+            'description': 'El precio en bolívares se recalcula desde el precio en USD cada vez que se publican tasas nuevas.',
+        }),
         ('Imagen', {
             'fields': ('imagen', 'imagen_preview')
         }),
@@ -96,6 +120,91 @@ class ProductoAdmin(admin.ModelAdmin):
     
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('categoria')
+
+    def get_urls(self):
+        urls = super().get_urls()
+        custom = [
+            path('importar/', self.admin_site.admin_view(self.importar_view), name='catalogo_producto_importar'),
+            path('reajustar/', self.admin_site.admin_view(self.reajustar_view), name='catalogo_producto_reajustar'),
+        ]
+        return custom + urls
+
+    def importar_view(self, request):
+        """Sube un CSV/XLSX y crea o actualiza productos por slug (ver catalogo.importar)."""
+        if not (self.has_add_permission(request) and self.has_change_permission(request)):
+            raise PermissionDenied
+        informe = None
+        if request.method == 'POST':
+            archivo = request.FILES.get('archivo')
+            if not archivo:
+                messages.error(request, 'Selecciona un archivo CSV o XLSX.')
+                return redirect(request.path)
+            try:
+                informe = importar.importar(
+                    archivo.file, archivo.name, dir_imagenes=settings.IMPORTACION_IMAGENES_DIR or None,
+                )
+            except importar.ErrorImportacion as exc:
+                messages.error(request, str(exc))
+                return redirect(request.path)
+            nivel = messages.WARNING if informe.errores else messages.SUCCESS
+            self.message_user(
+                request,
+                f'{informe.creados} productos creados, {informe.actualizados} actualizados, '
+                f'{len(informe.errores)} filas con error ({informe.segundos} s).',
+                nivel,
+            )
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Importar productos',
+            'opts': self.model._meta,
+            'informe': informe,
+            'errores': informe.errores[:500] if informe else [],
+            'dir_imagenes': settings.IMPORTACION_IMAGENES_DIR,
+            'xlsx_disponible': importar.load_workbook is not None,
+        }
+        return render(request, 'admin/catalogo/producto/importar.html', context)
+
+    def reajustar_view(self, request):
+        """Reajuste masivo de precios con vista previa (ver catalogo.reajustes)."""
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+        previa = None
+        if request.method == 'POST':
+            form = ReajustePreciosForm(request.POST)
+            if form.is_valid():
+                if 'aplicar' in request.POST:
+                    try:
+                        ajuste = reajustes.aplicar(
+                            form.filtros(), **form.parametros(), usuario=request.user,
+                            descripcion=form.cleaned_data['descripcion'],
+                        )
+                    except reajustes.ErrorReajuste as exc:
+                        messages.error(request, str(exc))
+                    else:
+                        self.message_user(request, f'{ajuste}: {ajuste.productos} productos actualizados.', messages.SUCCESS)
+                        return redirect('admin:catalogo_ajusteprecios_change', ajuste.pk)
+                try:
+                    previa = reajustes.vista_previa(form.filtros(), **form.parametros())
+                except reajustes.ErrorReajuste as exc:
+                    # Al aplicar, el mismo error ya se informó arriba
+                    if 'aplicar' not in request.POST:
+                        messages.error(request, str(exc))
+        else:
+            # Desde el changelist: los filtros activos preseleccionan los productos
+            form = ReajustePreciosForm(initial={
+                'categoria': request.GET.get('categoria__id__exact'),
+                'moneda_precio': request.GET.get('moneda_precio__exact', ''),
+                'q': request.GET.get('q', ''),
+                'solo_activos': request.GET.get('activo__exact', '1') == '1',
+            })
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Reajustar precios',
+            'opts': self.model._meta,
+            'form': form,
+            'previa': previa,
+        }
+        return render(request, 'admin/catalogo/producto/reajustar.html', context)
     
     def stock_status(self, obj):
         if obj.stock_bajo:
@@ -172,3 +281,59 @@ class ComentarioAdmin(admin.ModelAdmin):
     list_filter = ("activo", "created_at")
     search_fields = ("producto__nombre", "nombre", "contenido")
     list_editable = ("activo",)
+    autocomplete_fields = ("producto", "usuario")
+    list_select_related = ("producto__categoria", "usuario")
+
+
+@admin.register(AjustePrecios)
+class AjustePreciosAdmin(admin.ModelAdmin):
+    """Historial de reajustes masivos de precios; se crean desde Productos > Reajustar precios."""
+
+    list_display = ('__str__', 'tipo', 'valor', 'redondeo', 'moneda_destino', 'productos', 'creado_por', 'created_at', 'revertido_at')
+    list_filter = ('tipo', 'moneda_destino', 'created_at')
+    list_select_related = ('creado_por',)
+    fields = (
+        'descripcion', 'tipo', 'valor', 'redondeo', 'moneda_destino', 'filtros', 'productos',
+        'creado_por', 'created_at', 'revertido_at', 'revertido_por', 'muestra',
+    )
+    readonly_fields = ('muestra',)
+    actions = ['revertir']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_revertir_permission(self, request):
+        return request.user.has_perm('catalogo.change_producto')
+
+    def muestra(self, obj):
+        items = obj.items.select_related('producto').order_by('pk')[:20]
+        if not items:
+            return "Sin productos"
+        return format_html(
+            '<table><tr><th>Producto</th><th>Antes</th><th>Después</th></tr>{}</table>',
+            mark_safe(''.join(
+                format_html(
+                    '<tr><td>{}</td><td>{} {}</td><td>{} {}</td></tr>',
+                    item.producto.nombre, item.precio_anterior, item.moneda_anterior, item.precio_nuevo, item.moneda_nueva,
+                )
+                for item in items
+            )),
+        )
+    muestra.short_description = 'Primeros productos'
+
+    def revertir(self, request, queryset):
+        for ajuste in queryset.order_by('-created_at'):
+            try:
+                revertidos, omitidos = reajustes.revertir(ajuste, request.user)
+            except reajustes.ErrorReajuste as exc:
+                self.message_user(request, str(exc), messages.WARNING)
+                continue
+            mensaje = f'{ajuste}: {revertidos} productos revertidos'
+            if omitidos:
+                mensaje += f', {omitidos} omitidos porque su precio cambió después del ajuste'
+            self.message_user(request, mensaje + '.', messages.WARNING if omitidos else messages.SUCCESS)
+    revertir.short_description = "Revertir ajustes seleccionados"
+    revertir.allowed_permissions = ('revertir',)
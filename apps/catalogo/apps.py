@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CatalogoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'catalogo'
+
+    def ready(self):
+        # Precios indexados al USD (ver Producto.reindexar_precios)
+        from . import signals  # noqa: F401
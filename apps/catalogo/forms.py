@@ -0,0 +1,52 @@
+from decimal import Decimal
+
+from django import forms
+
+from .models import AjustePrecios, Categoria, Producto
+
+
+class ReajustePreciosForm(forms.Form):
+    """Selección de productos y parámetros de un reajuste (ver catalogo.reajustes)."""
+
+    categoria = forms.ModelChoiceField(
+        queryset=Categoria.objects.order_by('nombre'), required=False, label="Categoría", empty_label="Todas",
+    )
+    moneda_precio = forms.ChoiceField(
+        choices=[('', 'Todas')] + Producto.MONEDAS, required=False, label="Moneda del precio",
+    )
+    q = forms.CharField(required=False, label="Búsqueda", help_text="Palabras en nombre, descripción o categoría")
+    solo_activos = forms.BooleanField(required=False, initial=True, label="Solo productos activos")
+    tipo = forms.ChoiceField(choices=AjustePrecios.TIPOS, label="Ajuste")
+    valor = forms.DecimalField(
+        max_digits=14, decimal_places=4, label="Valor",
+        help_text="Porcentaje (10 = +10%) o monto a sumar en la moneda final; negativo para rebajar",
+    )
+    redondeo = forms.ChoiceField(choices=AjustePrecios.REDONDEOS, label="Redondeo")
+    moneda_destino = forms.ChoiceField(
+        choices=[('', 'Sin conversión')] + Producto.MONEDAS, required=False, label="Convertir a",
+    )
+    descripcion = forms.CharField(max_length=255, required=False, label="Descripción")
+
+    def clean(self):
+        datos = super().clean()
+        if datos.get('tipo') == 'porcentaje' and datos.get('valor') is not None and datos['valor'] <= Decimal('-100'):
+            self.add_error('valor', "Un porcentaje de -100 o menos deja los precios en cero.")
+        return datos
+
+    def filtros(self):
+        datos = self.cleaned_data
+        return {
+            'categoria': datos['categoria'].pk if datos.get('categoria') else None,
+            'moneda_precio': datos.get('moneda_precio') or '',
+            'q': datos.get('q') or '',
+            'solo_activos': bool(datos.get('solo_activos')),
+        }
+
+    def parametros(self):
+        datos = self.cleaned_data
+        return {
+            'tipo': datos['tipo'],
+            'valor': datos['valor'],
+            'redondeo': datos['redondeo'],
+            'moneda_destino': datos.get('moneda_destino') or '',
+        }
@@ -0,0 +1,330 @@
+"""Importación masiva de productos desde CSV/XLSX con upsert por slug.
+
+Las filas se leen en streaming (``csv.reader`` u ``openpyxl`` en modo
+``read_only``) y se procesan por lotes: cada lote se valida, resuelve las
+categorías por slug (un diccionario cargado una vez) y se guarda con un único
+``bulk_create(update_conflicts=True, unique_fields=['slug'])``, que inserta los
+productos nuevos y actualiza los existentes. Solo se actualizan las columnas
+presentes en el archivo, así que un archivo ``slug,precio`` sirve para
+actualizar precios (en ese caso los slugs desconocidos se informan como error,
+porque faltan datos para crearlos). Las filas que cambian el precio o la moneda
+de un producto indexado al USD se rechazan: ese precio sale de la tasa.
+
+La columna ``imagen`` es el nombre de un archivo dentro del directorio de
+imágenes indicado; los archivos se copian al storage con un pool de hilos, una
+sola vez por nombre.
+
+Se aceptan los encabezados de los campos (``slug``, ``nombre``, ``precio``,
+``categoria``...) o los de ``manage.py exportar productos``, así que un archivo
+exportado se puede editar y volver a importar.
+"""
+
+import codecs
+import csv
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+
+from django.core.files.base import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils.text import slugify
+
+from .models import Categoria, Producto
+
+try:
+    from openpyxl import load_workbook
+except Exception:
+    load_workbook = None
+
+
+LOTE = 1000
+HILOS = 8
+COLUMNAS = ('nombre', 'descripcion', 'precio', 'moneda_precio', 'categoria_id', 'stock', 'stock_minimo', 'imagen',
+            'activo', 'destacado')
+# Campos sin valor por defecto: un producto nuevo los necesita
+OBLIGATORIOS_NUEVOS = ('nombre', 'precio', 'categoria', 'imagen')
+ALIAS = {
+    'slug': 'slug', 'nombre': 'nombre', 'descripción': 'descripcion', 'descripcion': 'descripcion',
+    'precio': 'precio', 'moneda': 'moneda_precio', 'moneda_precio': 'moneda_precio',
+    'categoria': 'categoria', 'categoría (slug)': 'categoria', 'categoria (slug)': 'categoria',
+    'stock': 'stock', 'stock mínimo': 'stock_minimo', 'stock_minimo': 'stock_minimo',
+    'activo': 'activo', 'destacado': 'destacado', 'imagen': 'imagen',
+}
+VERDADEROS = {'1', 'true', 'si', 'sí', 'yes', 'x', 'verdadero'}
+FALSOS = {'0', 'false', 'no', '', 'falso'}
+MONEDAS = {codigo for codigo, _ in Producto.MONEDAS}
+
+
+class ErrorImportacion(Exception):
+    pass
+
+
+@dataclass
+class Informe:
+    """Resultado de una importación: contadores y errores por fila."""
+    filas: int = 0
+    creados: int = 0
+    actualizados: int = 0
+    segundos: float = 0.0
+    errores: list = field(default_factory=list)
+
+    def error(self, fila, slug, mensaje):
+        self.errores.append((fila, slug, mensaje))
+
+    def errores_csv(self):
+        salida = io.StringIO()
+        escritor = csv.writer(salida)
+        escritor.writerow(['fila', 'slug', 'error'])
+        escritor.writerows(self.errores)
+        return salida.getvalue()
+
+
+def _columnas(encabezados):
+    columnas = {}
+    for indice, encabezado in enumerate(encabezados):
+        campo = ALIAS.get(str(encabezado or '').strip().lower())
+        if campo and campo not in columnas.values():
+            columnas[indice] = campo
+    if 'slug' not in columnas.values():
+        raise ErrorImportacion('El archivo necesita una columna "slug".')
+    return columnas
+
+
+def _lineas(archivo):
+    """Líneas de texto de un CSV binario, decodificadas una a una.
+
+    Excel en español guarda los CSV en cp1252: cada línea se intenta como UTF-8
+    y, si no lo es, como cp1252 (latin-1 como último recurso, nunca falla), así
+    que un archivo con otra codificación no se corta a mitad de la importación.
+    """
+    for numero, linea in enumerate(archivo):
+        if numero == 0 and linea.startswith(codecs.BOM_UTF8):
+            linea = linea[len(codecs.BOM_UTF8):]
+        for codificacion in ('utf-8', 'cp1252', 'latin-1'):
+            try:
+                yield linea.decode(codificacion)
+                break
+            except UnicodeDecodeError:
+                continue
+
+
+def leer_filas(archivo, nombre=''):
+    """Genera ``(numero_de_fila, {campo: valor})`` desde un CSV o XLSX (archivo binario).
+
+    Devuelve también los campos presentes: ``(campos, filas)``. Una fila que no
+    se puede leer se genera como ``(numero_de_fila, ValueError)``.
+    """
+    if nombre.lower().endswith('.xlsx'):
+        if load_workbook is None:
+            raise ErrorImportacion('openpyxl no está instalado: instala openpyxl para importar XLSX.')
+        try:
+            hoja = load_workbook(archivo, read_only=True, data_only=True).active
+        except Exception as exc:
+            raise ErrorImportacion(f'No se pudo abrir el XLSX: {exc}')
+        crudas = hoja.iter_rows(values_only=True)
+    else:
+        crudas = csv.reader(_lineas(archivo))
+
+    try:
+        encabezados = next(crudas, None)
+    except csv.Error as exc:
+        raise ErrorImportacion(f'CSV inválido: {exc}')
+    if encabezados is None:
+        raise ErrorImportacion('El archivo está vacío.')
+    columnas = _columnas(encabezados)
+
+    def filas():
+        numero = 1
+        while True:
+            numero += 1
+            try:
+                valores = next(crudas)
+            except StopIteration:
+                return
+            except csv.Error as exc:
+                yield numero, ValueError(f'CSV inválido: {exc}')
+                continue
+            if not any(v not in (None, '') for v in valores):
+                continue
+            yield numero, {
+                campo: ('' if valores[i] is None else str(valores[i]).strip()) if i < len(valores) else ''
+                for i, campo in columnas.items()
+            }
+    return set(columnas.values()), filas()
+
+
+def _booleano(valor):
+    texto = valor.lower()
+    if texto in VERDADEROS:
+        return True
+    if texto in FALSOS:
+        return False
+    raise ValueError(f'valor booleano inválido: {valor!r}')
+
+
+def _entero(valor):
+    numero = Decimal(valor)
+    if numero < 0 or numero != numero.to_integral_value():
+        raise ValueError(valor)
+    return int(numero)
+
+
+def _validar(datos, categorias):
+    """Valores convertidos de una fila; lanza ValueError con el motivo."""
+    limpio = {}
+    for campo, valor in datos.items():
+        if campo == 'slug':
+            limpio['slug'] = slugify(valor)
+            if not limpio['slug']:
+                raise ValueError('slug vacío')
+        elif campo == 'precio':
+            try:
+                precio = Decimal(valor.replace(',', '.')) if valor else None
+            except InvalidOperation:
+                raise ValueError(f'precio inválido: {valor!r}')
+            if precio is None or precio <= 0 or precio.as_tuple().exponent < -2 or precio >= Decimal('1e8'):
+                raise ValueError(f'precio inválido: {valor!r}')
+            limpio['precio'] = precio
+        elif campo == 'moneda_precio':
+            moneda = valor.upper() or 'USD'
+            if moneda not in MONEDAS:
+                raise ValueError(f'moneda desconocida: {valor!r}')
+            limpio['moneda_precio'] = moneda
+        elif campo == 'categoria':
+            if valor not in categorias:
+                raise ValueError(f'categoría desconocida: {valor!r}')
+            limpio['categoria_id'] = categorias[valor]
+        elif campo in ('stock', 'stock_minimo'):
+            try:
+                limpio[campo] = _entero(valor or '0')
+            except (InvalidOperation, ValueError):
+                raise ValueError(f'{campo} inválido: {valor!r}')
+        elif campo in ('activo', 'destacado'):
+            limpio[campo] = _booleano(valor)
+        elif campo == 'nombre':
+            if len(valor) < 3 or len(valor) > 200:
+                raise ValueError('nombre debe tener entre 3 y 200 caracteres')
+            limpio['nombre'] = valor
+        elif campo in ('descripcion', 'imagen'):
+            limpio[campo] = valor
+    return limpio
+
+
+class Importador:
+    """Importa productos por lotes; ``ejecutar(campos, filas)`` devuelve el ``Informe``."""
+
+    def __init__(self, dir_imagenes=None, lote=LOTE, hilos=HILOS):
+        self.dir_imagenes = os.path.realpath(dir_imagenes) if dir_imagenes else None
+        self.lote = max(1, lote)
+        self.hilos = max(1, hilos)
+        self.informe = Informe()
+        self._imagenes = {}
+
+    def ejecutar(self, campos, filas):
+        if 'imagen' in campos and not self.dir_imagenes:
+            raise ErrorImportacion('El archivo tiene columna "imagen": indica el directorio de imágenes.')
+        self.campos = campos
+        self.categorias = dict(Categoria.objects.values_list('slug', 'pk'))
+        with ThreadPoolExecutor(max_workers=self.hilos) as self.pool:
+            lote = []
+            for fila in filas:
+                lote.append(fila)
+                if len(lote) >= self.lote:
+                    self._procesar(lote)
+                    lote = []
+            if lote:
+                self._procesar(lote)
+        return self.informe
+
+    def _copiar_imagen(self, nombre):
+        ruta = os.path.realpath(os.path.join(self.dir_imagenes, nombre))
+        if not ruta.startswith(self.dir_imagenes + os.sep):
+            raise ValueError(f'imagen fuera del directorio: {nombre!r}')
+        if not os.path.isfile(ruta):
+            raise ValueError(f'imagen no encontrada: {nombre!r}')
+        with open(ruta, 'rb') as fh:
+            return default_storage.save(f'productos/{os.path.basename(ruta)}', File(fh))
+
+    def _imagenes_del_lote(self, validas):
+        """Copia (en paralelo) las imágenes nuevas del lote; devuelve {nombre: error}."""
+        nuevas = {datos['imagen'] for _, datos in validas if datos.get('imagen')} - set(self._imagenes)
+        futuros = {nombre: self.pool.submit(self._copiar_imagen, nombre) for nombre in nuevas}
+        for nombre, futuro in futuros.items():
+            try:
+                self._imagenes[nombre] = futuro.result()
+            except Exception as exc:
+                self._imagenes[nombre] = exc
+        return {n: v for n, v in self._imagenes.items() if isinstance(v, Exception)}
+
+    def _procesar(self, lote):
+        self.informe.filas += len(lote)
+        por_slug = {}
+        for numero, datos in lote:
+            if isinstance(datos, Exception):
+                self.informe.error(numero, '', str(datos))
+                continue
+            try:
+                limpio = _validar(datos, self.categorias)
+            except ValueError as exc:
+                self.informe.error(numero, datos.get('slug', ''), str(exc))
+                continue
+            if limpio['slug'] in por_slug:
+                # Un INSERT ... ON CONFLICT no admite dos filas con el mismo slug: gana la última
+                self.informe.error(por_slug.pop(limpio['slug'])[0], limpio['slug'], 'slug repetido más abajo en el archivo')
+            por_slug[limpio['slug']] = (numero, limpio)
+        validas = list(por_slug.values())
+
+        # El INSERT de un upsert necesita todas las columnas NOT NULL: las filas de
+        # productos existentes parten de sus valores actuales
+        existentes = {
+            fila['slug']: fila
+            for fila in Producto.objects.filter(slug__in=[d['slug'] for _, d in validas]).values('slug', 'indexado_usd', *COLUMNAS)
+        }
+        faltantes = [c for c in OBLIGATORIOS_NUEVOS if c not in self.campos]
+        errores_imagen = self._imagenes_del_lote(validas) if 'imagen' in self.campos else {}
+
+        productos = []
+        for numero, datos in validas:
+            actual = existentes.get(datos['slug'])
+            if actual and actual.pop('indexado_usd') and {'precio', 'moneda_precio'} & self.campos:
+                # Se pisaría con la próxima publicación de tasas (ver Producto.reindexar_precios)
+                self.informe.error(numero, datos['slug'], 'producto indexado al USD: su precio se calcula desde la tasa')
+                continue
+            if actual is None and faltantes:
+                self.informe.error(numero, datos['slug'], f'producto nuevo sin columnas: {", ".join(faltantes)}')
+                continue
+            if actual is None and not datos.get('imagen'):
+                self.informe.error(numero, datos['slug'], 'producto nuevo sin imagen')
+                continue
+            if datos.get('imagen') in errores_imagen:
+                self.informe.error(numero, datos['slug'], str(errores_imagen[datos['imagen']]))
+                continue
+            if datos.get('imagen'):
+                datos['imagen'] = self._imagenes[datos['imagen']]
+            else:
+                datos.pop('imagen', None)
+            productos.append(Producto(**{**(actual or {}), **datos}))
+            if actual is None:
+                self.informe.creados += 1
+            else:
+                self.informe.actualizados += 1
+
+        if productos:
+            actualizar = [c if c != 'categoria' else 'categoria_id' for c in self.campos if c != 'slug']
+            with transaction.atomic():
+                Producto.objects.bulk_create(
+                    productos, update_conflicts=True, unique_fields=['slug'], update_fields=actualizar + ['updated_at'],
+                )
+
+
+def importar(archivo, nombre='', dir_imagenes=None, lote=LOTE, hilos=HILOS):
+    """Importa ``archivo`` (binario, CSV o XLSX según ``nombre``) y devuelve el ``Informe``."""
+    inicio = time.monotonic()
+    campos, filas = leer_filas(archivo, nombre)
+    informe = Importador(dir_imagenes, lote, hilos).ejecutar(campos, filas)
+    informe.segundos = round(time.monotonic() - inicio, 2)
+    return informe
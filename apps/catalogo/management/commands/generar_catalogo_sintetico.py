@@ -0,0 +1,235 @@
+import io
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from catalogo.models import Categoria, Comentario, Producto
+from core.models import ConfiguracionMoneda, TasaCambio, Usuario
+from pedidos.models import Carrito, ItemPedido, Pedido
+from pedidos.totales import congelar_totales
+
+
+PREFIJO = "sint"
+CLAVE_USUARIOS = "sintetico-123"
+DIR_IMAGENES = "productos/sinteticos"
+SUSTANTIVOS = (
+    "Martillo", "Taladro", "Llave", "Destornillador", "Sierra", "Pintura", "Brocha", "Rodillo",
+    "Cemento", "Tornillo", "Clavo", "Guantes", "Casco", "Cinta", "Manguera", "Bombillo",
+)
+ADJETIVOS = ("industrial", "compacto", "reforzado", "profesional", "económico", "inoxidable", "ligero", "premium")
+COLORES = ((226, 232, 240), (254, 215, 170), (187, 247, 208), (191, 219, 254), (233, 213, 255), (254, 202, 202))
+
+
+@contextmanager
+def _fechas_manuales(modelo, *campos):
+    """Desactiva auto_now/auto_now_add de ``campos`` para fijar fechas en bulk_create."""
+    originales = []
+    for nombre in campos:
+        campo = modelo._meta.get_field(nombre)
+        originales.append((campo, campo.auto_now, campo.auto_now_add))
+        campo.auto_now = campo.auto_now_add = False
+    try:
+        yield
+    finally:
+        for campo, auto_now, auto_now_add in originales:
+            campo.auto_now, campo.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera un catálogo sintético grande y determinista (categorías, productos, "
+        "usuarios, pedidos con items, comentarios y carritos) con bulk_create por "
+        "lotes e imágenes de relleno generadas con Pillow, sin red. Pensado para "
+        "benchmarks y pruebas de presupuesto de consultas sobre una base de datos dedicada."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--categorias", type=int, default=200)
+        parser.add_argument("--productos", type=int, default=50_000)
+        parser.add_argument("--usuarios", type=int, default=100_000)
+        parser.add_argument("--pedidos", type=int, default=1_000_000)
+        parser.add_argument("--items-max", type=int, default=5, help="Items máximos por pedido")
+        parser.add_argument("--comentarios", type=int, default=200_000)
+        parser.add_argument("--carritos", type=int, default=20_000, help="Usuarios con carrito guardado")
+        parser.add_argument("--escala", type=float, default=1.0, help="Multiplica todos los volúmenes (ej. 0.01)")
+        parser.add_argument("--dias", type=int, default=365, help="Antigüedad máxima de los pedidos")
+        parser.add_argument("--imagenes", type=int, default=24, help="Imágenes de relleno distintas")
+        parser.add_argument("--lote", type=int, default=5_000, help="Filas por bulk_create")
+        parser.add_argument("--semilla", type=int, default=42)
+
+    def handle(self, *args, **options):
+        escala = options["escala"]
+        volumen = {
+            clave: max(0, int(options[clave] * escala))
+            for clave in ("categorias", "productos", "usuarios", "pedidos", "comentarios", "carritos")
+        }
+        if volumen["productos"] and not volumen["categorias"]:
+            raise CommandError("Se necesita al menos una categoría para crear productos.")
+        if (volumen["pedidos"] or volumen["comentarios"] or volumen["carritos"]) and not (volumen["productos"] and volumen["usuarios"]):
+            raise CommandError("Pedidos, comentarios y carritos necesitan productos y usuarios.")
+        if Categoria.objects.filter(slug__startswith=f"{PREFIJO}-").exists() or User.objects.filter(username__startswith=f"{PREFIJO}-").exists():
+            raise CommandError("Ya hay datos sintéticos: usa una base de datos nueva (o manage.py flush).")
+
+        self.azar = random.Random(options["semilla"])
+        self.lote = max(1, options["lote"])
+        self.ahora = timezone.now()
+
+        imagenes = self._imagenes(options["imagenes"])
+        categorias = self._categorias(volumen["categorias"])
+        productos = self._productos(volumen["productos"], categorias, imagenes)
+        usuarios = self._usuarios(volumen["usuarios"])
+        self._pedidos(volumen["pedidos"], productos, usuarios, options["items_max"], options["dias"])
+        self._comentarios(volumen["comentarios"], productos, usuarios)
+        self._carritos(volumen["carritos"], productos, usuarios)
+        self.stdout.write(self.style.SUCCESS("Catálogo sintético generado."))
+
+    def _progreso(self, modelo, hecho, total):
+        self.stdout.write(f"  {modelo._meta.verbose_name_plural}: {hecho}/{total}")
+
+    def _en_lotes(self, modelo, total, fabricar, **opciones):
+        """Llama ``fabricar(desde, hasta)`` por lotes y guarda cada lote con bulk_create."""
+        creados = []
+        for desde in range(0, total, self.lote):
+            hasta = min(desde + self.lote, total)
+            with transaction.atomic():
+                creados.extend(modelo.objects.bulk_create(fabricar(desde, hasta), batch_size=self.lote, **opciones))
+            self._progreso(modelo, hasta, total)
+        return creados
+
+    def _imagenes(self, cantidad):
+        try:
+            from PIL import Image, ImageDraw
+        except ImportError:
+            raise CommandError("Pillow es necesario para generar las imágenes de relleno.")
+
+        rutas = []
+        for i in range(max(1, cantidad)):
+            nombre = f"{DIR_IMAGENES}/{PREFIJO}-{i}.jpg"
+            if not default_storage.exists(nombre):
+                imagen = Image.new("RGB", (400, 400), COLORES[i % len(COLORES)])
+                dibujo = ImageDraw.Draw(imagen)
+                dibujo.rectangle((40, 40, 360, 360), outline=(100, 116, 139), width=6)
+                dibujo.text((170, 190), f"#{i}", fill=(51, 65, 85))
+                contenido = io.BytesIO()
+                imagen.save(contenido, "JPEG", quality=70)
+                nombre = default_storage.save(nombre, ContentFile(contenido.getvalue()))
+            rutas.append(nombre)
+        self.stdout.write(f"  imágenes de relleno: {len(rutas)}")
+        return rutas
+
+    def _categorias(self, total):
+        def fabricar(desde, hasta):
+            return [
+                Categoria(
+                    nombre=f"{self.azar.choice(SUSTANTIVOS)}s {i}", slug=f"{PREFIJO}-categoria-{i}",
+                    descripcion="Categoría sintética.", orden=i,
+                )
+                for i in range(desde, hasta)
+            ]
+        return [c.pk for c in self._en_lotes(Categoria, total, fabricar)]
+
+    def _productos(self, total, categorias, imagenes):
+        monedas = ("USD",) * 8 + ("VES", "EUR")
+
+        def fabricar(desde, hasta):
+            filas = []
+            for i in range(desde, hasta):
+                nombre = f"{self.azar.choice(SUSTANTIVOS)} {self.azar.choice(ADJETIVOS)} {i}"
+                filas.append(Producto(
+                    nombre=nombre, descripcion=f"{nombre}. Producto sintético para pruebas.",
+                    precio=Decimal(self.azar.randint(100, 50_000)) / 100,
+                    moneda_precio=self.azar.choice(monedas),
+                    categoria_id=self.azar.choice(categorias),
+                    stock=self.azar.randint(0, 500), stock_minimo=5,
+                    imagen=self.azar.choice(imagenes),
+                    activo=self.azar.random() < 0.95, destacado=self.azar.random() < 0.02,
+                    slug=f"{PREFIJO}-producto-{i}",
+                ))
+            return filas
+        return [(p.pk, p.precio, p.moneda_precio) for p in self._en_lotes(Producto, total, fabricar)]
+
+    def _usuarios(self, total):
+        # Un solo hash para todos: PBKDF2 por usuario tardaría horas
+        clave = make_password(CLAVE_USUARIOS)
+
+        def fabricar(desde, hasta):
+            return [
+                User(
+                    username=f"{PREFIJO}-{i}", email=f"{PREFIJO}-{i}@example.com", password=clave,
+                    first_name=self.azar.choice(("Ana", "Luis", "María", "José", "Carmen", "Pedro")),
+                    last_name=f"Prueba {i}",
+                )
+                for i in range(desde, hasta)
+            ]
+        pks = [u.pk for u in self._en_lotes(User, total, fabricar)]
+        self._en_lotes(Usuario, total, lambda desde, hasta: [
+            Usuario(user_id=pks[i], cedula=str(80_000_000 + i)) for i in range(desde, hasta)
+        ])
+        return pks
+
+    def _pedidos(self, total, productos, usuarios, items_max, dias):
+        config = ConfiguracionMoneda.obtener_configuracion()
+        tasas = TasaCambio.snapshot()
+        monedas = [codigo for codigo, _ in ConfiguracionMoneda.MONEDAS_DISPONIBLES]
+        estados = [codigo for codigo, _ in Pedido.ESTADOS]
+        metodos = [codigo for codigo, _ in Pedido.METODOS_PAGO]
+        segundos = max(1, dias) * 86_400
+
+        with _fechas_manuales(Pedido, "fecha_creacion", "fecha_actualizacion"):
+            for desde in range(0, total, self.lote):
+                hasta = min(desde + self.lote, total)
+                pedidos, lineas_por_pedido = [], []
+                for i in range(desde, hasta):
+                    fecha = self.ahora - timedelta(seconds=self.azar.randrange(segundos))
+                    pedido = Pedido(
+                        usuario_id=self.azar.choice(usuarios), numero_pedido=f"SIN-{i:010d}",
+                        moneda=config.moneda_principal, estado=self.azar.choice(estados),
+                        metodo_pago=self.azar.choice(metodos), direccion_entrega="Dirección sintética",
+                        telefono_contacto="04120000000", fecha_creacion=fecha, fecha_actualizacion=fecha,
+                    )
+                    lineas = [
+                        ItemPedido(producto_id=pk, cantidad=self.azar.randint(1, 4), precio_unitario=precio, moneda=moneda)
+                        for pk, precio, moneda in self.azar.sample(productos, min(len(productos), self.azar.randint(1, items_max)))
+                    ]
+                    congelar_totales(pedido, lineas, tasas, version=config.version_tasas, monedas=monedas)
+                    pedidos.append(pedido)
+                    lineas_por_pedido.append(lineas)
+
+                with transaction.atomic():
+                    Pedido.objects.bulk_create(pedidos, batch_size=self.lote)
+                    items = []
+                    for pedido, lineas in zip(pedidos, lineas_por_pedido):
+                        for item in lineas:
+                            item.pedido_id = pedido.pk
+                            items.append(item)
+                    ItemPedido.objects.bulk_create(items, batch_size=self.lote)
+                self._progreso(Pedido, hasta, total)
+
+    def _comentarios(self, total, productos, usuarios):
+        def fabricar(desde, hasta):
+            return [
+                Comentario(
+                    producto_id=self.azar.choice(productos)[0], usuario_id=self.azar.choice(usuarios),
+                    contenido=f"Comentario sintético {i}.", activo=self.azar.random() < 0.9,
+                )
+                for i in range(desde, hasta)
+            ]
+        self._en_lotes(Comentario, total, fabricar)
+
+    def _carritos(self, total, productos, usuarios):
+        elegidos = self.azar.sample(usuarios, min(total, len(usuarios)))
+        filas = [
+            Carrito(usuario_id=usuario, producto_id=pk, cantidad=self.azar.randint(1, 3))
+            for usuario in elegidos
+            for pk, _, _ in self.azar.sample(productos, min(len(productos), self.azar.randint(1, 3)))
+        ]
+        self._en_lotes(Carrito, len(filas), lambda desde, hasta: filas[desde:hasta])
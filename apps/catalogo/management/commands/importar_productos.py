@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from catalogo import importar
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa productos desde un CSV o XLSX: crea o actualiza por slug con upserts "
+        "por lotes (bulk_create con update_conflicts) y copia las imágenes desde un "
+        "directorio local. Ej.: importar_productos productos.csv --imagenes fotos/ --errores errores.csv"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("archivo", help="Archivo .csv o .xlsx")
+        parser.add_argument("--imagenes", default="", help="Directorio con los archivos de la columna imagen")
+        parser.add_argument("--lote", type=int, default=importar.LOTE, help="Filas por lote")
+        parser.add_argument("--hilos", type=int, default=importar.HILOS, help="Hilos para copiar imágenes")
+        parser.add_argument("--errores", default="", help="Escribe las filas con error en este CSV")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["archivo"], "rb") as archivo:
+                informe = importar.importar(
+                    archivo, options["archivo"], dir_imagenes=options["imagenes"] or None,
+                    lote=options["lote"], hilos=options["hilos"],
+                )
+        except OSError as exc:
+            raise CommandError(f"No se pudo leer el archivo: {exc}")
+        except importar.ErrorImportacion as exc:
+            raise CommandError(str(exc))
+
+        for fila, slug, mensaje in informe.errores[:20]:
+            self.stderr.write(f"  fila {fila} ({slug}): {mensaje}")
+        if len(informe.errores) > 20:
+            self.stderr.write(f"  ... y {len(informe.errores) - 20} errores más")
+        if options["errores"] and informe.errores:
+            with open(options["errores"], "w", encoding="utf-8", newline="") as salida:
+                salida.write(informe.errores_csv())
+
+        resumen = (
+            f"{informe.filas} filas en {informe.segundos} s: {informe.creados} creados, "
+            f"{informe.actualizados} actualizados, {len(informe.errores)} con error."
+        )
+        self.stdout.write(self.style.WARNING(resumen) if informe.errores else self.style.SUCCESS(resumen))
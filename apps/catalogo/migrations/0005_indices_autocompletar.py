@@ -0,0 +1,37 @@
+from django.db import migrations
+
+
+# Búsquedas ``^campo`` del autocompletar del admin (solo PostgreSQL)
+INDICES = [
+    'CREATE INDEX IF NOT EXISTS "catalogo_producto_nombre_prefijo" '
+    'ON "catalogo_producto" (UPPER("nombre"::text) varchar_pattern_ops)',
+    'CREATE INDEX IF NOT EXISTS "catalogo_producto_slug_prefijo" '
+    'ON "catalogo_producto" (UPPER("slug"::text) varchar_pattern_ops)',
+]
+BORRAR = [
+    'DROP INDEX IF EXISTS "catalogo_producto_nombre_prefijo"',
+    'DROP INDEX IF EXISTS "catalogo_producto_slug_prefijo"',
+]
+
+
+def crear_indices(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in INDICES:
+            schema_editor.execute(sql)
+
+
+def borrar_indices(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in BORRAR:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0004_comentario'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, borrar_indices),
+    ]
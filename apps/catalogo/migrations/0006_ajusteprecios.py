@@ -0,0 +1,55 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0005_indices_autocompletar'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AjustePrecios',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('descripcion', models.CharField(blank=True, max_length=255)),
+                ('tipo', models.CharField(choices=[('porcentaje', 'Porcentaje'), ('fijo', 'Monto fijo')], default='porcentaje', max_length=10)),
+                ('valor', models.DecimalField(decimal_places=4, help_text='Porcentaje (10 = +10%) o monto a sumar en la moneda final; negativo para rebajar', max_digits=14)),
+                ('redondeo', models.CharField(choices=[('0.01', 'Céntimos'), ('0.05', 'Múltiplo de 0,05'), ('1', 'Unidades'), ('10', 'Decenas'), ('100', 'Centenas'), ('0.99', 'Terminar en ,99')], default='0.01', max_length=4)),
+                ('moneda_destino', models.CharField(blank=True, choices=[('USD', 'Dólar Americano (USD)'), ('VES', 'Bolívar Venezolano (VES)'), ('COP', 'Peso Colombiano (COP)'), ('EUR', 'Euro (EUR)')], help_text='Convierte los precios a esta moneda antes del ajuste (vacío: sin conversión)', max_length=3)),
+                ('filtros', models.JSONField(blank=True, default=dict, help_text='Selección de productos usada')),
+                ('productos', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('revertido_at', models.DateTimeField(blank=True, null=True)),
+                ('creado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('revertido_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Ajuste de precios',
+                'verbose_name_plural': 'Ajustes de precios',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='AjustePreciosItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('precio_anterior', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('moneda_anterior', models.CharField(max_length=3)),
+                ('precio_nuevo', models.DecimalField(decimal_places=2, max_digits=10, null=True)),
+                ('moneda_nueva', models.CharField(blank=True, max_length=3)),
+                ('ajuste', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='catalogo.ajusteprecios')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ajustes_precio', to='catalogo.producto')),
+            ],
+            options={
+                'verbose_name': 'Producto ajustado',
+                'verbose_name_plural': 'Productos ajustados',
+                'constraints': [models.UniqueConstraint(fields=('ajuste', 'producto'), name='ajuste_precios_item_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:41
+
+import django.core.validators
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0006_ajusteprecios'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='indexado_usd',
+            field=models.BooleanField(default=False, help_text='Precio en bolívares recalculado desde el precio de referencia en USD cada vez que cambian las tasas'),
+        ),
+        migrations.AddField(
+            model_name='producto',
+            name='precio_referencia_usd',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Precio en USD de los productos indexados', max_digits=10, null=True, validators=[django.core.validators.MinValueValidator(Decimal('0.01'))]),
+        ),
+    ]
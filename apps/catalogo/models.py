@@ -1,6 +1,9 @@
 from django.db import models
+from django.core.exceptions import ValidationError
 from django.core.validators import MinLengthValidator, MinValueValidator
+from django.db.models.functions import Round
 from django.utils.text import slugify
+from django.utils import timezone
 from django.contrib.auth.models import User
 from decimal import Decimal
 
@@ -96,6 +99,18 @@ class Producto(models.Model):
         default='USD',
         help_text="Moneda del precio base"
     )
+    indexado_usd = models.BooleanField(
+        default=False,
+        help_text="Precio en bolívares recalculado desde el precio de referencia en USD cada vez que cambian las tasas"
+    )
+    precio_referencia_usd = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(Decimal('0.01'))],
+        help_text="Precio en USD de los productos indexados"
+    )
     categoria = models.ForeignKey(
         Categoria,
         on_delete=models.CASCADE,
@@ -131,6 +146,9 @@ class Producto(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Moneda en la que se publican los precios de los productos indexados al USD
+    MONEDA_INDEXADA = 'VES'
+    
     class Meta:
         verbose_name = "Producto"
         verbose_name_plural = "Productos"
@@ -147,19 +165,62 @@ class Producto(models.Model):
             return f"{self.nombre} - {self.categoria.nombre}"
         return self.nombre
     
+    def clean(self):
+        super().clean()
+        if self.indexado_usd and not self.precio_referencia_usd:
+            raise ValidationError({'precio_referencia_usd': "Los productos indexados necesitan un precio de referencia en USD."})
+    
     def save(self, *args, **kwargs):
         """Genera automáticamente el slug si no existe"""
         if not self.slug and self.nombre and self.categoria:
             self.slug = slugify(f"{self.nombre}-{self.categoria.nombre}")
+        if self.indexado_usd and self.precio_referencia_usd:
+            self.indexar()
         super().save(*args, **kwargs)
     
-    def obtener_precio_en_moneda(self, moneda_destino):
-        """Obtiene el precio del producto en una moneda específica"""
+    def indexar(self, tasas=None):
+        """Calcula el precio en ``MONEDA_INDEXADA`` desde ``precio_referencia_usd`` (sin guardar)."""
+        from core.models import TasaCambio
+        
+        tasas = tasas or TasaCambio.snapshot()
+        if tasas.tiene('USD', self.MONEDA_INDEXADA):
+            self.precio = (self.precio_referencia_usd * tasas.tasa('USD', self.MONEDA_INDEXADA)).quantize(Decimal('0.01'))
+            self.moneda_precio = self.MONEDA_INDEXADA
+    
+    @classmethod
+    def reindexar_precios(cls, tasas=None):
+        """Recalcula en un solo UPDATE el precio de todos los productos indexados al USD.
+
+        Se llama al publicarse un nuevo conjunto de tasas (ver catalogo.signals).
+        Solo toca los productos cuyo precio cambia; ``updated_at`` avanza con el
+        precio, así que cualquier caché con clave por producto y ``updated_at``
+        queda invalidada en la misma sentencia. Devuelve los productos actualizados.
+        """
+        from core.models import TasaCambio
+        
+        tasas = tasas or TasaCambio.snapshot()
+        if not tasas.tiene('USD', cls.MONEDA_INDEXADA):
+            return 0
+        tasa = tasas.tasa('USD', cls.MONEDA_INDEXADA)
+        nuevo = Round(models.F('precio_referencia_usd') * models.Value(tasa), 2)
+        return (
+            cls.objects.filter(indexado_usd=True, precio_referencia_usd__isnull=False)
+            .exclude(precio=nuevo, moneda_precio=cls.MONEDA_INDEXADA)
+            .update(precio=nuevo, moneda_precio=cls.MONEDA_INDEXADA, updated_at=timezone.now())
+        )
+    
+    def obtener_precio_en_moneda(self, moneda_destino, tasas=None):
+        """Obtiene el precio del producto en una moneda específica.
+
+        ``tasas`` es un ``TasasSnapshot`` opcional para evitar consultas por producto.
+        """
         from core.models import TasaCambio
         
         if self.moneda_precio == moneda_destino:
             return self.precio
         
+        if tasas is not None:
+            return tasas.convertir(self.precio, self.moneda_precio, moneda_destino)
         tasa = TasaCambio.obtener_tasa(self.moneda_precio, moneda_destino)
         return self.precio * tasa
     
@@ -186,7 +247,7 @@ class Producto(models.Model):
         """Retorna el precio formateado en la moneda base"""
         from core.models import ConfiguracionMoneda
         
-        config = ConfiguracionMoneda.obtener_configuracion()
+        config = ConfiguracionMoneda.configuracion_cacheada()
         simbolo = config.simbolos.get(self.moneda_precio, self.moneda_precio)
         try:
             precio_val = self.precio if self.precio is not None else Decimal('0.00')
@@ -216,6 +277,24 @@ class Producto(models.Model):
             return True
         return False
     
+    @classmethod
+    def reducir_stock_en_lote(cls, cantidades):
+        """Reduce el stock de varios productos en un solo UPDATE.
+
+        ``cantidades`` es {producto_id: cantidad}; como en ``reducir_stock``, un
+        producto sin stock suficiente queda igual.
+        """
+        if not cantidades:
+            return 0
+        casos = [
+            models.When(pk=pk, stock__gte=cantidad, then=models.F('stock') - cantidad)
+            for pk, cantidad in cantidades.items()
+        ]
+        return cls.objects.filter(pk__in=list(cantidades)).update(
+            stock=models.Case(*casos, default=models.F('stock'), output_field=models.PositiveIntegerField()),
+            updated_at=timezone.now(),
+        )
+    
     def aumentar_stock(self, cantidad):
         """Aumenta el stock del producto"""
         if self.stock is not None:
@@ -240,3 +319,71 @@ class Comentario(models.Model):
 
     def __str__(self):
         return f"Comentario de {self.nombre or (self.usuario and self.usuario.username) or 'Anónimo'}"
+
+
+class AjustePrecios(models.Model):
+    """Un reajuste masivo de precios (ver catalogo.reajustes), con lo necesario para revertirlo."""
+
+    TIPOS = [
+        ('porcentaje', 'Porcentaje'),
+        ('fijo', 'Monto fijo'),
+    ]
+    # Paso de redondeo del precio final
+    REDONDEOS = [
+        ('0.01', 'Céntimos'),
+        ('0.05', 'Múltiplo de 0,05'),
+        ('1', 'Unidades'),
+        ('10', 'Decenas'),
+        ('100', 'Centenas'),
+        ('0.99', 'Terminar en ,99'),
+    ]
+
+    descripcion = models.CharField(max_length=255, blank=True)
+    tipo = models.CharField(max_length=10, choices=TIPOS, default='porcentaje')
+    valor = models.DecimalField(
+        max_digits=14,
+        decimal_places=4,
+        help_text="Porcentaje (10 = +10%) o monto a sumar en la moneda final; negativo para rebajar"
+    )
+    redondeo = models.CharField(max_length=4, choices=REDONDEOS, default='0.01')
+    moneda_destino = models.CharField(
+        max_length=3,
+        choices=Producto.MONEDAS,
+        blank=True,
+        help_text="Convierte los precios a esta moneda antes del ajuste (vacío: sin conversión)"
+    )
+    filtros = models.JSONField(default=dict, blank=True, help_text="Selección de productos usada")
+    productos = models.PositiveIntegerField(default=0)
+    creado_por = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    revertido_at = models.DateTimeField(null=True, blank=True)
+    revertido_por = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Ajuste de precios'
+        verbose_name_plural = 'Ajustes de precios'
+
+    def __str__(self):
+        return self.descripcion or f"Ajuste #{self.pk}"
+
+
+class AjustePreciosItem(models.Model):
+    """Precio de un producto antes y después de un ``AjustePrecios``."""
+
+    ajuste = models.ForeignKey(AjustePrecios, on_delete=models.CASCADE, related_name='items')
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='ajustes_precio')
+    precio_anterior = models.DecimalField(max_digits=10, decimal_places=2)
+    moneda_anterior = models.CharField(max_length=3)
+    precio_nuevo = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+    moneda_nueva = models.CharField(max_length=3, blank=True)
+
+    class Meta:
+        verbose_name = 'Producto ajustado'
+        verbose_name_plural = 'Productos ajustados'
+        constraints = [
+            models.UniqueConstraint(fields=['ajuste', 'producto'], name='ajuste_precios_item_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.producto_id}: {self.precio_anterior} {self.moneda_anterior} → {self.precio_nuevo} {self.moneda_nueva}"
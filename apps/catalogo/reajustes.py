@@ -0,0 +1,200 @@
+"""Reajuste masivo de precios (inflación, cambio de lista, conversión de moneda).
+
+Un reajuste selecciona productos por categoría, moneda y/o búsqueda y calcula
+el precio nuevo como una expresión SQL sobre ``F('precio')``:
+
+1. conversión opcional a ``moneda_destino`` (un ``CASE`` con la tasa de cada
+   moneda de origen, tomada de ``TasaCambio.snapshot()``),
+2. ajuste por porcentaje o monto fijo,
+3. redondeo al paso elegido (``AjustePrecios.REDONDEOS``), mínimo 0,01.
+
+``vista_previa`` anota esa misma expresión para mostrar el antes/después sin
+escribir nada; ``aplicar`` guarda los precios anteriores en
+``AjustePreciosItem`` y actualiza todos los productos con un único ``UPDATE``.
+``revertir`` restaura los precios anteriores (también con un ``UPDATE``) de los
+productos que no se hayan vuelto a modificar desde el ajuste.
+"""
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Ceil, Greatest, Round
+from django.utils import timezone
+
+from .models import AjustePrecios, AjustePreciosItem, Producto
+
+
+LOTE = 2000
+MINIMO = Decimal('0.01')
+# Límite de Producto.precio (max_digits=10, decimal_places=2)
+MAXIMO = Decimal('100000000')
+_DECIMAL = DecimalField(max_digits=20, decimal_places=6)
+
+
+class ErrorReajuste(Exception):
+    pass
+
+
+def seleccionar(filtros, indexados=False):
+    """Productos de ``filtros`` ({categoria, moneda_precio, q, solo_activos}).
+
+    La búsqueda funciona como la del admin: cada palabra debe aparecer en el
+    nombre, la descripción o la categoría. Los productos indexados al USD
+    quedan fuera (su precio se recalcula con cada publicación de tasas, ver
+    ``Producto.reindexar_precios``) salvo con ``indexados=True``, que devuelve
+    solo esos.
+    """
+    queryset = Producto.objects.filter(indexado_usd=indexados)
+    if filtros.get('categoria'):
+        queryset = queryset.filter(categoria_id=filtros['categoria'])
+    if filtros.get('moneda_precio'):
+        queryset = queryset.filter(moneda_precio=filtros['moneda_precio'])
+    if filtros.get('solo_activos'):
+        queryset = queryset.filter(activo=True)
+    for termino in (filtros.get('q') or '').split():
+        queryset = queryset.filter(
+            Q(nombre__icontains=termino) | Q(descripcion__icontains=termino) | Q(categoria__nombre__icontains=termino)
+        )
+    return queryset
+
+
+def comprobar_tasas(queryset, moneda_destino, tasas):
+    """Lanza ``ErrorReajuste`` si alguna moneda de origen de ``queryset`` no tiene tasa a ``moneda_destino``.
+
+    ``TasasSnapshot.tasa`` devuelve 1 cuando no hay tasa: sin esta comprobación
+    esos precios se reetiquetarían en la moneda destino sin convertirse.
+    """
+    if not moneda_destino:
+        return
+    origenes = set(queryset.order_by().values_list('moneda_precio', flat=True).distinct())
+    faltantes = sorted(m for m in origenes if m != moneda_destino and not tasas.tiene(m, moneda_destino))
+    if faltantes:
+        pares = ', '.join(f'{m}→{moneda_destino}' for m in faltantes)
+        raise ErrorReajuste(f'No hay tasa de cambio activa para: {pares}.')
+
+
+def expresion(tipo, valor, redondeo='0.01', moneda_destino='', tasas=None):
+    """Expresión del precio nuevo a partir de ``F('precio')`` y ``F('moneda_precio')``."""
+    precio = F('precio')
+    if moneda_destino:
+        if tasas is None:
+            from core.models import TasaCambio
+            tasas = TasaCambio.snapshot()
+        casos = [
+            When(moneda_precio=moneda, then=Value(tasas.tasa(moneda, moneda_destino)))
+            for moneda, _ in Producto.MONEDAS if moneda != moneda_destino
+        ]
+        precio = precio * Case(*casos, default=Value(Decimal('1')), output_field=_DECIMAL)
+
+    valor = Decimal(valor)
+    if tipo == 'porcentaje':
+        precio = precio * Value(1 + valor / 100, output_field=_DECIMAL)
+    else:
+        precio = precio + Value(valor, output_field=_DECIMAL)
+
+    if redondeo == '0.99':
+        # Hacia arriba hasta terminar en ,99 (12,30 -> 12,99; 13,00 -> 13,99)
+        precio = Ceil(precio + Value(MINIMO)) - Value(MINIMO)
+    else:
+        paso = Value(Decimal(redondeo), output_field=_DECIMAL)
+        precio = Round(precio / paso) * paso
+    return Greatest(precio, Value(MINIMO), output_field=Producto._meta.get_field('precio'))
+
+
+def vista_previa(filtros, tipo, valor, redondeo='0.01', moneda_destino='', limite=50):
+    """Resumen y primeras ``limite`` filas ``(producto, precio, moneda, precio_nuevo, moneda_nueva)``."""
+    from core.models import TasaCambio
+
+    tasas = TasaCambio.snapshot()
+    queryset = seleccionar(filtros)
+    comprobar_tasas(queryset, moneda_destino, tasas)
+    anotado = queryset.annotate(precio_nuevo=expresion(tipo, valor, redondeo, moneda_destino, tasas))
+    resumen = anotado.aggregate(
+        productos=Count('pk'),
+        fuera_de_rango=Count('pk', filter=Q(precio_nuevo__gte=MAXIMO)),
+    )
+    filas = []
+    for fila in anotado.order_by('pk').values('pk', 'nombre', 'slug', 'precio', 'moneda_precio', 'precio_nuevo')[:limite]:
+        fila['precio_nuevo'] = Decimal(fila['precio_nuevo']).quantize(MINIMO)
+        fila['moneda_nueva'] = moneda_destino or fila['moneda_precio']
+        fila['variacion'] = None
+        if fila['moneda_nueva'] == fila['moneda_precio'] and fila['precio']:
+            fila['variacion'] = (fila['precio_nuevo'] / fila['precio'] - 1) * 100
+        filas.append(fila)
+    return {**resumen, 'indexados': seleccionar(filtros, indexados=True).count(), 'filas': filas}
+
+
+def _descripcion(tipo, valor, redondeo, moneda_destino):
+    partes = [f"{valor:+}%" if tipo == 'porcentaje' else f"{valor:+} fijo"]
+    if moneda_destino:
+        partes.append(f"a {moneda_destino}")
+    partes.append(f"redondeo {dict(AjustePrecios.REDONDEOS)[redondeo].lower()}")
+    return 'Reajuste ' + ', '.join(partes)
+
+
+def aplicar(filtros, tipo, valor, redondeo='0.01', moneda_destino='', usuario=None, descripcion=''):
+    """Aplica el reajuste y devuelve el ``AjustePrecios`` creado."""
+    from core.models import TasaCambio
+
+    valor = Decimal(valor)
+    tasas = TasaCambio.snapshot()
+    nuevo = expresion(tipo, valor, redondeo, moneda_destino, tasas)
+    with transaction.atomic():
+        queryset = seleccionar(filtros)
+        comprobar_tasas(queryset, moneda_destino, tasas)
+        if queryset.annotate(precio_nuevo=nuevo).filter(precio_nuevo__gte=MAXIMO).exists():
+            raise ErrorReajuste('Algunos precios superan el máximo permitido (99.999.999,99).')
+
+        ajuste = AjustePrecios.objects.create(
+            descripcion=descripcion or _descripcion(tipo, valor, redondeo, moneda_destino),
+            tipo=tipo, valor=valor, redondeo=redondeo, moneda_destino=moneda_destino,
+            filtros=filtros, creado_por=usuario,
+        )
+        # Precios anteriores (bloqueando las filas en PostgreSQL hasta el UPDATE)
+        filas = (
+            queryset.select_for_update(of=('self',)).order_by('pk')
+            .values_list('pk', 'precio', 'moneda_precio').iterator(chunk_size=LOTE)
+        )
+        lote = []
+        for pk, precio, moneda in filas:
+            lote.append(AjustePreciosItem(ajuste=ajuste, producto_id=pk, precio_anterior=precio, moneda_anterior=moneda))
+            if len(lote) >= LOTE:
+                AjustePreciosItem.objects.bulk_create(lote)
+                lote = []
+        AjustePreciosItem.objects.bulk_create(lote)
+
+        cambios = {'precio': nuevo, 'updated_at': timezone.now()}
+        if moneda_destino:
+            cambios['moneda_precio'] = Value(moneda_destino)
+        ajuste.productos = Producto.objects.filter(pk__in=ajuste.items.values('producto_id')).update(**cambios)
+
+        producto = Producto.objects.filter(pk=OuterRef('producto_id'))
+        ajuste.items.update(
+            precio_nuevo=Subquery(producto.values('precio')[:1]),
+            moneda_nueva=Subquery(producto.values('moneda_precio')[:1]),
+        )
+        ajuste.save(update_fields=['productos'])
+    return ajuste
+
+
+def revertir(ajuste, usuario=None):
+    """Restaura los precios anteriores; devuelve ``(revertidos, omitidos)``.
+
+    Se omiten los productos cuyo precio cambió después del ajuste (a mano o
+    por otro reajuste posterior), para no pisar esos cambios.
+    """
+    if ajuste.revertido_at:
+        raise ErrorReajuste(f'{ajuste} ya fue revertido.')
+    with transaction.atomic():
+        vigentes = ajuste.items.filter(producto__precio=F('precio_nuevo'), producto__moneda_precio=F('moneda_nueva'))
+        anterior = ajuste.items.filter(producto_id=OuterRef('pk'))
+        revertidos = Producto.objects.filter(pk__in=vigentes.values('producto_id')).update(
+            precio=Subquery(anterior.values('precio_anterior')[:1]),
+            moneda_precio=Subquery(anterior.values('moneda_anterior')[:1]),
+            updated_at=timezone.now(),
+        )
+        ajuste.revertido_at = timezone.now()
+        ajuste.revertido_por = usuario
+        ajuste.save(update_fields=['revertido_at', 'revertido_por'])
+    return revertidos, ajuste.productos - revertidos
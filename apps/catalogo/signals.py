@@ -0,0 +1,11 @@
+from django.dispatch import receiver
+
+from core.signals import tasas_publicadas
+
+from .models import Producto
+
+
+@receiver(tasas_publicadas)
+def reindexar_precios(sender, **kwargs):
+    """Con cada nuevo conjunto de tasas, recalcula los precios indexados al USD."""
+    Producto.reindexar_precios()
@@ -1,6 +1,8 @@
 from decimal import Decimal
 from django import template
 
+from core.models import TasaCambio
+
 register = template.Library()
 
 
@@ -14,7 +16,8 @@ def precio_en_moneda(producto, moneda_destino):
     try:
         if not producto or not moneda_destino:
             return Decimal('0.00')
-        return producto.obtener_precio_en_moneda(moneda_destino)
+        # Tasas cacheadas: una tarjeta por producto no debe consultar la DB
+        return producto.obtener_precio_en_moneda(moneda_destino, tasas=TasaCambio.snapshot_cacheado())
     except Exception:
         return Decimal('0.00')
 
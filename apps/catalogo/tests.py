@@ -1,3 +1,387 @@
-from django.test import TestCase
+import csv
+import shutil
+import tempfile
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import skipIf
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import exportar
+from core.models import TasaCambio, Usuario
+from pedidos.models import Carrito, ItemPedido, Pedido
+from pedidos.totales import pedidos_descuadrados
+from . import importar, reajustes
+from .models import AjustePrecios, Categoria, Comentario, Producto
+
+
+class AutocompletarAdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        categoria = Categoria.objects.create(nombre='Herramientas')
+        for nombre, activo in [('Martillo viejo', False), ('Martillo', True), ('Sierra', True), ('Mazo', True)]:
+            Producto.objects.create(
+                nombre=nombre, descripcion=nombre, precio=Decimal('1.00'), categoria=categoria,
+                stock=1, activo=activo, imagen='productos/prueba.jpg',
+            )
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'clave-segura-123')
+        cliente = User.objects.create_user('cliente', email='cliente@example.com')
+        Usuario.objects.create(user=cliente, cedula='12345678')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        self.client.cookies['admin_sessionid'] = self.client.cookies['sessionid'].value
+
+    def _buscar(self, app_label, model_name, field_name, term):
+        resp = self.client.get(reverse('admin:autocomplete'), {
+            'app_label': app_label, 'model_name': model_name, 'field_name': field_name, 'term': term,
+        })
+        self.assertEqual(resp.status_code, 200)
+        return [r['text'] for r in resp.json()['results']]
+
+    def test_productos_por_prefijo_activos_primero(self):
+        textos = self._buscar('pedidos', 'itempedido', 'producto', 'mar')
+        self.assertEqual(textos, ['Martillo - Herramientas', 'Martillo viejo - Herramientas'])
+
+    def test_usuarios_por_cedula_o_email(self):
+        self.assertEqual(self._buscar('pedidos', 'carrito', 'usuario', '1234'), ['cliente'])
+        self.assertEqual(self._buscar('pedidos', 'pedido', 'usuario', 'cliente@'), ['cliente'])
+
+    def test_formularios_usan_widget_autocompletar(self):
+        resp = self.client.get(reverse('admin:pedidos_carrito_add'))
+        self.assertContains(resp, 'class="admin-autocomplete"', count=2)
+        self.assertNotContains(resp, 'Martillo viejo')
+
+
+class ConsultasChangelistTests(TestCase):
+    """El changelist ejecuta el mismo número de consultas con 1 o 500 filas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'clave-segura-123')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+        self.client.cookies['admin_sessionid'] = self.client.cookies['sessionid'].value
+
+    def _consultas(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        return len(ctx)
+
+    def _crear(self, desde, hasta):
+        categorias = Categoria.objects.bulk_create([
+            Categoria(nombre=f'Categoría {i}', slug=f'categoria-{i}') for i in range(desde, hasta)
+        ])
+        productos = Producto.objects.bulk_create([
+            Producto(
+                nombre=f'Producto {c.pk}', descripcion='-', precio=Decimal('1.00'), categoria=c,
+                stock=1, imagen='productos/p.jpg', slug=f'producto-{c.pk}',
+            )
+            for c in categorias
+        ])
+        Comentario.objects.bulk_create([
+            Comentario(producto=p, usuario=self.admin, contenido='-') for p in productos
+        ])
+
+    def test_presupuesto_con_1_y_500_filas(self):
+        presupuestos = {
+            'admin:catalogo_categoria_changelist': 10,
+            'admin:catalogo_producto_changelist': 11,
+            'admin:catalogo_comentario_changelist': 10,
+        }
+        self._crear(0, 1)
+        for nombre in presupuestos:
+            # Primera visita: crea la configuración de moneda y llena la caché
+            self.client.get(reverse(nombre))
+        con_uno = {nombre: self._consultas(reverse(nombre)) for nombre in presupuestos}
+        self._crear(1, 500)
+        for nombre, presupuesto in presupuestos.items():
+            with self.subTest(nombre):
+                con_500 = self._consultas(reverse(nombre))
+                self.assertEqual(con_uno[nombre], con_500)
+                self.assertLessEqual(con_500, presupuesto)
+
+
+class CatalogoSinteticoTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        ajustes = override_settings(MEDIA_ROOT=media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def _generar(self):
+        call_command(
+            'generar_catalogo_sintetico', categorias=3, productos=20, usuarios=10, pedidos=30,
+            comentarios=15, carritos=4, imagenes=2, lote=7, stdout=StringIO(),
+        )
+
+    def test_genera_volumenes_con_totales_consistentes(self):
+        self._generar()
+        self.assertEqual(Categoria.objects.count(), 3)
+        self.assertEqual(Producto.objects.filter(slug__startswith='sint-producto-').count(), 20)
+        self.assertEqual(Usuario.objects.count(), 10)
+        self.assertEqual(Pedido.objects.count(), 30)
+        self.assertTrue(ItemPedido.objects.exists())
+        self.assertEqual(Comentario.objects.count(), 15)
+        self.assertEqual(Carrito.objects.values('usuario').distinct().count(), 4)
+        self.assertFalse(pedidos_descuadrados(Pedido.objects.order_by()).exists())
+        self.assertTrue(Producto.objects.first().imagen.storage.exists(Producto.objects.first().imagen.name))
+
+        with self.assertRaises(CommandError):
+            self._generar()
+
+
+class ImportarProductosTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.fotos = tempfile.mkdtemp()
+        for ruta in (self.media, self.fotos):
+            self.addCleanup(shutil.rmtree, ruta, ignore_errors=True)
+        ajustes = override_settings(MEDIA_ROOT=self.media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        with open(f'{self.fotos}/taladro.jpg', 'wb') as fh:
+            fh.write(b'jpeg')
+        self.categoria = Categoria.objects.create(nombre='Herramientas', slug='herramientas')
+        self.existente = Producto.objects.create(
+            nombre='Martillo', descripcion='Martillo', precio=Decimal('5.00'), categoria=self.categoria,
+            stock=3, imagen='productos/martillo.jpg', slug='martillo',
+        )
+
+    def _importar(self, texto, **opciones):
+        return importar.importar(BytesIO(texto.encode('utf-8')), 'productos.csv', **opciones)
+
+    def test_crea_y_actualiza_por_slug(self):
+        informe = self._importar(
+            'slug,nombre,precio,categoria,stock,imagen\n'
+            'martillo,Martillo grande,7.25,herramientas,10,\n'
+            'taladro,Taladro percutor,80,herramientas,4,taladro.jpg\n'
+            'sierra,Sierra,10,jardineria,1,taladro.jpg\n'
+            'lija,Lija,1,herramientas,x,taladro.jpg\n',
+            dir_imagenes=self.fotos, lote=2,
+        )
+        self.assertEqual((informe.creados, informe.actualizados), (1, 1))
+        self.assertEqual([(fila, slug) for fila, slug, _ in informe.errores], [(4, 'sierra'), (5, 'lija')])
+        self.assertIn('categoría desconocida', informe.errores[0][2])
+
+        self.existente.refresh_from_db()
+        self.assertEqual((self.existente.nombre, self.existente.precio, self.existente.stock), ('Martillo grande', Decimal('7.25'), 10))
+        self.assertEqual(self.existente.imagen.name, 'productos/martillo.jpg')
+        taladro = Producto.objects.get(slug='taladro')
+        self.assertEqual(taladro.categoria, self.categoria)
+        self.assertTrue(taladro.imagen.storage.exists(taladro.imagen.name))
+
+    def test_solo_columnas_presentes_y_cabeceras_de_exportacion(self):
+        informe = self._importar('Slug,Precio\nmartillo,6.00\nnuevo,3.00\n')
+        self.assertEqual(informe.actualizados, 1)
+        self.assertIn('producto nuevo sin columnas', informe.errores[0][2])
+        self.existente.refresh_from_db()
+        self.assertEqual((self.existente.precio, self.existente.stock, self.existente.nombre), (Decimal('6.00'), 3, 'Martillo'))
+
+    def test_csv_cp1252_y_filas_ilegibles(self):
+        # Excel en español guarda en cp1252; una fila ilegible se informa y la importación sigue
+        texto = 'slug,nombre,descripcion\nmartillo,Martillo de uña,x\nclavo,Clavo,' + 'x' * (csv.field_size_limit() + 1) + '\n'
+        texto += 'martillo,Martillo de uña ñ,y\n'
+        informe = importar.importar(BytesIO(texto.encode('cp1252')), 'productos.csv')
+        errores = sorted(informe.errores)
+        self.assertEqual([(fila, slug) for fila, slug, _ in errores], [(2, 'martillo'), (3, '')])
+        self.assertIn('CSV inválido', errores[1][2])
+        self.existente.refresh_from_db()
+        self.assertEqual(self.existente.nombre, 'Martillo de uña ñ')
+
+    @skipIf(exportar.Workbook is None, 'openpyxl no está instalado')
+    def test_xlsx_exportado_se_reimporta(self):
+        from openpyxl import Workbook, load_workbook
+
+        exportado = BytesIO()
+        exportar.escribir_xlsx('productos', Producto.objects.all(), exportado)
+        exportado.seek(0)
+        filas = list(load_workbook(exportado, read_only=True).active.iter_rows(values_only=True))
+        precio = filas[0].index('Precio')
+        libro = Workbook()
+        for fila in filas:
+            libro.active.append(fila)
+        libro.active.cell(row=2, column=precio + 1, value=6.75)
+        archivo = BytesIO()
+        libro.save(archivo)
+        archivo.seek(0)
+
+        informe = importar.importar(archivo, 'productos.xlsx')
+        self.assertEqual((informe.creados, informe.actualizados, informe.errores), (0, 1, []))
+        self.existente.refresh_from_db()
+        self.assertEqual((self.existente.nombre, self.existente.precio, self.existente.stock), ('Martillo', Decimal('6.75'), 3))
+
+    def test_imagen_fuera_del_directorio(self):
+        informe = self._importar(
+            'slug,nombre,precio,categoria,imagen\nclavo,Clavo,1,herramientas,../secreto.jpg\n', dir_imagenes=self.fotos,
+        )
+        self.assertEqual(informe.creados, 0)
+        self.assertIn('fuera del directorio', informe.errores[0][2])
+
+    def test_admin_sube_archivo(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'clave-segura-123')
+        self.client.force_login(admin)
+        self.client.cookies['admin_sessionid'] = self.client.cookies['sessionid'].value
+        url = reverse('admin:catalogo_producto_importar')
+        self.assertContains(self.client.get(reverse('admin:catalogo_producto_changelist')), url)
+
+        archivo = SimpleUploadedFile('productos.csv', 'slug,stock,activo\nmartillo,42,no\n'.encode('utf-8-sig'))
+        resp = self.client.post(url, {'archivo': archivo})
+        self.assertContains(resp, '0 creados, 1 actualizados')
+        self.existente.refresh_from_db()
+        self.assertEqual((self.existente.stock, self.existente.activo), (42, False))
+
+
+class ReajustePreciosTests(TestCase):
+    def setUp(self):
+        self.herramientas = Categoria.objects.create(nombre='Herramientas', slug='herramientas')
+        pinturas = Categoria.objects.create(nombre='Pinturas', slug='pinturas')
+        self.productos = {}
+        for slug, precio, moneda, categoria in [
+            ('martillo', '10.00', 'USD', self.herramientas),
+            ('taladro', '99.40', 'USD', self.herramientas),
+            ('serrucho', '365.00', 'VES', self.herramientas),
+            ('brocha', '4.00', 'USD', pinturas),
+        ]:
+            self.productos[slug] = Producto.objects.create(
+                nombre=slug.capitalize(), descripcion=slug, precio=Decimal(precio), moneda_precio=moneda,
+                categoria=categoria, imagen='productos/prueba.jpg', slug=slug,
+            )
+        TasaCambio.objects.create(moneda_origen='USD', moneda_destino='VES', tasa=Decimal('36.5'))
+
+    def _precios(self):
+        return {p.slug: (p.precio, p.moneda_precio) for p in Producto.objects.all()}
+
+    def test_vista_previa_no_modifica_y_coincide_con_aplicar(self):
+        filtros = {'categoria': self.herramientas.pk, 'moneda_precio': 'USD'}
+        antes = self._precios()
+        previa = reajustes.vista_previa(filtros, 'porcentaje', Decimal('12.5'), '0.99')
+        self.assertEqual(self._precios(), antes)
+        self.assertEqual(previa['productos'], 2)
+        self.assertEqual([(f['slug'], f['precio_nuevo']) for f in previa['filas']], [
+            ('martillo', Decimal('11.99')), ('taladro', Decimal('111.99')),
+        ])
+
+        with CaptureQueriesContext(connection) as consultas:
+            ajuste = reajustes.aplicar(filtros, 'porcentaje', Decimal('12.5'), '0.99')
+        self.assertEqual(len([q for q in consultas if q['sql'].startswith('UPDATE "catalogo_producto"')]), 1)
+        self.assertEqual(ajuste.productos, 2)
+        precios = self._precios()
+        self.assertEqual(precios['martillo'], (Decimal('11.99'), 'USD'))
+        self.assertEqual(precios['taladro'], (Decimal('111.99'), 'USD'))
+        self.assertEqual(precios['brocha'], antes['brocha'])
+
+    def test_conversion_y_redondeo(self):
+        reajustes.aplicar({'q': 'martillo serrucho'}, 'fijo', Decimal('0'), '1', moneda_destino='VES')
+        reajustes.aplicar({'q': 'martillo'}, 'porcentaje', Decimal('0'), '1', moneda_destino='VES')
+        precios = self._precios()
+        self.assertEqual(precios['martillo'], (Decimal('365.00'), 'VES'))
+        self.assertEqual(reajustes.vista_previa({'q': 'brocha'}, 'fijo', Decimal('-10'), '0.01')['filas'][0]['precio_nuevo'], Decimal('0.01'))
+
+    def test_conversion_sin_tasa_falla_sin_modificar(self):
+        Producto.objects.filter(slug='brocha').update(moneda_precio='COP')
+        antes = self._precios()
+        for funcion in (reajustes.vista_previa, reajustes.aplicar):
+            with self.assertRaisesMessage(reajustes.ErrorReajuste, 'COP→VES'):
+                funcion({}, 'porcentaje', Decimal('0'), '0.01', moneda_destino='VES')
+        self.assertEqual(self._precios(), antes)
+        self.assertFalse(AjustePrecios.objects.exists())
+        # Sin productos en COP en la selección, la conversión es posible
+        reajustes.aplicar({'categoria': self.herramientas.pk}, 'porcentaje', Decimal('0'), '0.01', moneda_destino='VES')
+
+    def test_revertir_respeta_cambios_posteriores(self):
+        ajuste = reajustes.aplicar({'categoria': self.herramientas.pk}, 'porcentaje', Decimal('10'), '0.01', moneda_destino='USD')
+        Producto.objects.filter(slug='taladro').update(precio=Decimal('1.00'))
+
+        revertidos, omitidos = reajustes.revertir(ajuste)
+        self.assertEqual((revertidos, omitidos), (2, 1))
+        precios = self._precios()
+        self.assertEqual(precios['martillo'], (Decimal('10.00'), 'USD'))
+        self.assertEqual(precios['serrucho'], (Decimal('365.00'), 'VES'))
+        self.assertEqual(precios['taladro'], (Decimal('1.00'), 'USD'))
+        with self.assertRaises(reajustes.ErrorReajuste):
+            reajustes.revertir(ajuste)
+
+    def test_admin_vista_previa_y_aplicar(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'clave-segura-123')
+        self.client.force_login(admin)
+        self.client.cookies['admin_sessionid'] = self.client.cookies['sessionid'].value
+        url = reverse('admin:catalogo_producto_reajustar')
+        datos = {'categoria': self.herramientas.pk, 'tipo': 'fijo', 'valor': '1', 'redondeo': '0.01', 'solo_activos': 'on'}
+
+        resp = self.client.post(url, {**datos, 'vista_previa': '1'})
+        self.assertContains(resp, 'Aplicar a 3 productos')
+        self.assertEqual(Producto.objects.get(slug='martillo').precio, Decimal('10.00'))
+
+        resp = self.client.post(url, {**datos, 'aplicar': '1'})
+        ajuste = AjustePrecios.objects.get()
+        self.assertRedirects(resp, reverse('admin:catalogo_ajusteprecios_change', args=[ajuste.pk]))
+        self.assertEqual(Producto.objects.get(slug='martillo').precio, Decimal('11.00'))
+        self.assertContains(self.client.get(resp.url), 'Martillo')
+
+        self.client.post(reverse('admin:catalogo_ajusteprecios_changelist'), {
+            'action': 'revertir', '_selected_action': [ajuste.pk],
+        })
+        self.assertEqual(Producto.objects.get(slug='martillo').precio, Decimal('10.00'))
+
+
+class PreciosIndexadosTests(TransactionTestCase):
+    # Commits reales: la publicación de tasas se envía en on_commit, una vez por transacción
+    def setUp(self):
+        categoria = Categoria.objects.create(nombre='Herramientas', slug='herramientas')
+        TasaCambio.objects.create(moneda_origen='USD', moneda_destino='VES', tasa=Decimal('36.5'))
+        datos = dict(descripcion='x', categoria=categoria, imagen='productos/prueba.jpg')
+        self.indexado = Producto.objects.create(
+            nombre='Taladro', slug='taladro', precio=Decimal('1.00'), moneda_precio='USD',
+            indexado_usd=True, precio_referencia_usd=Decimal('10.00'), **datos,
+        )
+        self.fijo = Producto.objects.create(nombre='Lija', slug='lija', precio=Decimal('50.00'), moneda_precio='VES', **datos)
+
+    def test_save_calcula_precio_en_bolivares(self):
+        self.assertEqual((self.indexado.precio, self.indexado.moneda_precio), (Decimal('365.00'), 'VES'))
+
+    def test_nueva_tasa_reindexa_en_una_sentencia(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'clave-segura-123')
+        self.client.force_login(admin)
+        self.client.cookies['admin_sessionid'] = self.client.cookies['sessionid'].value
+        TasaCambio.snapshot_cacheado()
+        antes = Producto.objects.get(pk=self.indexado.pk).updated_at
+
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.post(reverse('admin:tasa_editar_directo', args=['VES']), {'valor': '40.125'})
+        # Un UPDATE por publicación, filtrado por indexado_usd (no uno por producto)
+        actualizaciones = [q['sql'] for q in consultas if q['sql'].startswith('UPDATE "catalogo_producto"')]
+        self.assertEqual(len(actualizaciones), 1)
+        self.assertIn('"indexado_usd"', actualizaciones[0])
+
+        indexado = Producto.objects.get(pk=self.indexado.pk)
+        self.assertEqual((indexado.precio, indexado.moneda_precio), (Decimal('401.25'), 'VES'))
+        self.assertGreater(indexado.updated_at, antes)
+        self.assertEqual(Producto.objects.get(pk=self.fijo.pk).precio, Decimal('50.00'))
+        self.assertEqual(TasaCambio.snapshot_cacheado().tasa('USD', 'VES'), Decimal('40.125'))
+        self.assertEqual(Producto.reindexar_precios(), 0)
+
+    def test_reajuste_e_importacion_no_tocan_indexados(self):
+        previa = reajustes.vista_previa({}, 'porcentaje', Decimal('10'), '0.01')
+        self.assertEqual((previa['productos'], previa['indexados']), (1, 1))
+        reajustes.aplicar({}, 'porcentaje', Decimal('10'), '0.01')
+        self.assertEqual(Producto.objects.get(pk=self.indexado.pk).precio, Decimal('365.00'))
+        self.assertEqual(Producto.objects.get(pk=self.fijo.pk).precio, Decimal('55.00'))
+
+        informe = importar.importar(BytesIO(b'slug,precio,stock\ntaladro,9.00,4\nlija,60.00,4\n'), 'productos.csv')
+        self.assertEqual(informe.actualizados, 1)
+        self.assertEqual([(fila, slug) for fila, slug, _ in informe.errores], [(2, 'taladro')])
+        self.assertEqual(Producto.objects.get(pk=self.indexado.pk).precio, Decimal('365.00'))
+        informe = importar.importar(BytesIO(b'slug,stock\ntaladro,4\n'), 'productos.csv')
+        self.assertEqual((informe.actualizados, Producto.objects.get(pk=self.indexado.pk).stock), (1, 4))
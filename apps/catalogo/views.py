@@ -36,7 +36,7 @@ def productos_por_categoria(request, slug):
 
 
 def producto_detalle(request, slug):
-    producto = get_object_or_404(Producto, slug=slug, activo=True)
+    producto = get_object_or_404(Producto.objects.select_related('categoria'), slug=slug, activo=True)
     if request.method == 'POST':
         contenido = (request.POST.get('contenido') or '').strip()
         nombre = (request.POST.get('nombre') or '').strip()
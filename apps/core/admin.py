@@ -1,9 +1,15 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.http import FileResponse, Http404
+from django.shortcuts import render
+from django.urls import path
 from django.utils.html import format_html
 from django.utils import timezone
-from .models import Usuario, TasaCambio, ConfiguracionMoneda
+from . import consultas_lentas, perfilador
+from .autocompletar import AutocompletarMixin
+from .models import ConsultaLenta, PerfilRequest, Usuario, TasaCambio, ConfiguracionMoneda
 
 # Register your models here.
 
@@ -14,11 +20,15 @@ class UsuarioInline(admin.StackedInline):
     fields = ('cedula', 'telefono', 'direccion', 'fecha_nacimiento', 'es_empleado')
     readonly_fields = ('created_at',)
 
-class UsuarioAdmin(UserAdmin):
+class UsuarioAdmin(AutocompletarMixin, UserAdmin):
     inlines = (UsuarioInline,)
     list_display = ('username', 'email', 'first_name', 'last_name', 'is_staff', 'get_cedula', 'get_es_empleado')
     list_filter = ('is_staff', 'is_superuser', 'is_active', 'date_joined', 'usuario__es_empleado')
     search_fields = ('username', 'first_name', 'last_name', 'email', 'usuario__cedula')
+    # Widgets de autocompletar (pedidos, carrito, comentarios): prefijo indexado
+    autocomplete_search_fields = ('^username', '^email', '^usuario__cedula')
+    autocomplete_ordering = ('username',)
+    list_select_related = ('usuario',)
     
     def get_cedula(self, obj):
         try:
@@ -46,6 +56,8 @@ class UsuarioDirectAdmin(admin.ModelAdmin):
     list_filter = ('es_empleado', 'created_at')
     search_fields = ('cedula', 'user__username', 'user__first_name', 'user__last_name', 'user__email')
     readonly_fields = ('created_at',)
+    autocomplete_fields = ('user',)
+    list_select_related = ('user',)
     fieldsets = (
         ('Información del Usuario', {
             'fields': ('user', 'cedula')
@@ -72,6 +84,7 @@ class TasaCambioAdmin(admin.ModelAdmin):
     list_filter = ('activa', 'moneda_origen', 'moneda_destino', 'fecha_actualizacion')
     search_fields = ('moneda_origen', 'moneda_destino', 'notas')
     list_editable = ('activa',)
+    list_select_related = ('actualizada_por',)
     readonly_fields = ('fecha_actualizacion', 'actualizada_por')
     
     fieldsets = (
@@ -105,8 +118,12 @@ class TasaCambioAdmin(admin.ModelAdmin):
         monedas = ['VES', 'COP', 'EUR']
         tasas = {}
         tasas_list = []
+        activas = {
+            t.moneda_destino: t
+            for t in TasaCambio.objects.filter(moneda_origen='USD', moneda_destino__in=monedas, activa=True)
+        }
         for m in monedas:
-            tasa_obj = TasaCambio.objects.filter(moneda_origen='USD', moneda_destino=m, activa=True).first()
+            tasa_obj = activas.get(m)
             if tasa_obj:
                 tasas[m] = {
                     'valor': tasa_obj.tasa,
@@ -121,7 +138,7 @@ class TasaCambioAdmin(admin.ModelAdmin):
         extra_context['tasas_resumen_list'] = tasas_list
         # símbolos desde la configuración
         try:
-            config = ConfiguracionMoneda.obtener_configuracion()
+            config = ConfiguracionMoneda.configuracion_cacheada()
             extra_context['simbolos'] = config.simbolos
         except Exception:
             extra_context['simbolos'] = {'USD': '$', 'VES': 'Bs', 'COP': '$', 'EUR': '€'}
@@ -160,37 +177,39 @@ class TasaCambioAdmin(admin.ModelAdmin):
                 messages.error(request, 'Valor inválido. Debe ser un número mayor que cero.')
                 return redirect(request.path)
 
-            # Crear o actualizar tasa USD -> moneda
-            tasa_obj, created = TasaCambio.objects.update_or_create(
-                moneda_origen='USD',
-                moneda_destino=moneda,
-                defaults={
-                    'tasa': v,
-                    'activa': True,
-                    'actualizada_por': request.user,
-                }
-            )
-
-            # Asegurar tasa inversa también existe (recíproca)
-            try:
-                if v != 0:
-                    tasa_inv_val = (Decimal('1.0') / v).quantize(Decimal('0.000001'))
-                else:
-                    tasa_inv_val = None
-            except Exception:
-                tasa_inv_val = None
-
-            if tasa_inv_val:
-                TasaCambio.objects.update_or_create(
-                    moneda_origen=moneda,
-                    moneda_destino='USD',
+            # Ambas tasas en una transacción: se publican juntas (ver core.signals.tasas_publicadas)
+            with transaction.atomic():
+                # Crear o actualizar tasa USD -> moneda
+                tasa_obj, created = TasaCambio.objects.update_or_create(
+                    moneda_origen='USD',
+                    moneda_destino=moneda,
                     defaults={
-                        'tasa': tasa_inv_val,
+                        'tasa': v,
                         'activa': True,
                         'actualizada_por': request.user,
                     }
                 )
 
+                # Asegurar tasa inversa también existe (recíproca)
+                try:
+                    if v != 0:
+                        tasa_inv_val = (Decimal('1.0') / v).quantize(Decimal('0.000001'))
+                    else:
+                        tasa_inv_val = None
+                except Exception:
+                    tasa_inv_val = None
+
+                if tasa_inv_val:
+                    TasaCambio.objects.update_or_create(
+                        moneda_origen=moneda,
+                        moneda_destino='USD',
+                        defaults={
+                            'tasa': tasa_inv_val,
+                            'activa': True,
+                            'actualizada_por': request.user,
+                        }
+                    )
+
             messages.success(request, f'Tasa USD→{moneda} guardada: 1 USD = {v} {moneda}')
             from django.urls import reverse
             return redirect(reverse('admin:core_tasacambio_changelist'))
@@ -276,12 +295,16 @@ class TasaCambioAdmin(admin.ModelAdmin):
     def activar_tasas(self, request, queryset):
         """Activa las tasas seleccionadas"""
         updated = queryset.update(activa=True)
+        # update() no emite señales: registrar el cambio de tasas explícitamente
+        ConfiguracionMoneda.incrementar_version_tasas()
         self.message_user(request, f'{updated} tasas activadas.')
     activar_tasas.short_description = "✅ Activar tasas seleccionadas"
     
     def desactivar_tasas(self, request, queryset):
         """Desactiva las tasas seleccionadas"""
         updated = queryset.update(activa=False)
+        # update() no emite señales: registrar el cambio de tasas explícitamente
+        ConfiguracionMoneda.incrementar_version_tasas()
         self.message_user(request, f'{updated} tasas desactivadas.')
     desactivar_tasas.short_description = "❌ Desactivar tasas seleccionadas"
     
@@ -409,3 +432,85 @@ class ConfiguracionMonedaAdmin(admin.ModelAdmin):
         
         self.message_user(request, f'Configuración de Venezuela aplicada. {count} tasas de cambio creadas.')
     aplicar_configuracion_venezuela.short_description = "🇻🇪 Aplicar configuración Venezuela"
+
+
+@admin.register(ConsultaLenta)
+class ConsultaLentaAdmin(admin.ModelAdmin):
+    """Últimas consultas lentas registradas y su agregado por SQL normalizado."""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        entradas = consultas_lentas.ultimas()
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Consultas lentas',
+            'opts': self.model._meta,
+            'umbral_ms': consultas_lentas.umbral_ms(),
+            'archivo': consultas_lentas.archivo(),
+            'entradas': entradas[:50],
+            'grupos': consultas_lentas.agrupar(entradas),
+            **(extra_context or {}),
+        }
+        return render(request, 'admin/core/consultalenta/lista.html', context)
+
+
+@admin.register(PerfilRequest)
+class PerfilRequestAdmin(admin.ModelAdmin):
+    """Perfiles cProfile recientes (ver core.perfilador): resumen y descarga del .pstats."""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        urls = super().get_urls()
+        custom = [
+            path('<str:nombre>/ver/', self.admin_site.admin_view(self.ver_view), name='core_perfilrequest_ver'),
+            path('<str:nombre>/descargar/', self.admin_site.admin_view(self.descargar_view), name='core_perfilrequest_descargar'),
+        ]
+        return custom + urls
+
+    def _contexto(self, request, **extra):
+        return {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'clave_configurada': bool(perfilador.clave()),
+            'cabecera': perfilador.CABECERA,
+            'parametro': perfilador.PARAMETRO,
+            **extra,
+        }
+
+    def changelist_view(self, request, extra_context=None):
+        context = self._contexto(
+            request, title='Perfiles de requests', perfiles=perfilador.recientes(), **(extra_context or {}),
+        )
+        return render(request, 'admin/core/perfilrequest/lista.html', context)
+
+    def ver_view(self, request, nombre):
+        if not self.has_view_permission(request):
+            raise Http404
+        orden = request.GET.get('orden') if request.GET.get('orden') in ('cumulative', 'tottime', 'ncalls') else 'cumulative'
+        texto = perfilador.resumen(nombre, orden=orden)
+        if texto is None:
+            raise Http404
+        context = self._contexto(request, title=f'Perfil {nombre}', nombre=nombre, orden=orden, resumen=texto)
+        return render(request, 'admin/core/perfilrequest/ver.html', context)
+
+    def descargar_view(self, request, nombre):
+        ruta = perfilador.ruta_pstats(nombre)
+        if ruta is None or not self.has_view_permission(request):
+            raise Http404
+        return FileResponse(open(ruta, 'rb'), as_attachment=True, filename=f'{nombre}.pstats')
@@ -13,3 +13,6 @@ class CoreConfig(AppConfig):
             from . import signals  # noqa: F401
         except Exception:
             pass
+        # Registro de consultas lentas (solo si CONSULTAS_LENTAS_MS > 0)
+        from . import consultas_lentas
+        consultas_lentas.instalar()
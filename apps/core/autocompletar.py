@@ -0,0 +1,32 @@
+"""Búsquedas de autocompletar del admin.
+
+Los widgets ``autocomplete_fields`` consultan ``admin:autocomplete`` y reciben
+resultados paginados (20 por página), así que el tamaño de la página del admin
+no depende del tamaño de la tabla. ``AutocompletarMixin`` permite que esas
+consultas usen campos de búsqueda por prefijo (``^campo``, que aprovechan los
+índices ``UPPER(campo) varchar_pattern_ops`` que crean en PostgreSQL las
+migraciones ``*_indices_autocompletar``) y un orden propio, sin cambiar la
+búsqueda del changelist.
+"""
+
+from django.urls import reverse
+
+
+def es_autocompletar(request):
+    return request.path == reverse('admin:autocomplete')
+
+
+class AutocompletarMixin:
+    autocomplete_search_fields = ()
+    autocomplete_ordering = ()
+
+    def get_search_fields(self, request):
+        if self.autocomplete_search_fields and es_autocompletar(request):
+            return self.autocomplete_search_fields
+        return super().get_search_fields(request)
+
+    def get_search_results(self, request, queryset, search_term):
+        queryset, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if self.autocomplete_ordering and es_autocompletar(request):
+            queryset = queryset.order_by(*self.autocomplete_ordering)
+        return queryset, may_have_duplicates
@@ -0,0 +1,190 @@
+"""Micro-benchmarks de las funciones que se ejecutan por producto o por request.
+
+Cada caso (``@caso``) prepara sus datos una vez y devuelve una función sin
+argumentos que se cronometra ``iteraciones`` veces por repetición. El resultado
+(ns por llamada: mínimo, mediana y media de las repeticiones) se guarda como
+JSON con ``manage.py micro_benchmarks --json`` y ``comparar`` lo contrasta con
+una corrida anterior para detectar regresiones.
+
+Los casos usan productos sin guardar; la configuración de moneda y las tasas
+salen de la base de datos configurada (como en un request real). Los casos que
+consultan la base de datos por llamada tienen ``divisor`` para correr menos
+iteraciones.
+"""
+
+import platform
+import statistics
+import time
+from decimal import Decimal
+from importlib import import_module
+
+import django
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+
+CASOS = {}
+
+
+def caso(nombre, divisor=1):
+    """Registra un caso: ``preparar()`` devuelve la función a cronometrar."""
+    def registrar(preparar):
+        CASOS[nombre] = (preparar, divisor)
+        return preparar
+    return registrar
+
+
+def _producto(moneda='USD', pk=1):
+    from catalogo.models import Categoria, Producto
+
+    categoria = Categoria(pk=1, nombre='Herramientas', slug='herramientas')
+    return Producto(
+        pk=pk, nombre='Martillo de uña 16 oz', slug='martillo-de-una-16-oz',
+        descripcion='Martillo de acero forjado con mango de fibra de vidrio y agarre antideslizante.',
+        precio=Decimal('12.50'), moneda_precio=moneda, categoria=categoria, stock=3, stock_minimo=5,
+        imagen='productos/martillo.jpg',
+    )
+
+
+def _request(ruta='/catalogo/productos/', sesion=None):
+    from django.test import RequestFactory
+
+    request = RequestFactory().get(ruta)
+    request.session = import_module(settings.SESSION_ENGINE).SessionStore()
+    request.session.update(sesion or {})
+    return request
+
+
+@caso('producto.obtener_precio_en_moneda')
+def _obtener_precio_en_moneda():
+    from core.models import TasaCambio
+
+    producto, tasas = _producto(), TasaCambio.snapshot()
+    return lambda: producto.obtener_precio_en_moneda('VES', tasas=tasas)
+
+
+@caso('producto.obtener_precio_en_moneda[sin_snapshot]', divisor=20)
+def _obtener_precio_en_moneda_sin_snapshot():
+    producto = _producto()
+    return lambda: producto.obtener_precio_en_moneda('VES')
+
+
+@caso('producto.obtener_precios_multiple_monedas', divisor=50)
+def _obtener_precios_multiple_monedas():
+    producto = _producto()
+    return producto.obtener_precios_multiple_monedas
+
+
+@caso('producto.precio_formateado')
+def _precio_formateado():
+    producto = _producto()
+    return lambda: producto.precio_formateado
+
+
+@caso('tag.precio_en_moneda')
+def _tag_precio_en_moneda():
+    from catalogo.templatetags.precios import precio_en_moneda
+
+    producto = _producto()
+    return lambda: precio_en_moneda(producto, 'VES')
+
+
+@caso('plantilla._product_card', divisor=10)
+def _product_card():
+    from django.template.loader import get_template
+
+    plantilla = get_template('catalogo/_product_card.html')
+    contexto = {'producto': _producto(), 'moneda_actual': 'VES', 'simbolo_moneda': 'Bs', 'csrf_token': 'x' * 64}
+    return lambda: plantilla.render(contexto)
+
+
+@caso('context_processors.cart', divisor=20)
+def _context_processor_cart():
+    from core.context_processors import cart
+
+    request = _request(sesion={'cart': {'1': 2, '7': 1}, 'moneda': 'VES'})
+    return lambda: cart(request)
+
+
+@caso('middleware.SplitSessionMiddleware', divisor=5)
+def _split_session():
+    from django.http import HttpResponse
+
+    from core.middleware import SplitSessionMiddleware
+
+    def vista(request):
+        request.session.get('cart')
+        return HttpResponse()
+
+    middleware = SplitSessionMiddleware(vista)
+    rutas = [_request('/catalogo/productos/'), _request('/admin/')]
+
+    def ejecutar():
+        for request in rutas:
+            middleware(request)
+    return ejecutar
+
+
+@caso('fix_mojibake._fix_text')
+def _fix_text():
+    from catalogo.management.commands.fix_mojibake import _fix_text
+
+    textos = ['Herramientas ElA©ctricas', 'ConstrucciÃ³n y Obra', 'Pinturas y Acabados']
+    return lambda: [_fix_text(texto) for texto in textos]
+
+
+def medir(funcion, iteraciones, repeticiones):
+    """ns por llamada de cada repetición (tras una pasada de calentamiento)."""
+    for _ in range(min(iteraciones, 100)):
+        funcion()
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter_ns()
+        for _ in range(iteraciones):
+            funcion()
+        tiempos.append((time.perf_counter_ns() - inicio) / iteraciones)
+    return tiempos
+
+
+def ejecutar(nombres=None, iteraciones=5_000, repeticiones=5):
+    """Corre los casos (todos o ``nombres``) y devuelve el informe como dict."""
+    resultados = {}
+    for nombre, (preparar, divisor) in CASOS.items():
+        if nombres and nombre not in nombres:
+            continue
+        n = max(1, iteraciones // divisor)
+        tiempos = medir(preparar(), n, repeticiones)
+        resultados[nombre] = {
+            'iteraciones': n,
+            'min_ns': round(min(tiempos), 1),
+            'mediana_ns': round(statistics.median(tiempos), 1),
+            'media_ns': round(statistics.fmean(tiempos), 1),
+            'desviacion_ns': round(statistics.stdev(tiempos), 1) if len(tiempos) > 1 else 0.0,
+        }
+    return {
+        'meta': {
+            'fecha': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'base_datos': connection.vendor,
+            'repeticiones': repeticiones,
+        },
+        'resultados': resultados,
+    }
+
+
+def comparar(anterior, actual, tolerancia=0.10):
+    """Filas ``(nombre, ns_antes, ns_ahora, variación, regresión)`` por caso.
+
+    Se compara el mínimo de las repeticiones (el menos afectado por el ruido
+    del sistema); hay regresión si empeora más que ``tolerancia`` (fracción).
+    """
+    filas = []
+    for nombre, datos in actual['resultados'].items():
+        previo = anterior.get('resultados', {}).get(nombre)
+        if not previo or not previo.get('min_ns'):
+            continue
+        variacion = datos['min_ns'] / previo['min_ns'] - 1
+        filas.append((nombre, previo['min_ns'], datos['min_ns'], variacion, variacion > tolerancia))
+    return filas
@@ -0,0 +1,300 @@
+"""Pruebas de carga de los flujos de la tienda (ver ``manage.py prueba_carga``).
+
+Cada usuario virtual corre en su propio hilo con su propia sesión (cookies) y
+repite, hasta agotar la duración, un escenario elegido al azar según ``PESOS``:
+
+- ``navegar``: inicio, listado paginado, categoría y detalle de producto,
+- ``buscar``: listado con ``?q=``,
+- ``moneda``: cambio de moneda y listado en la moneda nueva,
+- ``carrito``: agregar productos al carrito (anónimo o con sesión),
+- ``login``: inicio de sesión con carrito anónimo (fusión de carritos),
+- ``checkout``: compra de productos del grupo "caliente" (pocos productos con
+  poco stock) para que los pedidos compitan por el mismo stock.
+
+El tráfico va contra un servidor (``ClienteHTTP``, ej. ``runserver`` o
+Gunicorn local) o contra la aplicación WSGI en el mismo proceso
+(``ClienteWSGI``). Ambos usan la base de datos configurada: ``preparar()`` crea
+los usuarios de carga y repone el stock de los productos calientes.
+"""
+
+import http.cookiejar
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.urls import reverse
+
+
+PREFIJO_USUARIO = 'carga-'
+CLAVE_USUARIO = 'carga-clave-123'
+PESOS = {'navegar': 45, 'buscar': 15, 'moneda': 10, 'carrito': 15, 'login': 5, 'checkout': 10}
+TERMINOS = ('martillo', 'taladro', 'pintura', 'llave', 'guantes', 'cemento', 'tornillo', 'sierra')
+
+
+def percentil(valores, p):
+    """Percentil ``p`` (0-100) por rango más cercano de una lista ordenada."""
+    if not valores:
+        return 0.0
+    indice = max(0, min(len(valores) - 1, int(round(p / 100 * len(valores))) - 1))
+    return valores[indice]
+
+
+class Resultados:
+    """Latencias y errores por nombre de URL, compartidos entre hilos."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencias = defaultdict(list)
+        self.errores = defaultdict(int)
+        self.estados = defaultdict(lambda: defaultdict(int))
+        self.inicio = time.monotonic()
+        self.fin = None
+
+    def registrar(self, nombre, estado, segundos):
+        with self._lock:
+            self.latencias[nombre].append(segundos)
+            self.estados[nombre][estado] += 1
+            if estado == 0 or estado >= 400:
+                self.errores[nombre] += 1
+
+    def terminar(self):
+        self.fin = time.monotonic()
+
+    def resumen(self):
+        """Filas por URL (y una fila ``TOTAL``) con throughput, percentiles en ms y errores."""
+        duracion = max((self.fin or time.monotonic()) - self.inicio, 1e-9)
+        filas = []
+        todas = []
+        for nombre in sorted(self.latencias):
+            latencias = sorted(self.latencias[nombre])
+            todas.extend(latencias)
+            filas.append(self._fila(nombre, latencias, self.errores[nombre], duracion, dict(self.estados[nombre])))
+        todas.sort()
+        filas.append(self._fila('TOTAL', todas, sum(self.errores.values()), duracion, {}))
+        return {'duracion_s': round(duracion, 2), 'urls': filas}
+
+    @staticmethod
+    def _fila(nombre, latencias, errores, duracion, estados):
+        n = len(latencias)
+        return {
+            'url': nombre,
+            'requests': n,
+            'rps': round(n / duracion, 2),
+            'p50_ms': round(percentil(latencias, 50) * 1000, 1),
+            'p95_ms': round(percentil(latencias, 95) * 1000, 1),
+            'p99_ms': round(percentil(latencias, 99) * 1000, 1),
+            'errores': errores,
+            'tasa_error': round(errores / n, 4) if n else 0.0,
+            'estados': {str(k): v for k, v in sorted(estados.items())},
+        }
+
+
+class _SinRedirecciones(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class ClienteHTTP:
+    """Sesión de un usuario virtual contra un servidor real (cookies y CSRF propios)."""
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), _SinRedirecciones,
+        )
+
+    def _csrf(self):
+        for cookie in self.cookies:
+            if cookie.name == settings.CSRF_COOKIE_NAME:
+                return cookie.value
+        return ''
+
+    def solicitar(self, metodo, ruta, datos=None):
+        url = self.base_url + ruta
+        cuerpo = None
+        cabeceras = {'Referer': url}
+        if metodo == 'POST':
+            datos = dict(datos or {}, csrfmiddlewaretoken=self._csrf())
+            cuerpo = urllib.parse.urlencode(datos).encode()
+            cabeceras['X-CSRFToken'] = datos['csrfmiddlewaretoken']
+        elif datos:
+            url += '?' + urllib.parse.urlencode(datos)
+        peticion = urllib.request.Request(url, data=cuerpo, headers=cabeceras, method=metodo)
+        try:
+            with self.opener.open(peticion, timeout=self.timeout) as respuesta:
+                respuesta.read()
+                return respuesta.status, respuesta.headers.get('Location', '')
+        except urllib.error.HTTPError as exc:
+            exc.read()
+            return exc.code, exc.headers.get('Location', '')
+        except (urllib.error.URLError, OSError):
+            return 0, ''
+
+
+class ClienteWSGI:
+    """Sesión de un usuario virtual contra la aplicación WSGI en el mismo proceso."""
+
+    def __init__(self):
+        from django.test import Client
+
+        hosts = [h for h in settings.ALLOWED_HOSTS if h not in ('*', '') and not h.startswith('.')]
+        self.cliente = Client(HTTP_HOST=hosts[0] if hosts else 'localhost', raise_request_exception=False)
+
+    def solicitar(self, metodo, ruta, datos=None):
+        try:
+            if metodo == 'POST':
+                respuesta = self.cliente.post(ruta, datos or {})
+            else:
+                respuesta = self.cliente.get(ruta, datos or {})
+        except Exception:
+            return 0, ''
+        finally:
+            from django.db import connection
+            connection.close_if_unusable_or_obsolete()
+        return respuesta.status_code, respuesta.get('Location', '')
+
+
+def preparar(usuarios, productos_calientes=5, stock=50):
+    """Crea los usuarios de carga y repone el stock del grupo caliente.
+
+    Devuelve el catálogo que usan los escenarios (ids y slugs).
+    """
+    from catalogo.models import Categoria, Producto
+
+    existentes = set(
+        User.objects.filter(username__startswith=PREFIJO_USUARIO).values_list('username', flat=True)
+    )
+    clave = make_password(CLAVE_USUARIO)
+    User.objects.bulk_create([
+        User(username=f'{PREFIJO_USUARIO}{i}', email=f'{PREFIJO_USUARIO}{i}@example.com', password=clave)
+        for i in range(usuarios) if f'{PREFIJO_USUARIO}{i}' not in existentes
+    ])
+
+    activos = Producto.objects.filter(activo=True).order_by('pk')
+    calientes = list(activos.values_list('pk', 'slug')[:productos_calientes])
+    Producto.objects.filter(pk__in=[pk for pk, _ in calientes]).update(stock=stock)
+    return {
+        'productos': list(activos.values_list('pk', 'slug')),
+        'categorias': list(Categoria.objects.filter(activa=True).values_list('slug', flat=True)),
+        'calientes': calientes,
+    }
+
+
+class UsuarioVirtual:
+    """Un usuario que repite escenarios hasta ``hasta`` (``time.monotonic()``)."""
+
+    def __init__(self, numero, cliente, catalogo, resultados, azar):
+        self.username = f'{PREFIJO_USUARIO}{numero}'
+        self.cliente = cliente
+        self.catalogo = catalogo
+        self.resultados = resultados
+        self.azar = azar
+        self.autenticado = False
+
+    def _pedir(self, nombre, metodo, ruta, datos=None):
+        inicio = time.perf_counter()
+        estado, destino = self.cliente.solicitar(metodo, ruta, datos)
+        self.resultados.registrar(nombre, estado, time.perf_counter() - inicio)
+        return estado, destino
+
+    def _producto(self, calientes=False):
+        if calientes and self.catalogo['calientes']:
+            return self.azar.choice(self.catalogo['calientes'])
+        return self.azar.choice(self.catalogo['productos'])
+
+    def navegar(self):
+        self._pedir('core:index', 'GET', reverse('core:index'))
+        self._pedir('catalogo:productos_lista', 'GET', reverse('catalogo:productos_lista'),
+                    {'page': self.azar.randint(1, 3)})
+        if self.catalogo['categorias']:
+            slug = self.azar.choice(self.catalogo['categorias'])
+            self._pedir('catalogo:productos_por_categoria', 'GET',
+                        reverse('catalogo:productos_por_categoria', args=[slug]))
+        _, slug = self._producto()
+        self._pedir('catalogo:producto_detalle', 'GET', reverse('catalogo:producto_detalle', args=[slug]))
+
+    def buscar(self):
+        self._pedir('catalogo:productos_lista', 'GET', reverse('catalogo:productos_lista'),
+                    {'q': self.azar.choice(TERMINOS)})
+
+    def moneda(self):
+        self._pedir('core:set_moneda', 'GET', reverse('core:set_moneda'), {'m': self.azar.choice(('USD', 'VES', 'EUR'))})
+        self._pedir('catalogo:productos_lista', 'GET', reverse('catalogo:productos_lista'))
+
+    def carrito(self, calientes=False):
+        for _ in range(self.azar.randint(1, 3)):
+            # Desde el detalle, como en el sitio (también deja la cookie CSRF)
+            pk, slug = self._producto(calientes)
+            self._pedir('catalogo:producto_detalle', 'GET', reverse('catalogo:producto_detalle', args=[slug]))
+            self._pedir('pedidos:carrito_agregar', 'POST', reverse('pedidos:carrito_agregar'),
+                        {'product_id': pk, 'quantity': self.azar.randint(1, 2)})
+        self._pedir('pedidos:carrito_ver', 'GET', reverse('pedidos:carrito_ver'))
+
+    def login(self):
+        ruta = reverse('login')
+        # GET previo: cookie CSRF; con carrito anónimo el login fusiona los carritos
+        self._pedir('login', 'GET', ruta)
+        estado, _ = self._pedir('login', 'POST', ruta, {'username': self.username, 'password': CLAVE_USUARIO})
+        self.autenticado = estado == 302
+
+    def checkout(self):
+        if not self.autenticado:
+            self.carrito(calientes=True)
+            self.login()
+            if not self.autenticado:
+                return
+        else:
+            self.carrito(calientes=True)
+        self._pedir('pedidos:checkout', 'GET', reverse('pedidos:checkout'))
+        estado, destino = self._pedir('pedidos:checkout', 'POST', reverse('pedidos:checkout'), {
+            'direccion_entrega': 'Calle de prueba 1', 'telefono_contacto': '04120000000', 'metodo_pago': 'efectivo',
+        })
+        if estado == 302 and '/pedido/' in destino:
+            self._pedir('pedidos:pedido_confirmacion', 'GET', urllib.parse.urlsplit(destino).path)
+
+    def correr(self, hasta):
+        escenarios = list(PESOS)
+        pesos = [PESOS[e] for e in escenarios]
+        while time.monotonic() < hasta:
+            escenario = self.azar.choices(escenarios, pesos)[0]
+            if escenario == 'login' and self.autenticado:
+                escenario = 'carrito'
+            getattr(self, escenario)()
+
+
+def ejecutar(crear_cliente, catalogo, usuarios=10, duracion=30, semilla=1):
+    """Corre ``usuarios`` hilos durante ``duracion`` segundos y devuelve los ``Resultados``.
+
+    ``crear_cliente`` es un callable sin argumentos que devuelve un cliente nuevo
+    (``ClienteHTTP`` o ``ClienteWSGI``) por usuario virtual.
+    """
+    resultados = Resultados()
+    hasta = time.monotonic() + duracion
+    virtuales = [
+        UsuarioVirtual(i, crear_cliente(), catalogo, resultados, random.Random(semilla * 100003 + i))
+        for i in range(usuarios)
+    ]
+
+    def correr(usuario):
+        try:
+            usuario.correr(hasta)
+        finally:
+            from django.db import connection
+            connection.close()
+
+    hilos = [threading.Thread(target=correr, args=(u,), daemon=True) for u in virtuales]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    resultados.terminar()
+    return resultados
@@ -0,0 +1,199 @@
+"""Registro de consultas lentas con su plan de ejecución.
+
+Con ``settings.CONSULTAS_LENTAS_MS`` > 0 cada conexión nueva recibe un
+``execute_wrapper`` que mide las consultas. Las que superan el umbral se
+registran como una línea JSON (logger ``core.consultas_lentas``, que escribe en
+``CONSULTAS_LENTAS_ARCHIVO`` con rotación) con:
+
+- el SQL normalizado (espacios y listas ``IN (...)`` colapsadas) y los parámetros,
+- la vista del request (ver ``core.middleware.ConsultasLentasMiddleware``) y el
+  primer frame del código de la aplicación que la ejecutó,
+- el plan: ``EXPLAIN`` en PostgreSQL (``EXPLAIN ANALYZE`` con
+  ``CONSULTAS_LENTAS_ANALYZE``, que vuelve a ejecutar la consulta) y
+  ``EXPLAIN QUERY PLAN`` en SQLite. Solo para SELECT.
+
+El admin muestra las últimas entradas del archivo (Core › Consultas lentas).
+"""
+
+import json
+import logging
+import os
+import re
+import time
+import traceback
+from collections import deque
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+MAX_BYTES = 5 * 1024 * 1024
+BACKUPS = 3
+MAX_PARAMETRO = 200
+
+vista_actual = ContextVar('vista_consulta_lenta', default=None)
+_explicando = ContextVar('explicando_consulta', default=False)
+_instalado = False
+
+_ESPACIOS = re.compile(r'\s+')
+_LISTA_IN = re.compile(r'IN \((?:%s, )*%s\)')
+_DIR_APPS = os.path.join(str(settings.BASE_DIR), 'apps')
+
+
+def umbral_ms():
+    return float(getattr(settings, 'CONSULTAS_LENTAS_MS', 0) or 0)
+
+
+def archivo():
+    return getattr(settings, 'CONSULTAS_LENTAS_ARCHIVO', None) or os.path.join(
+        str(settings.BASE_DIR), 'logs', 'consultas_lentas.log'
+    )
+
+
+def normalizar(sql):
+    return _LISTA_IN.sub('IN (...)', _ESPACIOS.sub(' ', sql).strip())
+
+
+def _parametros(params):
+    if params is None:
+        return None
+    valores = params.values() if isinstance(params, dict) else params
+    resultado = []
+    for valor in valores:
+        texto = valor if isinstance(valor, (int, float, bool, type(None))) else str(valor)
+        if isinstance(texto, str) and len(texto) > MAX_PARAMETRO:
+            texto = texto[:MAX_PARAMETRO] + '…'
+        resultado.append(texto)
+    return resultado
+
+
+def _origen():
+    """Primer frame de ``apps/`` (fuera de este módulo) en la pila actual."""
+    for frame in reversed(traceback.extract_stack()[:-2]):
+        if frame.filename.startswith(_DIR_APPS) and frame.filename != __file__:
+            return f'{os.path.relpath(frame.filename, _DIR_APPS)}:{frame.lineno} en {frame.name}'
+    return None
+
+
+def explicar(conexion, sql, params, analizar=False):
+    """Plan de ``sql`` como texto, o None si el motor no es PostgreSQL ni SQLite."""
+    if conexion.vendor == 'postgresql':
+        prefijo = 'EXPLAIN (ANALYZE, BUFFERS) ' if analizar else 'EXPLAIN '
+    elif conexion.vendor == 'sqlite':
+        prefijo = 'EXPLAIN QUERY PLAN '
+    else:
+        return None
+
+    token = _explicando.set(True)
+    try:
+        # Savepoint: un error del EXPLAIN no debe abortar la transacción del request
+        with transaction.atomic(using=conexion.alias):
+            with conexion.cursor() as cursor:
+                cursor.execute(prefijo + sql, params)
+                filas = cursor.fetchall()
+    finally:
+        _explicando.reset(token)
+
+    if conexion.vendor == 'sqlite':
+        # (id, padre, no_usado, detalle): indentar según el nivel del nodo
+        niveles = {0: -1}
+        lineas = []
+        for nodo, padre, _, detalle in filas:
+            niveles[nodo] = niveles.get(padre, -1) + 1
+            lineas.append('  ' * niveles[nodo] + detalle)
+        return '\n'.join(lineas)
+    return '\n'.join(fila[0] for fila in filas)
+
+
+def registrar(execute, sql, params, many, context):
+    """``execute_wrapper`` que registra las consultas que superan el umbral."""
+    if _explicando.get():
+        return execute(sql, params, many, context)
+
+    inicio = time.perf_counter()
+    resultado = execute(sql, params, many, context)
+    duracion_ms = (time.perf_counter() - inicio) * 1000
+
+    limite = umbral_ms()
+    if not limite or duracion_ms < limite:
+        return resultado
+
+    conexion = context['connection']
+    plan = None
+    if not many and sql.lstrip()[:6].upper() in ('SELECT', 'WITH ('):
+        try:
+            plan = explicar(conexion, sql, params, getattr(settings, 'CONSULTAS_LENTAS_ANALYZE', False))
+        except Exception as exc:
+            plan = f'(no se pudo obtener el plan: {exc})'
+
+    logger.warning(json.dumps({
+        'fecha': timezone.now(),
+        'duracion_ms': round(duracion_ms, 2),
+        'alias': conexion.alias,
+        'vista': vista_actual.get(),
+        'origen': _origen(),
+        'sql': normalizar(sql),
+        'parametros': None if many else _parametros(params),
+        'plan': plan,
+    }, cls=DjangoJSONEncoder, ensure_ascii=False))
+    return resultado
+
+
+def _conexion_creada(sender, connection, **kwargs):
+    if registrar not in connection.execute_wrappers:
+        connection.execute_wrappers.append(registrar)
+
+
+def instalar():
+    """Activa el registro en las conexiones nuevas si hay umbral (idempotente)."""
+    global _instalado
+    if _instalado or not umbral_ms():
+        return
+    ruta = archivo()
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    manejador = RotatingFileHandler(ruta, maxBytes=MAX_BYTES, backupCount=BACKUPS, encoding='utf-8')
+    manejador.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(manejador)
+    logger.setLevel(logging.WARNING)
+    connection_created.connect(_conexion_creada, dispatch_uid='core.consultas_lentas')
+    _instalado = True
+
+
+def ultimas(limite=200):
+    """Últimas ``limite`` entradas del archivo (y sus rotaciones), la más reciente primero."""
+    ruta = archivo()
+    rutas = [f'{ruta}.{n}' for n in range(BACKUPS, 0, -1)] + [ruta]
+    entradas = deque(maxlen=limite)
+    for actual in rutas:
+        try:
+            with open(actual, encoding='utf-8') as fh:
+                for linea in fh:
+                    try:
+                        entradas.append(json.loads(linea))
+                    except ValueError:
+                        continue
+        except OSError:
+            continue
+    return list(reversed(entradas))
+
+
+def agrupar(entradas):
+    """Agrupa por SQL normalizado: veces, tiempo total y máximo, y la entrada más lenta."""
+    grupos = {}
+    for entrada in entradas:
+        grupo = grupos.setdefault(entrada['sql'], {
+            'sql': entrada['sql'], 'veces': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'peor': entrada,
+        })
+        grupo['veces'] += 1
+        grupo['total_ms'] += entrada['duracion_ms']
+        if entrada['duracion_ms'] >= grupo['max_ms']:
+            grupo['max_ms'] = entrada['duracion_ms']
+            grupo['peor'] = entrada
+    return sorted(grupos.values(), key=lambda g: -g['total_ms'])
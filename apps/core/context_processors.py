@@ -27,7 +27,7 @@ def cart(request) -> Dict[str, int]:
     except Exception:
         count = 0
 
-    config = ConfiguracionMoneda.obtener_configuracion()
+    config = ConfiguracionMoneda.configuracion_cacheada()
     moneda_actual = request.session.get('moneda', config.moneda_principal)
     simbolo = config.simbolos.get(moneda_actual, moneda_actual)
 
@@ -0,0 +1,190 @@
+"""Exportación en streaming de productos, pedidos e items de pedido a CSV/XLSX.
+
+Cada exportación (``EXPORTACIONES``) es un modelo y una lista de columnas
+``(encabezado, lookup)``; los lookups con ``__`` se resuelven con JOIN en la
+misma consulta (``values_list``) y las filas se leen con
+``.iterator(chunk_size=...)``, así que exportar un año de pedidos no carga todo
+en memoria.
+
+- CSV: ``StreamingHttpResponse`` que genera las líneas a medida que se envían.
+  Los textos que empiezan como una fórmula (``=``, ``+``, ``-``, ``@``) se
+  escriben precedidos de ``'`` para que Excel no los ejecute.
+- XLSX: ``openpyxl`` en modo ``write_only`` sobre un archivo temporal que luego
+  se envía con ``FileResponse`` (el formato es un ZIP y no puede escribirse por
+  partes). ``openpyxl`` es opcional: sin él solo está disponible CSV.
+
+``ExportarMixin`` agrega las acciones al admin (exportan la selección, o todo
+el changelist filtrado con "seleccionar todos"); ``manage.py exportar`` hace lo
+mismo desde la consola.
+"""
+
+import csv
+import tempfile
+from datetime import datetime
+from decimal import Decimal
+
+from django.apps import apps
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+
+try:
+    from openpyxl import Workbook
+except Exception:
+    Workbook = None
+
+
+CHUNK_SIZE = 2000
+BOM = '\ufeff'
+# Prefijos con los que una hoja de cálculo interpreta la celda como fórmula
+FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+EXPORTACIONES = {
+    'productos': ('catalogo.Producto', (
+        ('ID', 'pk'),
+        ('Slug', 'slug'),
+        ('Nombre', 'nombre'),
+        ('Categoría', 'categoria__nombre'),
+        ('Categoría (slug)', 'categoria__slug'),
+        ('Precio', 'precio'),
+        ('Moneda', 'moneda_precio'),
+        ('Stock', 'stock'),
+        ('Stock mínimo', 'stock_minimo'),
+        ('Activo', 'activo'),
+        ('Destacado', 'destacado'),
+        ('Creado', 'created_at'),
+        ('Actualizado', 'updated_at'),
+    )),
+    'pedidos': ('pedidos.Pedido', (
+        ('Número', 'numero_pedido'),
+        ('Fecha', 'fecha_creacion'),
+        ('Usuario', 'usuario__username'),
+        ('Email', 'usuario__email'),
+        ('Estado', 'estado'),
+        ('Estado pago', 'estado_pago'),
+        ('Método pago', 'metodo_pago'),
+        ('Moneda', 'moneda'),
+        ('Total', 'total'),
+        ('Versión tasas', 'version_tasas'),
+        ('Fecha pago', 'fecha_pago'),
+        ('Dirección', 'direccion_entrega'),
+        ('Teléfono', 'telefono_contacto'),
+    )),
+    'items': ('pedidos.ItemPedido', (
+        ('Pedido', 'pedido__numero_pedido'),
+        ('Fecha pedido', 'pedido__fecha_creacion'),
+        ('Estado pedido', 'pedido__estado'),
+        ('Moneda pedido', 'pedido__moneda'),
+        ('Producto (slug)', 'producto__slug'),
+        ('Producto', 'producto__nombre'),
+        ('Categoría', 'producto__categoria__nombre'),
+        ('Cantidad', 'cantidad'),
+        ('Precio unitario', 'precio_unitario'),
+        ('Moneda', 'moneda'),
+        ('Tasa', 'tasa'),
+        ('Subtotal', 'subtotal'),
+    )),
+}
+FORMATOS = ('csv', 'xlsx')
+
+
+def columnas(nombre):
+    return EXPORTACIONES[nombre][1]
+
+
+def queryset_base(nombre):
+    return apps.get_model(EXPORTACIONES[nombre][0])._default_manager.all()
+
+
+def filas(nombre, queryset, chunk_size=CHUNK_SIZE):
+    """Tuplas de valores de ``queryset`` en el orden de las columnas, por lotes."""
+    lookups = [lookup for _, lookup in columnas(nombre)]
+    return queryset.order_by('pk').values_list(*lookups).iterator(chunk_size=chunk_size)
+
+
+def _valor(valor):
+    if isinstance(valor, datetime):
+        return timezone.localtime(valor).strftime('%Y-%m-%d %H:%M:%S') if timezone.is_aware(valor) else valor.isoformat(' ')
+    if valor is None:
+        return ''
+    return valor
+
+
+def _celda_csv(valor):
+    """``_valor`` con los textos que Excel tomaría como fórmula precedidos de ``'``."""
+    valor = _valor(valor)
+    if isinstance(valor, str) and valor.startswith(FORMULA):
+        return "'" + valor
+    return valor
+
+
+class _Eco:
+    """Pseudo-archivo para ``csv.writer``: devuelve la línea en lugar de guardarla."""
+
+    def write(self, valor):
+        return valor
+
+
+def lineas_csv(nombre, queryset, chunk_size=CHUNK_SIZE):
+    """Líneas CSV (con BOM para Excel), empezando por los encabezados."""
+    escritor = csv.writer(_Eco())
+    yield BOM + escritor.writerow([encabezado for encabezado, _ in columnas(nombre)])
+    for fila in filas(nombre, queryset, chunk_size):
+        yield escritor.writerow([_celda_csv(v) for v in fila])
+
+
+def escribir_xlsx(nombre, queryset, destino, chunk_size=CHUNK_SIZE):
+    """Escribe el XLSX en ``destino`` (ruta o archivo) con openpyxl en modo write_only."""
+    if Workbook is None:
+        raise RuntimeError('openpyxl no está instalado: instala openpyxl para exportar a XLSX.')
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet(nombre.capitalize())
+    hoja.append([encabezado for encabezado, _ in columnas(nombre)])
+    for fila in filas(nombre, queryset, chunk_size):
+        # Decimal como float: Excel no tiene tipo decimal
+        hoja.append([float(v) if isinstance(v, Decimal) else _valor(v) for v in fila])
+    libro.save(destino)
+
+
+def _nombre_archivo(nombre, formato):
+    return f'{nombre}_{timezone.localtime():%Y%m%d_%H%M%S}.{formato}'
+
+
+def respuesta(nombre, queryset, formato='csv'):
+    """Respuesta HTTP con la exportación ``nombre`` de ``queryset`` en ``formato``."""
+    if formato == 'xlsx':
+        if Workbook is None:
+            return HttpResponse('openpyxl no está instalado en el servidor. Instala openpyxl para exportar a XLSX.', status=500)
+        archivo = tempfile.TemporaryFile(suffix='.xlsx')
+        escribir_xlsx(nombre, queryset, archivo)
+        archivo.seek(0)
+        return FileResponse(
+            archivo, as_attachment=True, filename=_nombre_archivo(nombre, 'xlsx'),
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
+
+    response = StreamingHttpResponse(lineas_csv(nombre, queryset), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{_nombre_archivo(nombre, "csv")}"'
+    return response
+
+
+class ExportarMixin:
+    """Acciones de admin para exportar a CSV/XLSX (``exportacion`` es la clave en ``EXPORTACIONES``)."""
+
+    exportacion = None
+
+    def get_actions(self, request):
+        acciones = super().get_actions(request)
+        if self.exportacion:
+            for funcion in (ExportarMixin.exportar_csv, ExportarMixin.exportar_xlsx):
+                if funcion is ExportarMixin.exportar_xlsx and Workbook is None:
+                    continue
+                acciones[funcion.__name__] = (funcion, funcion.__name__, funcion.short_description)
+        return acciones
+
+    def exportar_csv(self, request, queryset):
+        return respuesta(self.exportacion, queryset, 'csv')
+    exportar_csv.short_description = 'Exportar seleccionados a CSV'
+
+    def exportar_xlsx(self, request, queryset):
+        return respuesta(self.exportacion, queryset, 'xlsx')
+    exportar_xlsx.short_description = 'Exportar seleccionados a Excel (XLSX)'
@@ -0,0 +1,53 @@
+from django.core.exceptions import FieldError, ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from core import exportar
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporta productos, pedidos o items de pedido a CSV o XLSX en streaming "
+        "(lecturas por lotes con iterator). Ej.: exportar pedidos --filtro estado=completado "
+        "--filtro fecha_creacion__year=2025 --salida pedidos.csv"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("exportacion", choices=sorted(exportar.EXPORTACIONES))
+        parser.add_argument("--formato", choices=exportar.FORMATOS, default="csv")
+        parser.add_argument("--salida", default="", help="Archivo de salida (CSV: por defecto la salida estándar)")
+        parser.add_argument(
+            "--filtro", action="append", default=[], metavar="LOOKUP=VALOR",
+            help="Filtro del ORM; se puede repetir (ej. estado=completado, categoria__slug=pinturas)",
+        )
+        parser.add_argument("--lote", type=int, default=exportar.CHUNK_SIZE, help="Filas por lectura")
+
+    def handle(self, *args, **options):
+        nombre = options["exportacion"]
+        filtros = {}
+        for filtro in options["filtro"]:
+            lookup, separador, valor = filtro.partition("=")
+            if not separador or not lookup:
+                raise CommandError(f"Filtro inválido: {filtro!r} (se espera LOOKUP=VALOR)")
+            filtros[lookup] = valor
+        try:
+            queryset = exportar.queryset_base(nombre).filter(**filtros)
+        except (FieldError, ValidationError, ValueError) as exc:
+            raise CommandError(f"Filtro inválido: {exc}")
+
+        if options["formato"] == "xlsx":
+            if not options["salida"]:
+                raise CommandError("XLSX necesita --salida.")
+            try:
+                exportar.escribir_xlsx(nombre, queryset, options["salida"], options["lote"])
+            except RuntimeError as exc:
+                raise CommandError(str(exc))
+        else:
+            lineas = exportar.lineas_csv(nombre, queryset, options["lote"])
+            if options["salida"]:
+                with open(options["salida"], "w", encoding="utf-8", newline="") as destino:
+                    destino.writelines(lineas)
+            else:
+                for linea in lineas:
+                    self.stdout.write(linea.lstrip(exportar.BOM), ending="")
+        if options["salida"]:
+            self.stderr.write(self.style.SUCCESS(f"Exportación guardada en {options['salida']}"))
@@ -0,0 +1,58 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Micro-benchmarks de precios, formato, plantillas y middleware por producto/request. "
+        "Guarda el resultado en JSON y lo compara con una corrida anterior."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iteraciones", type=int, default=5000, help="Llamadas por repetición (los casos con DB usan menos)")
+        parser.add_argument("--repeticiones", type=int, default=5)
+        parser.add_argument("--solo", nargs="*", default=None, help="Nombres de los casos a correr")
+        parser.add_argument("--json", dest="salida_json", default="", help="Guardar el resultado en este archivo")
+        parser.add_argument("--comparar", default="", help="JSON de una corrida anterior")
+        parser.add_argument("--tolerancia", type=float, default=0.10, help="Empeoramiento máximo aceptado (0.10 = 10%%)")
+        parser.add_argument("--listar", action="store_true", help="Solo listar los casos disponibles")
+
+    def handle(self, *args, **options):
+        if options["listar"]:
+            for nombre in benchmarks.CASOS:
+                self.stdout.write(nombre)
+            return
+        desconocidos = set(options["solo"] or ()) - set(benchmarks.CASOS)
+        if desconocidos:
+            raise CommandError(f"Casos desconocidos: {', '.join(sorted(desconocidos))}")
+
+        informe = benchmarks.ejecutar(options["solo"], options["iteraciones"], max(1, options["repeticiones"]))
+        self.stdout.write(f"{'Caso':<50} {'iter':>7} {'mediana':>12} {'mín':>12}")
+        for nombre, datos in informe["resultados"].items():
+            self.stdout.write(
+                f"{nombre:<50} {datos['iteraciones']:>7} {datos['mediana_ns'] / 1000:>9.2f} µs {datos['min_ns'] / 1000:>9.2f} µs"
+            )
+
+        if options["salida_json"]:
+            with open(options["salida_json"], "w", encoding="utf-8") as fh:
+                json.dump(informe, fh, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f"Resultado guardado en {options['salida_json']}"))
+
+        if options["comparar"]:
+            try:
+                with open(options["comparar"], encoding="utf-8") as fh:
+                    anterior = json.load(fh)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"No se pudo leer {options['comparar']}: {exc}")
+            regresiones = []
+            self.stdout.write("")
+            for nombre, antes, ahora, variacion, regresion in benchmarks.comparar(anterior, informe, options["tolerancia"]):
+                linea = f"{nombre:<50} {antes / 1000:>9.2f} → {ahora / 1000:>9.2f} µs {variacion:>+8.1%}"
+                self.stdout.write(self.style.ERROR(linea) if regresion else linea)
+                if regresion:
+                    regresiones.append(nombre)
+            if regresiones:
+                raise CommandError(f"Regresiones de más de {options['tolerancia']:.0%}: {', '.join(regresiones)}")
@@ -0,0 +1,56 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import carga
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga de navegación, búsqueda, cambio de moneda, carrito, login "
+        "y checkout con competencia por stock. Informa throughput, p50/p95/p99 y "
+        "errores por URL. Usa la base de datos configurada (SQLite o PostgreSQL)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="", help="Servidor a probar (ej. http://127.0.0.1:8000); sin él, la app WSGI en proceso")
+        parser.add_argument("--usuarios", type=int, default=10, help="Usuarios virtuales concurrentes")
+        parser.add_argument("--duracion", type=float, default=30, help="Duración en segundos")
+        parser.add_argument("--semilla", type=int, default=1, help="Semilla de los escenarios")
+        parser.add_argument("--calientes", type=int, default=5, help="Productos por los que compiten los checkouts")
+        parser.add_argument("--stock", type=int, default=50, help="Stock que se repone a los productos calientes")
+        parser.add_argument("--json", dest="salida_json", default="", help="Guardar el informe en este archivo JSON")
+
+    def handle(self, *args, **options):
+        if options["usuarios"] < 1 or options["duracion"] <= 0:
+            raise CommandError("--usuarios y --duracion deben ser positivos.")
+
+        catalogo = carga.preparar(options["usuarios"], options["calientes"], options["stock"])
+        if not catalogo["productos"]:
+            raise CommandError("No hay productos activos: carga un catálogo primero (ej. seed_demo_catalog).")
+
+        if options["url"]:
+            crear_cliente = lambda: carga.ClienteHTTP(options["url"])  # noqa: E731
+            destino = options["url"]
+        else:
+            crear_cliente = carga.ClienteWSGI
+            destino = "WSGI en proceso"
+        self.stdout.write(f"{options['usuarios']} usuarios durante {options['duracion']:g} s contra {destino}...")
+
+        resultados = carga.ejecutar(
+            crear_cliente, catalogo,
+            usuarios=options["usuarios"], duracion=options["duracion"], semilla=options["semilla"],
+        )
+        resumen = resultados.resumen()
+
+        self.stdout.write(f"{'URL':<36} {'req':>7} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'err%':>7}")
+        for fila in resumen["urls"]:
+            self.stdout.write(
+                f"{fila['url']:<36} {fila['requests']:>7} {fila['rps']:>8.1f} {fila['p50_ms']:>8.1f} "
+                f"{fila['p95_ms']:>8.1f} {fila['p99_ms']:>8.1f} {fila['tasa_error'] * 100:>6.1f}%"
+            )
+
+        if options["salida_json"]:
+            with open(options["salida_json"], "w", encoding="utf-8") as fh:
+                json.dump(resumen, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Informe guardado en {options['salida_json']}"))
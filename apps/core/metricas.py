@@ -0,0 +1,286 @@
+"""Métricas de la aplicación en formato de texto de Prometheus.
+
+Cada proceso acumula sus contadores en memoria y los vuelca, como mucho una vez
+por ``INTERVALO_VOLCADO`` segundos, a un archivo JSON propio dentro de
+``settings.METRICAS_DIR``. La vista ``core:metricas`` suma los archivos de
+todos los procesos, así que los workers de Gunicorn comparten las métricas sin
+un servicio externo.
+
+Como el multiproceso de ``prometheus_client``, los archivos son por proceso:
+un worker borra el suyo al salir (``atexit``; para workers terminados con
+SIGKILL, ``proceso_terminado`` desde el hook ``child_exit`` de Gunicorn) y
+``leer_todas`` descarta los de procesos que ya no existen, así que el total
+solo cuenta workers vivos y el directorio no crece con cada reinicio. Al
+desplegar hay que vaciar ``METRICAS_DIR`` (un pid reciclado por un proceso
+ajeno mantendría su archivo). Prometheus trata la caída del total como un
+reinicio del contador.
+
+Métricas:
+
+- ``ferreteria_requests_total{vista,metodo,estado}``
+- ``ferreteria_request_duracion_segundos{vista}`` (histograma)
+- ``ferreteria_consultas_db_total{vista}``
+- ``ferreteria_cache_total{resultado}`` (hit/miss de ``caches['default']``)
+- ``ferreteria_eventos_total{evento,resultado}`` (ej. checkout ok/error)
+"""
+
+import atexit
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+INTERVALO_VOLCADO = 1.0
+PREFIJO = 'ferreteria'
+
+_lock = threading.Lock()
+_datos = None
+_ultimo_volcado = 0.0
+_archivo = None
+_instalado = False
+
+
+def activas():
+    return getattr(settings, 'METRICAS', False)
+
+
+def directorio():
+    return getattr(settings, 'METRICAS_DIR', None) or os.path.join(tempfile.gettempdir(), 'ferreteria-metricas')
+
+
+def _vacias():
+    return {'requests': {}, 'latencia': {}, 'consultas': {}, 'cache': {}, 'eventos': {}}
+
+
+def _clave(*etiquetas):
+    return '|'.join(str(e) for e in etiquetas)
+
+
+def _sumar(tabla, clave, valor=1):
+    tabla[clave] = tabla.get(clave, 0) + valor
+
+
+def registrar_request(vista, metodo, estado, segundos, consultas):
+    with _lock:
+        datos = _estado()
+        _sumar(datos['requests'], _clave(vista, metodo, estado))
+        _sumar(datos['consultas'], vista, consultas)
+        hist = datos['latencia'].setdefault(vista, {'buckets': [0] * len(BUCKETS), 'suma': 0.0, 'cuenta': 0})
+        for i, limite in enumerate(BUCKETS):
+            if segundos <= limite:
+                hist['buckets'][i] += 1
+        hist['suma'] += segundos
+        hist['cuenta'] += 1
+    _volcar_si_toca()
+
+
+def registrar_evento(evento, resultado):
+    """Cuenta un evento de negocio (ej. ``registrar_evento('checkout', 'ok')``)."""
+    if not activas():
+        return
+    with _lock:
+        _sumar(_estado()['eventos'], _clave(evento, resultado))
+    _volcar_si_toca()
+
+
+def registrar_cache(hit):
+    with _lock:
+        _sumar(_estado()['cache'], 'hit' if hit else 'miss')
+
+
+def _estado():
+    global _datos
+    if _datos is None:
+        _datos = _vacias()
+    return _datos
+
+
+def _ruta_archivo():
+    global _archivo
+    if _archivo is None:
+        # pid + inicio: un worker nuevo con un pid reciclado no pisa al anterior
+        _archivo = os.path.join(directorio(), f'{os.getpid()}-{int(time.time() * 1000)}.json')
+    return _archivo
+
+
+def volcar():
+    """Escribe las métricas de este proceso en su archivo (reemplazo atómico)."""
+    global _ultimo_volcado
+    with _lock:
+        if _datos is None:
+            return
+        contenido = json.dumps(_datos)
+        _ultimo_volcado = time.monotonic()
+    ruta = _ruta_archivo()
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    temporal = f'{ruta}.tmp'
+    with open(temporal, 'w', encoding='utf-8') as fh:
+        fh.write(contenido)
+    os.replace(temporal, ruta)
+
+
+def _pid(ruta):
+    try:
+        return int(os.path.basename(ruta).split('-', 1)[0])
+    except ValueError:
+        return None
+
+
+def _vivo(pid):
+    if os.name == 'nt':
+        # os.kill(pid, 0) terminaría el proceso en Windows
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _borrar(ruta):
+    try:
+        os.remove(ruta)
+    except OSError:
+        pass
+
+
+def proceso_terminado(pid):
+    """Borra los archivos del proceso ``pid``.
+
+    Para el hook de Gunicorn::
+
+        def child_exit(server, worker):
+            from core import metricas
+            metricas.proceso_terminado(worker.pid)
+    """
+    for ruta in glob.glob(os.path.join(directorio(), f'{pid}-*.json')):
+        _borrar(ruta)
+
+
+def _al_salir():
+    if _archivo is not None:
+        _borrar(_archivo)
+
+
+def _volcar_si_toca():
+    if time.monotonic() - _ultimo_volcado >= INTERVALO_VOLCADO:
+        try:
+            volcar()
+        except OSError:
+            pass
+
+
+def leer_todas():
+    """Suma las métricas volcadas por los procesos vivos (borra las de procesos terminados)."""
+    total = _vacias()
+    for ruta in glob.glob(os.path.join(directorio(), '*.json')):
+        pid = _pid(ruta)
+        if pid is not None and pid != os.getpid() and not _vivo(pid):
+            _borrar(ruta)
+            continue
+        try:
+            with open(ruta, encoding='utf-8') as fh:
+                datos = json.load(fh)
+        except (OSError, ValueError):
+            continue
+        for tabla in ('requests', 'consultas', 'cache', 'eventos'):
+            for clave, valor in datos.get(tabla, {}).items():
+                _sumar(total[tabla], clave, valor)
+        for vista, hist in datos.get('latencia', {}).items():
+            acumulado = total['latencia'].setdefault(vista, {'buckets': [0] * len(BUCKETS), 'suma': 0.0, 'cuenta': 0})
+            for i, n in enumerate(hist.get('buckets', [])[:len(BUCKETS)]):
+                acumulado['buckets'][i] += n
+            acumulado['suma'] += hist.get('suma', 0.0)
+            acumulado['cuenta'] += hist.get('cuenta', 0)
+    return total
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _etiquetas(**valores):
+    return '{' + ','.join(f'{k}="{_escapar(v)}"' for k, v in valores.items()) + '}'
+
+
+def exponer(datos):
+    """Texto en formato de exposición de Prometheus (versión 0.0.4)."""
+    lineas = []
+
+    def encabezado(nombre, tipo, ayuda):
+        lineas.append(f'# HELP {PREFIJO}_{nombre} {ayuda}')
+        lineas.append(f'# TYPE {PREFIJO}_{nombre} {tipo}')
+
+    encabezado('requests_total', 'counter', 'Requests por vista, método y estado HTTP.')
+    for clave, n in sorted(datos['requests'].items()):
+        vista, metodo, estado = clave.split('|')
+        lineas.append(f'{PREFIJO}_requests_total{_etiquetas(vista=vista, metodo=metodo, estado=estado)} {n}')
+
+    encabezado('request_duracion_segundos', 'histogram', 'Latencia de los requests por vista.')
+    for vista, hist in sorted(datos['latencia'].items()):
+        for limite, n in zip(BUCKETS, hist['buckets']):
+            lineas.append(f'{PREFIJO}_request_duracion_segundos_bucket{_etiquetas(vista=vista, le=limite)} {n}')
+        lineas.append(f'{PREFIJO}_request_duracion_segundos_bucket{_etiquetas(vista=vista, le="+Inf")} {hist["cuenta"]}')
+        lineas.append(f'{PREFIJO}_request_duracion_segundos_sum{_etiquetas(vista=vista)} {hist["suma"]:.6f}')
+        lineas.append(f'{PREFIJO}_request_duracion_segundos_count{_etiquetas(vista=vista)} {hist["cuenta"]}')
+
+    encabezado('consultas_db_total', 'counter', 'Consultas SQL ejecutadas por vista.')
+    for vista, n in sorted(datos['consultas'].items()):
+        lineas.append(f'{PREFIJO}_consultas_db_total{_etiquetas(vista=vista)} {n}')
+
+    encabezado('cache_total', 'counter', 'Lecturas de la caché por resultado (hit/miss).')
+    for resultado, n in sorted(datos['cache'].items()):
+        lineas.append(f'{PREFIJO}_cache_total{_etiquetas(resultado=resultado)} {n}')
+
+    encabezado('eventos_total', 'counter', 'Eventos de negocio por resultado (ej. checkout).')
+    for clave, n in sorted(datos['eventos'].items()):
+        evento, resultado = clave.split('|')
+        lineas.append(f'{PREFIJO}_eventos_total{_etiquetas(evento=evento, resultado=resultado)} {n}')
+
+    return '\n'.join(lineas) + '\n'
+
+
+_AUSENTE = object()
+
+
+def _envolver_get(original):
+    def get(self, key, default=None, version=None):
+        valor = original(self, key, _AUSENTE, version)
+        if valor is _AUSENTE:
+            registrar_cache(False)
+            return default
+        registrar_cache(True)
+        return valor
+
+    get.__wrapped__ = original
+    return get
+
+
+def instalar():
+    """Cuenta hits/miss de la caché por defecto y borra el archivo del proceso al salir (idempotente)."""
+    global _instalado
+    if _instalado:
+        return
+    from django.core.cache import caches
+
+    clase = type(caches['default'])
+    clase.get = _envolver_get(clase.get)
+    atexit.register(_al_salir)
+    _instalado = True
+
+
+def reiniciar():
+    """Descarta las métricas en memoria de este proceso (pruebas)."""
+    global _datos, _archivo, _ultimo_volcado
+    with _lock:
+        _datos = None
+        _archivo = None
+        _ultimo_volcado = 0.0
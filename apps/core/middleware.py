@@ -1,9 +1,18 @@
+import json
+import logging
+import time
 from importlib import import_module
 
 from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
 from django.utils.cache import patch_vary_headers
 from django.utils.deprecation import MiddlewareMixin
 
+from . import consultas_lentas, metricas, perfil, perfilador
+
+
+logger = logging.getLogger(__name__)
+
 
 class SplitSessionMiddleware(MiddlewareMixin):
     """Mantiene sesiones separadas para el admin y el sitio público.
@@ -77,3 +86,104 @@ class SplitSessionMiddleware(MiddlewareMixin):
             samesite=settings.SESSION_COOKIE_SAMESITE,
         )
         return response
+
+
+class ServerTimingMiddleware:
+    """Agrega la cabecera ``Server-Timing`` y una línea de log por request.
+
+    Mide consultas (número y tiempo), render de plantillas, context processors,
+    carga/guardado de la sesión y el tiempo total (ver ``core.perfil``). Se
+    activa con ``SERVER_TIMING = True``; si no, Django lo descarta al arrancar
+    y no agrega ningún costo. Debe ubicarse primero en MIDDLEWARE para que el
+    total incluya a los demás middleware.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SERVER_TIMING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with perfil.medir() as medicion:
+            response = self.get_response(request)
+        response['Server-Timing'] = medicion.server_timing()
+
+        match = getattr(request, 'resolver_match', None)
+        logger.info('server_timing %s', json.dumps({
+            'metodo': request.method,
+            'ruta': request.path,
+            'vista': match.view_name if match else None,
+            'estado': response.status_code,
+            **medicion.como_dict(),
+        }))
+        return response
+
+
+class MetricasMiddleware:
+    """Acumula métricas por vista (ver ``core.metricas``).
+
+    Cuenta requests por estado, latencia, consultas SQL y hits de caché. Se
+    activa con ``METRICAS = True``; si no, Django lo descarta al arrancar.
+    """
+
+    def __init__(self, get_response):
+        if not metricas.activas():
+            raise MiddlewareNotUsed
+        metricas.instalar()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        inicio = time.perf_counter()
+        with perfil.medir() as medicion:
+            consultas_previas = medicion.consultas
+            response = self.get_response(request)
+            consultas = medicion.consultas - consultas_previas
+
+        match = getattr(request, 'resolver_match', None)
+        vista = match.view_name if match else 'sin_ruta'
+        metricas.registrar_request(
+            vista, request.method, response.status_code, time.perf_counter() - inicio, consultas,
+        )
+        return response
+
+
+class ConsultasLentasMiddleware:
+    """Asocia las consultas lentas a la vista del request (ver ``core.consultas_lentas``).
+
+    Se activa con ``CONSULTAS_LENTAS_MS`` > 0; si no, Django lo descarta al arrancar.
+    """
+
+    def __init__(self, get_response):
+        if not consultas_lentas.umbral_ms():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = consultas_lentas.vista_actual.set(request.path)
+        try:
+            return self.get_response(request)
+        finally:
+            consultas_lentas.vista_actual.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        consultas_lentas.vista_actual.set(match.view_name or request.path)
+        return None
+
+
+class PerfiladorMiddleware:
+    """Perfila con cProfile los requests de staff que lo piden (ver ``core.perfilador``).
+
+    Se activa con ``PERFILADOR_CLAVE``; si no, Django lo descarta al arrancar.
+    Va después de AuthenticationMiddleware para poder comprobar ``is_staff``.
+    """
+
+    def __init__(self, get_response):
+        if not perfilador.clave():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if perfilador.solicitado(request):
+            return perfilador.perfilar(request, self.get_response)
+        return self.get_response(request)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_add_eur_to_config'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='configuracionmoneda',
+            name='version_tasas',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Se incrementa cada vez que cambian las tasas de cambio'),
+        ),
+    ]
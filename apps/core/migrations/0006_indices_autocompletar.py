@@ -0,0 +1,41 @@
+from django.db import migrations
+
+
+# Búsquedas ``^campo`` del autocompletar del admin (solo PostgreSQL)
+INDICES = [
+    'CREATE INDEX IF NOT EXISTS "auth_user_username_prefijo" '
+    'ON "auth_user" (UPPER("username"::text) varchar_pattern_ops)',
+    'CREATE INDEX IF NOT EXISTS "auth_user_email_prefijo" '
+    'ON "auth_user" (UPPER("email"::text) varchar_pattern_ops)',
+    'CREATE INDEX IF NOT EXISTS "core_usuario_cedula_prefijo" '
+    'ON "core_usuario" (UPPER("cedula"::text) varchar_pattern_ops)',
+]
+BORRAR = [
+    'DROP INDEX IF EXISTS "auth_user_username_prefijo"',
+    'DROP INDEX IF EXISTS "auth_user_email_prefijo"',
+    'DROP INDEX IF EXISTS "core_usuario_cedula_prefijo"',
+]
+
+
+def crear_indices(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in INDICES:
+            schema_editor.execute(sql)
+
+
+def borrar_indices(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in BORRAR:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0005_configuracionmoneda_version_tasas'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, borrar_indices),
+    ]
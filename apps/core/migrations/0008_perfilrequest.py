@@ -0,0 +1,25 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_consultalenta'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PerfilRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+            options={
+                'verbose_name': 'Perfil de request',
+                'verbose_name_plural': 'Perfiles de requests',
+                'managed': False,
+                'default_permissions': ('view',),
+            },
+        ),
+    ]
@@ -1,5 +1,6 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.validators import MinLengthValidator, MinValueValidator, RegexValidator
 from django.utils.text import slugify
 from decimal import Decimal
@@ -47,6 +48,37 @@ class Usuario(models.Model):
         return self.user.email
 
 
+class TasasSnapshot:
+    """Tasas activas leídas en una sola consulta.
+
+    Resuelve las tasas con la misma lógica que ``TasaCambio.obtener_tasa``
+    (directa, inversa o 1) pero sin consultar la DB por cada conversión.
+    """
+
+    def __init__(self, tasas):
+        self._tasas = dict(tasas)
+
+    def tasa(self, moneda_origen, moneda_destino):
+        if moneda_origen == moneda_destino:
+            return Decimal('1.000000')
+        directa = self._tasas.get((moneda_origen, moneda_destino))
+        if directa:
+            return directa
+        inversa = self._tasas.get((moneda_destino, moneda_origen))
+        if inversa:
+            return Decimal('1') / inversa
+        return Decimal('1.000000')
+
+    def convertir(self, monto, moneda_origen, moneda_destino):
+        if moneda_origen == moneda_destino:
+            return monto
+        return monto * self.tasa(moneda_origen, moneda_destino)
+
+    def tiene(self, moneda_origen, moneda_destino):
+        """Indica si hay tasa (directa o inversa) en lugar del 1 por defecto de ``tasa``."""
+        return bool(self._tasas.get((moneda_origen, moneda_destino)) or self._tasas.get((moneda_destino, moneda_origen)))
+
+
 class TasaCambio(models.Model):
     MONEDAS = [
         ('USD', 'Dólar Americano (USD)'),
@@ -94,6 +126,9 @@ class TasaCambio(models.Model):
         unique_together = ['moneda_origen', 'moneda_destino']
         ordering = ['moneda_origen', 'moneda_destino']
     
+    CACHE_KEY = 'core:tasas_snapshot'
+    CACHE_TIMEOUT = 5 * 60
+    
     def __str__(self):
         return f"1 {self.moneda_origen} = {self.tasa} {self.moneda_destino}"
     
@@ -126,6 +161,25 @@ class TasaCambio(models.Model):
         # Si no hay tasa directa ni inversa, retornar 1 (no se puede convertir)
         return Decimal('1.000000')
     
+    @classmethod
+    def snapshot(cls):
+        """Retorna un TasasSnapshot con todas las tasas activas (una consulta)."""
+        filas = cls.objects.filter(activa=True).values_list('moneda_origen', 'moneda_destino', 'tasa')
+        return TasasSnapshot(((origen, destino), tasa) for origen, destino, tasa in filas)
+    
+    @classmethod
+    def snapshot_cacheado(cls):
+        """Como ``snapshot`` pero leído de la caché, para mostrar precios en listados.
+
+        Se invalida con ``ConfiguracionMoneda.incrementar_version_tasas``; los
+        totales que se guardan (checkout) deben usar ``snapshot``.
+        """
+        tasas = cache.get(cls.CACHE_KEY)
+        if tasas is None:
+            tasas = cls.snapshot()
+            cache.set(cls.CACHE_KEY, tasas, cls.CACHE_TIMEOUT)
+        return tasas
+    
     @classmethod
     def convertir_moneda(cls, monto, moneda_origen, moneda_destino):
         """Convierte un monto de una moneda a otra"""
@@ -138,6 +192,14 @@ class TasaCambio(models.Model):
 
 class ConfiguracionMoneda(models.Model):
     MONEDA_BASE = 'USD'
+    SIMBOLOS_POR_DEFECTO = {
+        'USD': '$',
+        'VES': 'Bs',
+        'COP': '$',
+        'EUR': '€'
+    }
+    CACHE_KEY = 'core:configuracion_moneda'
+    CACHE_TIMEOUT = 5 * 60
     MONEDAS_DISPONIBLES = [
         ('USD', 'Dólar Americano (USD)'),
         ('VES', 'Bolívar Venezolano (VES)'),
@@ -167,6 +229,11 @@ class ConfiguracionMoneda(models.Model):
         default=dict,
         help_text="Símbolos de monedas (ej: {'USD': '$', 'VES': 'Bs', 'COP': '$'})"
     )
+    version_tasas = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Se incrementa cada vez que cambian las tasas de cambio"
+    )
     
     class Meta:
         verbose_name = "Configuración de Moneda"
@@ -184,22 +251,75 @@ class ConfiguracionMoneda(models.Model):
                 'mostrar_multiple_monedas': True,
                 'monedas_mostrar': ['USD', 'VES', 'COP', 'EUR'],
                 'decimales_precision': 2,
-                'simbolos_monedas': {
-                    'USD': '$',
-                    'VES': 'Bs',
-                    'COP': '$',
-                    'EUR': '€'
-                }
+                'simbolos_monedas': dict(cls.SIMBOLOS_POR_DEFECTO),
             }
         )
         return config
     
+    @classmethod
+    def configuracion_cacheada(cls):
+        """Configuración para mostrar precios, leída de la caché si está disponible.
+
+        Pensada para listados que formatean muchos precios (una lectura de la
+        caché en lugar de una consulta por fila). Se invalida al guardar la
+        configuración o cambiar las tasas (ver core.signals); para datos que se
+        guardan con el pedido usar ``obtener_configuracion``.
+        """
+        config = cache.get(cls.CACHE_KEY)
+        if config is None:
+            config = cls.obtener_configuracion()
+            cache.set(cls.CACHE_KEY, config, cls.CACHE_TIMEOUT)
+        return config
+    
+    @classmethod
+    def invalidar_cache(cls):
+        cache.delete(cls.CACHE_KEY)
+    
+    @classmethod
+    def incrementar_version_tasas(cls):
+        """Marca que el conjunto de tasas cambió (ver ``TasaCambio`` y core.signals)
+
+        Tras el commit envía ``core.signals.tasas_publicadas`` para que otras
+        apps recalculen lo que depende de las tasas (ej. precios indexados).
+        """
+        cls.objects.update(version_tasas=models.F('version_tasas') + 1)
+        cache.delete_many([cls.CACHE_KEY, TasaCambio.CACHE_KEY])
+        # Una sola publicación por transacción aunque cambien varias tasas (ej. la
+        # directa y la inversa en TasaCambioAdmin.editar_directo_view)
+        pendientes = transaction.get_connection().run_on_commit
+        if not any(funcion is _publicar_tasas for _, funcion, _ in pendientes):
+            transaction.on_commit(_publicar_tasas)
+    
     @property
     def simbolos(self):
         """Retorna los símbolos de monedas"""
-        return self.simbolos_monedas or {
-            'USD': '$',
-            'VES': 'Bs',
-            'COP': '$',
-            'EUR': '€'
-        }
+        return self.simbolos_monedas or dict(self.SIMBOLOS_POR_DEFECTO)
+
+
+def _publicar_tasas():
+    from .signals import tasas_publicadas
+
+    tasas_publicadas.send(sender=ConfiguracionMoneda)
+
+
+class ConsultaLenta(models.Model):
+    """Entrada del admin para el registro de consultas lentas.
+
+    No tiene tabla: las entradas se leen del archivo de ``core.consultas_lentas``.
+    """
+
+    class Meta:
+        managed = False
+        default_permissions = ('view',)
+        verbose_name = 'Consulta lenta'
+        verbose_name_plural = 'Consultas lentas'
+
+
+class PerfilRequest(models.Model):
+    """Entrada del admin para los perfiles cProfile guardados por ``core.perfilador``."""
+
+    class Meta:
+        managed = False
+        default_permissions = ('view',)
+        verbose_name = 'Perfil de request'
+        verbose_name_plural = 'Perfiles de requests'
@@ -0,0 +1,157 @@
+"""Medición por request: consultas, plantillas, context processors y sesión.
+
+``medir()`` abre una ``Medicion`` para el request actual (en un ``ContextVar``)
+y registra la duración de cada consulta con ``connection.execute_wrapper``. El
+render de plantillas, los context processors y la carga/guardado de la sesión
+se miden envolviendo, una sola vez por proceso (``instalar()``), los métodos de
+Django que los ejecutan; fuera de una medición los envoltorios solo llaman al
+original.
+"""
+
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from importlib import import_module
+
+from django.conf import settings
+from django.db import connections
+
+
+_actual = ContextVar('medicion_request', default=None)
+_instalado = False
+
+
+class Medicion:
+    """Tiempos acumulados (en segundos) de un request."""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.total = 0.0
+        self.consultas = 0
+        self.db = 0.0
+        self.plantillas = 0.0
+        self.context_processors = 0.0
+        self.sesion = 0.0
+        self._profundidad = 0
+
+    def terminar(self):
+        self.total = time.perf_counter() - self.inicio
+
+    def server_timing(self):
+        """Valor de la cabecera ``Server-Timing`` (duraciones en ms)."""
+        # El render incluye los context processors: se informan por separado
+        partes = [
+            ('db', self.db, f'{self.consultas} consultas'),
+            ('tpl', max(self.plantillas - self.context_processors, 0.0), 'Plantillas'),
+            ('ctx', self.context_processors, 'Context processors'),
+            ('session', self.sesion, 'Sesion'),
+            ('total', self.total, 'Total'),
+        ]
+        return ', '.join(f'{nombre};dur={segundos * 1000:.1f};desc="{desc}"' for nombre, segundos, desc in partes)
+
+    def como_dict(self):
+        return {
+            'consultas': self.consultas,
+            'db_ms': round(self.db * 1000, 1),
+            'plantillas_ms': round(max(self.plantillas - self.context_processors, 0.0) * 1000, 1),
+            'context_processors_ms': round(self.context_processors * 1000, 1),
+            'sesion_ms': round(self.sesion * 1000, 1),
+            'total_ms': round(self.total * 1000, 1),
+        }
+
+
+def medicion_actual():
+    return _actual.get()
+
+
+def _contar_consulta(execute, sql, params, many, context):
+    medicion = _actual.get()
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if medicion is not None:
+            medicion.consultas += 1
+            medicion.db += time.perf_counter() - inicio
+
+
+@contextmanager
+def medir():
+    """Mide el bloque (un request) y entrega la ``Medicion``.
+
+    Si ya hay una medición activa (otro middleware) se reutiliza la misma.
+    """
+    activa = _actual.get()
+    if activa is not None:
+        yield activa
+        return
+    instalar()
+    medicion = Medicion()
+    token = _actual.set(medicion)
+    try:
+        with ExitStack() as pila:
+            for conexion in connections.all():
+                pila.enter_context(conexion.execute_wrapper(_contar_consulta))
+            yield medicion
+    finally:
+        medicion.terminar()
+        _actual.reset(token)
+
+
+def _cronometrado(funcion, campo, exterior=False):
+    """Envuelve ``funcion`` para sumar su duración a ``campo`` de la medición activa.
+
+    Con ``exterior`` solo cuenta la llamada más externa (renders anidados).
+    """
+    def envoltorio(*args, **kwargs):
+        medicion = _actual.get()
+        if medicion is None or (exterior and medicion._profundidad):
+            return funcion(*args, **kwargs)
+        inicio = time.perf_counter()
+        if exterior:
+            medicion._profundidad += 1
+        try:
+            return funcion(*args, **kwargs)
+        finally:
+            if exterior:
+                medicion._profundidad -= 1
+            setattr(medicion, campo, getattr(medicion, campo) + time.perf_counter() - inicio)
+
+    envoltorio.__wrapped__ = funcion
+    return envoltorio
+
+
+def _envolver_bind_template(original):
+    # bind_template es un context manager: los processors corren al entrar
+    @contextmanager
+    def bind_template(self, template):
+        gestor = original(self, template)
+        medicion = _actual.get()
+        inicio = time.perf_counter()
+        gestor.__enter__()
+        if medicion is not None:
+            medicion.context_processors += time.perf_counter() - inicio
+        try:
+            yield
+        finally:
+            gestor.__exit__(None, None, None)
+
+    bind_template.__wrapped__ = original
+    return bind_template
+
+
+def instalar():
+    """Envuelve render de plantillas, context processors y sesión (idempotente)."""
+    global _instalado
+    if _instalado:
+        return
+    from django.template import RequestContext
+    from django.template.backends.django import Template
+
+    Template.render = _cronometrado(Template.render, 'plantillas', exterior=True)
+    RequestContext.bind_template = _envolver_bind_template(RequestContext.bind_template)
+
+    SessionStore = import_module(settings.SESSION_ENGINE).SessionStore
+    SessionStore.load = _cronometrado(SessionStore.load, 'sesion')
+    SessionStore.save = _cronometrado(SessionStore.save, 'sesion')
+    _instalado = True
@@ -0,0 +1,130 @@
+"""Perfilado bajo demanda de un request con cProfile.
+
+Un usuario staff pide el perfil de un request enviando la clave configurada en
+``settings.PERFILADOR_CLAVE`` en la cabecera ``X-Perfilar`` o en el parámetro
+``?perfilar=``. El request se ejecuta completo bajo ``cProfile`` y el resultado
+se guarda como ``.pstats`` en ``PERFILADOR_DIR`` (se abre con ``pstats``,
+snakeviz o ``flameprof`` para un flamegraph), junto a un ``.json`` con los
+datos del request. El admin lista los perfiles recientes (Core › Perfiles de requests).
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import tempfile
+import time
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+
+
+CABECERA = 'X-Perfilar'
+PARAMETRO = 'perfilar'
+MAX_PERFILES = 100
+
+_NOMBRE = re.compile(r'^[\w.-]+$')
+
+
+def clave():
+    return getattr(settings, 'PERFILADOR_CLAVE', '')
+
+
+def directorio():
+    return getattr(settings, 'PERFILADOR_DIR', None) or os.path.join(tempfile.gettempdir(), 'ferreteria-perfiles')
+
+
+def solicitado(request):
+    """True si el request pide perfilarse con la clave correcta y el usuario es staff."""
+    esperada = clave()
+    if not esperada:
+        return False
+    recibida = request.headers.get(CABECERA) or request.GET.get(PARAMETRO)
+    if not recibida or not constant_time_compare(recibida, esperada):
+        return False
+    usuario = getattr(request, 'user', None)
+    return bool(usuario and usuario.is_authenticated and usuario.is_staff)
+
+
+def perfilar(request, get_response):
+    """Ejecuta ``get_response(request)`` bajo cProfile y guarda el perfil.
+
+    Devuelve la respuesta con la cabecera ``X-Perfil`` (nombre del archivo).
+    """
+    perfil = cProfile.Profile()
+    inicio = time.perf_counter()
+    perfil.enable()
+    try:
+        response = get_response(request)
+    finally:
+        perfil.disable()
+    duracion_ms = (time.perf_counter() - inicio) * 1000
+
+    match = getattr(request, 'resolver_match', None)
+    vista = match.view_name if match else 'sin_ruta'
+    nombre = '{}-{}'.format(timezone.now().strftime('%Y%m%d-%H%M%S-%f'), re.sub(r'[^\w.-]', '_', vista))
+    ruta = os.path.join(directorio(), nombre)
+    os.makedirs(directorio(), exist_ok=True)
+    perfil.dump_stats(f'{ruta}.pstats')
+    with open(f'{ruta}.json', 'w', encoding='utf-8') as fh:
+        json.dump({
+            'nombre': nombre,
+            'fecha': timezone.now().isoformat(),
+            'metodo': request.method,
+            'ruta': request.get_full_path(),
+            'vista': vista,
+            'estado': response.status_code,
+            'usuario': request.user.get_username(),
+            'duracion_ms': round(duracion_ms, 1),
+        }, fh, ensure_ascii=False)
+    limpiar()
+    response['X-Perfil'] = nombre
+    return response
+
+
+def limpiar(conservar=MAX_PERFILES):
+    """Borra los perfiles más antiguos y conserva los ``conservar`` más recientes."""
+    for datos in recientes(limite=None)[conservar:]:
+        for extension in ('.pstats', '.json'):
+            try:
+                os.remove(os.path.join(directorio(), datos['nombre'] + extension))
+            except OSError:
+                pass
+
+
+def recientes(limite=50):
+    """Metadatos de los perfiles guardados, el más reciente primero."""
+    try:
+        archivos = [a for a in os.listdir(directorio()) if a.endswith('.json')]
+    except OSError:
+        return []
+    perfiles = []
+    for archivo in sorted(archivos, reverse=True)[:limite]:
+        try:
+            with open(os.path.join(directorio(), archivo), encoding='utf-8') as fh:
+                perfiles.append(json.load(fh))
+        except (OSError, ValueError):
+            continue
+    return perfiles
+
+
+def ruta_pstats(nombre):
+    """Ruta del ``.pstats`` de ``nombre``, o None si el nombre no es válido o no existe."""
+    if not _NOMBRE.match(nombre or ''):
+        return None
+    ruta = os.path.join(directorio(), f'{nombre}.pstats')
+    return ruta if os.path.exists(ruta) else None
+
+
+def resumen(nombre, orden='cumulative', lineas=40):
+    """Texto de ``pstats`` con las funciones más costosas del perfil."""
+    ruta = ruta_pstats(nombre)
+    if ruta is None:
+        return None
+    salida = io.StringIO()
+    estadisticas = pstats.Stats(ruta, stream=salida)
+    estadisticas.strip_dirs().sort_stats(orden).print_stats(lineas)
+    return salida.getvalue()
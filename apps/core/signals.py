@@ -1,46 +1,43 @@
 from django.contrib.auth.signals import user_logged_in
-from django.dispatch import receiver
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+
+# Se envía tras el commit de cada nuevo conjunto de tasas
+# (ver ConfiguracionMoneda.incrementar_version_tasas)
+tasas_publicadas = Signal()
 
 
 @receiver(user_logged_in)
 def merge_cart_on_login(sender, user, request, **kwargs):
     """Al iniciar sesión, fusiona el carrito de sesión con el carrito en DB.
 
-    - Pasa items de session['cart'] a pedidos.Carrito del usuario.
-    - Vuelve a generar session['cart'] desde la DB para persistencia multi-sesión.
+    - Pasa items de session['cart'] a pedidos.Carrito del usuario (un solo upsert).
+    - Regenera session['cart'] con el resultado para persistencia multi-sesión.
     """
+    if request is None or not hasattr(request, 'session'):
+        return
     try:
-        from pedidos.models import Carrito
-        from catalogo.models import Producto
+        from pedidos.cart import merge_session_cart
     except Exception:
         return
 
-    session_cart = request.session.get('cart', {}) or {}
-
-    # Volcar sesión -> DB
-    for pid_str, qty in session_cart.items():
-        try:
-            pid = int(pid_str)
-            qty = max(1, int(qty))
-        except Exception:
-            continue
-        # Verificar existencia del producto
-        try:
-            Producto.objects.only('id').get(id=pid, activo=True)
-        except Exception:
-            continue
-        item, created = Carrito.objects.get_or_create(usuario=user, producto_id=pid, defaults={'cantidad': qty})
-        if not created:
-            item.cantidad = max(item.cantidad or 0, 0) + qty
-            item.save(update_fields=['cantidad'])
-
-    # Regenerar sesión a partir de DB
-    nuevos = {}
-    for item in Carrito.objects.filter(usuario=user).select_related('producto'):
-        try:
-            nuevos[str(item.producto_id)] = int(item.cantidad)
-        except Exception:
-            continue
-    request.session['cart'] = nuevos
-    request.session.modified = True
+    merge_session_cart(user, request.session)
+    # Descartar un carrito ya cargado en este request: apunta a la sesión anterior
+    if hasattr(request, '_cart'):
+        del request._cart
+
+
+@receiver(post_save, sender='core.TasaCambio')
+@receiver(post_delete, sender='core.TasaCambio')
+def tasas_modificadas(sender, **kwargs):
+    """Cualquier cambio en una tasa crea una nueva versión del conjunto de tasas."""
+    from .models import ConfiguracionMoneda
+    ConfiguracionMoneda.incrementar_version_tasas()
+
 
+@receiver(post_save, sender='core.ConfiguracionMoneda')
+@receiver(post_delete, sender='core.ConfiguracionMoneda')
+def configuracion_modificada(sender, **kwargs):
+    """Descarta la configuración cacheada (ver ``ConfiguracionMoneda.configuracion_cacheada``)."""
+    sender.invalidar_cache()
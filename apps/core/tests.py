@@ -1,3 +1,473 @@
-from django.test import TestCase
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+from decimal import Decimal
+from unittest import skipIf
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.cache import SessionStore
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from catalogo.models import Categoria, Comentario, Producto
+from pedidos.models import Carrito, Pedido
+from . import benchmarks, carga, consultas_lentas, metricas, perfilador
+from .models import TasaCambio, Usuario
+from .signals import merge_cart_on_login
+
+
+class MergeCartOnLoginTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        categoria = Categoria.objects.create(nombre='Herramientas')
+        cls.productos = Producto.objects.bulk_create([
+            Producto(
+                nombre=f'Producto {i}', descripcion='-', precio=Decimal('1.00'),
+                categoria=categoria, stock=100, imagen='productos/p.jpg', slug=f'producto-{i}',
+            )
+            for i in range(50)
+        ])
+        cls.user = User.objects.create_user('cliente', password='clave-segura-123')
+
+    def _login(self, session_cart):
+        request = RequestFactory().get('/')
+        request.session = SessionStore()
+        request.session['cart'] = session_cart
+        with CaptureQueriesContext(connection) as ctx:
+            merge_cart_on_login(sender=User, user=self.user, request=request)
+        return request.session['cart'], len(ctx.captured_queries)
+
+    def test_suma_cantidades_con_carrito_guardado(self):
+        p1, p2 = self.productos[0], self.productos[1]
+        Carrito.objects.create(usuario=self.user, producto=p1, cantidad=2)
+        cart, _ = self._login({str(p1.id): 3, str(p2.id): 1})
+        self.assertEqual(cart, {str(p1.id): 5, str(p2.id): 1})
+        self.assertEqual(Carrito.objects.get(usuario=self.user, producto=p1).cantidad, 5)
+        self.assertEqual(Carrito.objects.get(usuario=self.user, producto=p2).cantidad, 1)
+
+    def test_ignora_productos_inactivos_o_inexistentes(self):
+        p1 = self.productos[0]
+        Producto.objects.filter(pk=p1.pk).update(activo=False)
+        cart, _ = self._login({str(p1.id): 1, '999999': 2, 'x': 1})
+        self.assertEqual(cart, {})
+        self.assertFalse(Carrito.objects.exists())
+
+    def test_numero_de_consultas_constante(self):
+        _, con_uno = self._login({str(self.productos[0].id): 1})
+        Carrito.objects.all().delete()
+        _, con_cincuenta = self._login({str(p.id): 1 for p in self.productos})
+        self.assertEqual(con_uno, con_cincuenta)
+        self.assertLessEqual(con_cincuenta, 2)
+        self.assertEqual(Carrito.objects.filter(usuario=self.user).count(), 50)
+
+
+class ConsultasChangelistTests(TestCase):
+    """El changelist ejecuta el mismo número de consultas con 1 o 500 filas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'clave-segura-123')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+        self.client.cookies['admin_sessionid'] = self.client.cookies['sessionid'].value
+
+    def _consultas(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        return len(ctx)
+
+    def _comparar(self, presupuestos, crear):
+        crear(0, 1)
+        for nombre in presupuestos:
+            # Primera visita: crea la configuración de moneda y llena la caché
+            self.client.get(reverse(nombre))
+        con_uno = {nombre: self._consultas(reverse(nombre)) for nombre in presupuestos}
+        crear(1, 500)
+        for nombre, presupuesto in presupuestos.items():
+            with self.subTest(nombre):
+                con_500 = self._consultas(reverse(nombre))
+                self.assertEqual(con_uno[nombre], con_500)
+                self.assertLessEqual(con_500, presupuesto)
+
+    def test_usuarios(self):
+        def crear(desde, hasta):
+            usuarios = User.objects.bulk_create([User(username=f'cliente{i}') for i in range(desde, hasta)])
+            Usuario.objects.bulk_create([Usuario(user=u, cedula=f'{10000000 + u.pk}') for u in usuarios])
+
+        self._comparar({
+            'admin:auth_user_changelist': 10,
+            'admin:core_usuario_changelist': 10,
+        }, crear)
+
+    def test_tasas(self):
+        monedas = [codigo for codigo, _ in TasaCambio.MONEDAS]
+        pares = [(o, d) for o in monedas for d in monedas if o != d]
+        TasaCambio.objects.all().delete()  # las migraciones crean tasas iniciales
+
+        def crear(desde, hasta):
+            # Solo hay 12 pares de monedas distintos
+            TasaCambio.objects.bulk_create([
+                TasaCambio(moneda_origen=o, moneda_destino=d, tasa=Decimal('2'), actualizada_por=self.admin)
+                for o, d in pares[desde:hasta]
+            ])
+
+        self._comparar({'admin:core_tasacambio_changelist': 11}, crear)
+
+
+class PresupuestoVistasPublicasTests(TestCase):
+    """Consultas y tiempo de DB de las vistas públicas, independientes de cuántos productos muestran.
+
+    Cada vista se recorre en USD y VES, con y sin sesión iniciada, primero con
+    un catálogo y carrito de 3 productos y luego de 30: una consulta por
+    tarjeta o línea del carrito hace fallar la comparación.
+    """
+
+    PRESUPUESTOS = {
+        'index': 5,
+        'productos_lista': 6,
+        'productos_por_categoria': 7,
+        'producto_detalle': 6,
+        'carrito_ver': 6,
+        'checkout': 6,
+        'checkout_post': 12,
+        'pedido_confirmacion': 6,
+    }
+    TIEMPO_MAXIMO = 0.5  # segundos de DB por request
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cliente = User.objects.create_user('cliente', password='clave-segura-123')
+        cls.categoria = Categoria.objects.create(nombre='Herramientas')
+        TasaCambio.objects.update_or_create(
+            moneda_origen='USD', moneda_destino='VES', defaults={'tasa': Decimal('36.50'), 'activa': True},
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def _sembrar(self, total):
+        existentes = Producto.objects.count()
+        productos = Producto.objects.bulk_create([
+            Producto(
+                nombre=f'Producto {i}', descripcion='-', precio=Decimal('3.00'), categoria=self.categoria,
+                moneda_precio='VES' if i % 2 else 'USD', destacado=i % 3 == 0, stock=1000,
+                imagen='productos/p.jpg', slug=f'producto-{i}',
+            )
+            for i in range(existentes, total)
+        ])
+        primero = Producto.objects.order_by('pk').first()
+        Comentario.objects.bulk_create([
+            Comentario(producto=primero, usuario=self.cliente, nombre='Cliente', contenido='-') for _ in productos
+        ])
+
+    def _medir(self, metodo, url, datos=None):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = getattr(self.client, metodo)(url, datos or {})
+        self.assertIn(resp.status_code, (200, 302), url)
+        return len(ctx), sum(float(q['time']) for q in ctx.captured_queries)
+
+    def _recorrer(self, autenticado):
+        primero = Producto.objects.order_by('pk').first()
+        vistas = [
+            ('index', reverse('core:index')),
+            ('productos_lista', reverse('catalogo:productos_lista')),
+            ('productos_por_categoria', reverse('catalogo:productos_por_categoria', args=[self.categoria.slug])),
+            ('producto_detalle', reverse('catalogo:producto_detalle', args=[primero.slug])),
+            ('carrito_ver', reverse('pedidos:carrito_ver')),
+        ]
+        if autenticado:
+            vistas.append(('checkout', reverse('pedidos:checkout')))
+
+        resultados = {}
+        for moneda in ('USD', 'VES'):
+            self.client.logout()
+            if autenticado:
+                self.client.force_login(self.cliente)
+            sesion = self.client.session
+            sesion['moneda'] = moneda
+            sesion['cart'] = {str(pk): 1 for pk in Producto.objects.values_list('pk', flat=True)}
+            sesion.save()
+
+            for nombre, url in vistas:
+                resultados[nombre, moneda] = self._medir('get', url)
+            if autenticado:
+                resultados['checkout_post', moneda] = self._medir('post', reverse('pedidos:checkout'), {
+                    'direccion_entrega': 'Calle 1', 'telefono_contacto': '0412', 'metodo_pago': 'efectivo',
+                })
+                pedido = Pedido.objects.get()
+                self.assertEqual(pedido.items.count(), Producto.objects.count())
+                url = reverse('pedidos:pedido_confirmacion', args=[pedido.numero_pedido])
+                resultados['pedido_confirmacion', moneda] = self._medir('get', url)
+                # El número de pedido se genera por segundo
+                pedido.delete()
+        return resultados
+
+    def _comparar(self, autenticado):
+        self._sembrar(3)
+        self._recorrer(autenticado)  # llena la caché de configuración y tasas
+        pocos = self._recorrer(autenticado)
+        self._sembrar(30)
+        muchos = self._recorrer(autenticado)
+        for clave, (consultas, segundos) in muchos.items():
+            with self.subTest(vista=clave):
+                self.assertEqual(pocos[clave][0], consultas)
+                self.assertLessEqual(consultas, self.PRESUPUESTOS[clave[0]])
+                self.assertLess(segundos, self.TIEMPO_MAXIMO)
+
+    def test_anonimo(self):
+        self._comparar(autenticado=False)
+
+    def test_autenticado(self):
+        self._comparar(autenticado=True)
+
+
+class ServerTimingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        categoria = Categoria.objects.create(nombre='Herramientas')
+        Producto.objects.create(
+            nombre='Martillo', descripcion='-', precio=Decimal('1.00'), categoria=categoria,
+            stock=5, imagen='productos/p.jpg',
+        )
+
+    def test_desactivado_no_agrega_cabecera(self):
+        resp = self.client.get(reverse('catalogo:productos_lista'))
+        self.assertNotIn('Server-Timing', resp)
+
+    @override_settings(SERVER_TIMING=True)
+    def test_cabecera_y_log_estructurado(self):
+        cliente = self.client_class()
+        with self.assertLogs('core.middleware', 'INFO') as logs:
+            resp = cliente.get(reverse('catalogo:productos_lista'))
+        metricas = {parte.split(';')[0].strip(): parte for parte in resp['Server-Timing'].split(',')}
+        self.assertEqual(set(metricas), {'db', 'tpl', 'ctx', 'session', 'total'})
+
+        datos = json.loads(logs.records[-1].getMessage().split(' ', 1)[1])
+        self.assertEqual((datos['vista'], datos['estado']), ('catalogo:productos_lista', 200))
+        self.assertGreater(datos['consultas'], 0)
+        self.assertIn(f'desc="{datos["consultas"]} consultas"', metricas['db'])
+        self.assertGreater(datos['plantillas_ms'] + datos['context_processors_ms'], 0)
+
+
+class MetricasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('staff', password='clave-segura-123', is_staff=True)
+        cls.cliente = User.objects.create_user('cliente', password='clave-segura-123')
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        ajustes = override_settings(METRICAS=True, METRICAS_DIR=self.dir, METRICAS_TOKEN='secreto')
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        metricas.reiniciar()
+        self.addCleanup(metricas.reiniciar)
+        self.cliente_http = self.client_class()
+
+    def test_agrega_workers_y_exige_staff(self):
+        self.cliente_http.get(reverse('core:index'))
+        self.cliente_http.get(reverse('catalogo:productos_lista'))
+        # Otro worker (vivo) ya volcó sus métricas
+        with open(os.path.join(self.dir, f'{os.getppid()}-1.json'), 'w') as fh:
+            json.dump({'requests': {'core:index|GET|200': 4}, 'eventos': {'checkout|ok': 2}}, fh)
+
+        self.cliente_http.force_login(self.cliente)
+        self.assertEqual(self.cliente_http.get(reverse('core:metricas')).status_code, 403)
+
+        self.cliente_http.force_login(self.staff)
+        resp = self.cliente_http.get(reverse('core:metricas'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp['Content-Type'].startswith('text/plain; version=0.0.4'))
+        texto = resp.content.decode()
+        self.assertIn('ferreteria_requests_total{vista="core:index",metodo="GET",estado="200"} 5', texto)
+        self.assertIn('ferreteria_eventos_total{evento="checkout",resultado="ok"} 2', texto)
+        self.assertIn('ferreteria_request_duracion_segundos_count{vista="catalogo:productos_lista"} 1', texto)
+        self.assertIn('ferreteria_consultas_db_total{vista="catalogo:productos_lista"}', texto)
+        self.assertIn('ferreteria_cache_total{resultado="hit"}', texto)
+
+    @skipIf(os.name == 'nt', 'sin comprobación de pid en Windows')
+    def test_descarta_archivos_de_procesos_terminados(self):
+        terminado = subprocess.Popen([sys.executable, '-c', 'pass'])
+        terminado.wait()
+        for pid in (terminado.pid, os.getppid()):
+            with open(os.path.join(self.dir, f'{pid}-1.json'), 'w') as fh:
+                json.dump({'eventos': {'checkout|ok': 1}}, fh)
+
+        self.assertEqual(metricas.leer_todas()['eventos'], {'checkout|ok': 1})
+        self.assertEqual(os.listdir(self.dir), [f'{os.getppid()}-1.json'])
+        metricas.proceso_terminado(os.getppid())
+        self.assertEqual(os.listdir(self.dir), [])
+
+    def test_token_de_scraping(self):
+        resp = self.client_class().get(reverse('core:metricas'), HTTP_AUTHORIZATION='Bearer secreto')
+        self.assertEqual(resp.status_code, 200)
+        resp = self.client_class().get(reverse('core:metricas'), HTTP_AUTHORIZATION='Bearer otro')
+        self.assertEqual(resp.status_code, 403)
+
+
+class ConsultasLentasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        categoria = Categoria.objects.create(nombre='Herramientas')
+        Producto.objects.create(
+            nombre='Martillo', descripcion='-', precio=Decimal('1.00'), categoria=categoria,
+            stock=5, imagen='productos/p.jpg',
+        )
+        cls.staff = User.objects.create_superuser('admin', 'admin@example.com', 'clave-segura-123')
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        self.archivo = os.path.join(self.dir, 'consultas_lentas.log')
+        ajustes = override_settings(CONSULTAS_LENTAS_MS=0.0001, CONSULTAS_LENTAS_ARCHIVO=self.archivo)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def test_normalizar(self):
+        self.assertEqual(
+            consultas_lentas.normalizar('SELECT *\n  FROM t WHERE id IN (%s, %s, %s)'),
+            'SELECT * FROM t WHERE id IN (...)',
+        )
+
+    def test_registra_sql_vista_origen_y_plan(self):
+        with self.assertLogs('core.consultas_lentas', 'WARNING') as logs:
+            with connection.execute_wrapper(consultas_lentas.registrar):
+                resp = self.client_class().get(reverse('catalogo:productos_lista'))
+        self.assertEqual(resp.status_code, 200)
+
+        entradas = [json.loads(r.getMessage()) for r in logs.records]
+        productos = [e for e in entradas if 'FROM "catalogo_producto"' in e['sql'] and e['sql'].startswith('SELECT')]
+        self.assertTrue(productos)
+        entrada = productos[0]
+        self.assertEqual(entrada['vista'], 'catalogo:productos_lista')
+        self.assertTrue(entrada['origen'])
+        self.assertIsInstance(entrada['parametros'], list)
+        if connection.vendor in ('sqlite', 'postgresql'):
+            self.assertTrue(entrada['plan'])
+            self.assertNotIn('no se pudo', entrada['plan'])
+
+    def test_admin_lista_entradas_agrupadas(self):
+        entrada = {
+            'fecha': '2026-01-01T10:00:00', 'duracion_ms': 120.5, 'alias': 'default', 'vista': 'core:index',
+            'origen': 'core/views.py:10 en index', 'sql': 'SELECT * FROM "catalogo_producto"',
+            'parametros': [], 'plan': 'SCAN catalogo_producto',
+        }
+        with open(self.archivo, 'w', encoding='utf-8') as fh:
+            fh.write(json.dumps(entrada) + '\n')
+            fh.write(json.dumps({**entrada, 'duracion_ms': 80.0}) + '\n')
+
+        grupos = consultas_lentas.agrupar(consultas_lentas.ultimas())
+        self.assertEqual((grupos[0]['veces'], grupos[0]['max_ms']), (2, 120.5))
+
+        self.client.force_login(self.staff)
+        self.client.cookies['admin_sessionid'] = self.client.cookies['sessionid'].value
+        resp = self.client.get(reverse('admin:core_consultalenta_changelist'))
+        self.assertContains(resp, 'SCAN catalogo_producto')
+        self.assertContains(resp, 'core/views.py:10 en index')
+
+
+class PerfiladorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_superuser('admin', 'admin@example.com', 'clave-segura-123')
+        cls.cliente = User.objects.create_user('cliente', password='clave-segura-123')
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        ajustes = override_settings(PERFILADOR_CLAVE='secreto', PERFILADOR_DIR=self.dir)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.cliente_http = self.client_class()
+
+    def test_solo_staff_con_clave(self):
+        url = reverse('core:index')
+        self.cliente_http.force_login(self.cliente)
+        self.assertNotIn('X-Perfil', self.cliente_http.get(url, {'perfilar': 'secreto'}))
+        self.cliente_http.force_login(self.staff)
+        self.assertNotIn('X-Perfil', self.cliente_http.get(url, {'perfilar': 'otra'}))
+        self.assertEqual(perfilador.recientes(), [])
+
+        resp = self.cliente_http.get(url, HTTP_X_PERFILAR='secreto')
+        nombre = resp['X-Perfil']
+        self.assertTrue(os.path.exists(os.path.join(self.dir, f'{nombre}.pstats')))
+        (datos,) = perfilador.recientes()
+        self.assertEqual((datos['vista'], datos['estado'], datos['usuario']), ('core:index', 200, 'admin'))
+
+    def test_admin_lista_resumen_y_descarga(self):
+        self.cliente_http.force_login(self.staff)
+        nombre = self.cliente_http.get(reverse('core:index'), {'perfilar': 'secreto'})['X-Perfil']
+
+        self.cliente_http.cookies['admin_sessionid'] = self.cliente_http.cookies['sessionid'].value
+        resp = self.cliente_http.get(reverse('admin:core_perfilrequest_changelist'))
+        self.assertContains(resp, reverse('admin:core_perfilrequest_ver', args=[nombre]))
+        resp = self.cliente_http.get(reverse('admin:core_perfilrequest_ver', args=[nombre]), {'orden': 'tottime'})
+        self.assertContains(resp, 'function calls')
+        resp = self.cliente_http.get(reverse('admin:core_perfilrequest_descargar', args=[nombre]))
+        self.assertEqual(resp.status_code, 200)
+        resp.close()
+        resp = self.cliente_http.get(reverse('admin:core_perfilrequest_descargar', args=['no-existe']))
+        self.assertEqual(resp.status_code, 404)
+
+
+class PruebaCargaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        categoria = Categoria.objects.create(nombre='Herramientas')
+        for i in range(3):
+            Producto.objects.create(
+                nombre=f'Martillo {i}', descripcion='-', precio=Decimal('1.00'), categoria=categoria,
+                stock=1, imagen='productos/p.jpg',
+            )
+
+    def test_percentiles_y_resumen(self):
+        self.assertEqual(carga.percentil([1, 2, 3, 4], 50), 2)
+        self.assertEqual(carga.percentil(list(range(1, 101)), 99), 99)
+        resultados = carga.Resultados()
+        for estado, segundos in [(200, 0.01), (200, 0.03), (500, 0.02)]:
+            resultados.registrar('core:index', estado, segundos)
+        resultados.terminar()
+        fila = resultados.resumen()['urls'][0]
+        self.assertEqual((fila['url'], fila['requests'], fila['errores']), ('core:index', 3, 1))
+        self.assertEqual((fila['p50_ms'], fila['p99_ms']), (20.0, 30.0))
+
+    def test_checkout_compite_por_el_stock_caliente(self):
+        catalogo = carga.preparar(usuarios=2, productos_calientes=1, stock=3)
+        self.assertEqual(User.objects.filter(username__startswith=carga.PREFIJO_USUARIO).count(), 2)
+        self.assertEqual(Producto.objects.get(pk=catalogo['calientes'][0][0]).stock, 3)
+
+        resultados = carga.Resultados()
+        usuario = carga.UsuarioVirtual(0, carga.ClienteWSGI(), catalogo, resultados, random.Random(1))
+        usuario.checkout()
+        self.assertTrue(usuario.autenticado)
+        self.assertEqual(resultados.estados['pedidos:checkout'], {200: 1, 302: 1})
+        self.assertEqual(resultados.estados['pedidos:pedido_confirmacion'], {200: 1})
+        self.assertEqual(Pedido.objects.get().usuario.username, 'carga-0')
+        self.assertLess(Producto.objects.get(pk=catalogo['calientes'][0][0]).stock, 3)
+
+
+class MicroBenchmarksTests(TestCase):
+    def test_todos_los_casos_corren_y_se_comparan(self):
+        informe = benchmarks.ejecutar(iteraciones=20, repeticiones=2)
+        self.assertEqual(set(informe['resultados']), set(benchmarks.CASOS))
+        for datos in informe['resultados'].values():
+            self.assertGreater(datos['min_ns'], 0)
+
+        anterior = {'resultados': {
+            nombre: {**datos, 'min_ns': datos['min_ns'] / 2} for nombre, datos in informe['resultados'].items()
+        }}
+        filas = benchmarks.comparar(anterior, informe, tolerancia=0.10)
+        self.assertEqual(len(filas), len(benchmarks.CASOS))
+        self.assertTrue(all(regresion for *_, regresion in filas))
+        self.assertFalse(any(regresion for *_, regresion in benchmarks.comparar(informe, informe)))
@@ -13,4 +13,5 @@ urlpatterns = [
     path('contacto/', views.contacto, name='contacto'),
     path('vistas/', views.vistas, name='vistas'),
     path('moneda/', views.set_moneda, name='set_moneda'),
+    path('metricas/', views.metricas_view, name='metricas'),
 ]
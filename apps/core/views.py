@@ -4,10 +4,13 @@ from django.contrib.auth import login as auth_login
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
 from urllib.parse import quote
 from catalogo.models import Producto, Categoria
 from core.models import ConfiguracionMoneda
 from django.urls import reverse
+from . import metricas
 from .forms import SignupForm
 
 
@@ -134,3 +137,21 @@ def perfil(request):
         'perfil': usuario,
     }
     return render(request, 'core/perfil.html', contexto)
+
+
+def metricas_view(request):
+    """Métricas de todos los workers en formato de texto de Prometheus (solo staff o token)."""
+    if not metricas.activas():
+        raise Http404
+    token = getattr(settings, 'METRICAS_TOKEN', '')
+    autorizado = request.user.is_authenticated and request.user.is_staff
+    if not autorizado and token:
+        autorizado = constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+    if not autorizado:
+        return HttpResponse('No autorizado', status=403, content_type='text/plain')
+
+    metricas.volcar()
+    return HttpResponse(
+        metricas.exponer(metricas.leer_todas()),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
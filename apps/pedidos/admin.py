@@ -4,45 +4,103 @@ from django.urls import reverse
 from django.utils.safestring import mark_safe
 from django.contrib import messages
 from django.shortcuts import redirect
-from .models import Carrito, Pedido, ItemPedido
+from django import forms
+from . import estados, facturas, facturas_lote, reportes, ventas
+from .models import Carrito, Pedido, ItemPedido, TransicionPedido, VentaDiaria
+from .totales import fijar_tasa, recalcular_totales
+from core.autocompletar import AutocompletarMixin
+from core.exportar import ExportarMixin
+from core.models import TasaCambio
 from decimal import Decimal
-from django.db.models import Sum
-from django.http import HttpResponse
-from django.shortcuts import get_object_or_404
-from io import BytesIO
-try:
-    from reportlab.pdfgen import canvas
-    from reportlab.lib.pagesizes import A4
-except Exception:
-    canvas = None
-    A4 = None
+from django.core.files.storage import default_storage
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, render
+from django.utils.cache import get_conditional_response
+from django.utils import timezone
+from django.utils.http import http_date
+import logging
+
+logger = logging.getLogger(__name__)
 
 # Register your models here.
 
+class EdicionConcurrente(Exception):
+    mensaje = 'Otro administrador modificó este pedido mientras lo editabas. Recarga la página y vuelve a intentarlo.'
+
+
+class PedidoAdminForm(forms.ModelForm):
+    """Valida transiciones de estado y detecta ediciones concurrentes.
+
+    ``version_esperada`` viaja oculto en el formulario con la versión que vio el
+    administrador; si otro la cambió mientras tanto, el guardado se rechaza.
+    """
+    version_esperada = forms.IntegerField(widget=forms.HiddenInput, required=False)
+
+    class Meta:
+        model = Pedido
+        fields = '__all__'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            self.fields['version_esperada'].initial = self.instance.version
+
+    def clean(self):
+        cleaned = super().clean()
+        if not self.instance.pk:
+            return cleaned
+        actual = Pedido.objects.filter(pk=self.instance.pk).values('version', 'estado').first()
+        if actual is None:
+            return cleaned
+        esperada = cleaned.get('version_esperada')
+        if esperada is not None and esperada != actual['version']:
+            raise forms.ValidationError(EdicionConcurrente.mensaje)
+        nuevo = cleaned.get('estado')
+        if nuevo and nuevo != actual['estado'] and not estados.puede_transicionar('estado', actual['estado'], nuevo):
+            self.add_error('estado', f'No se permite pasar de "{actual["estado"]}" a "{nuevo}".')
+        return cleaned
+
+
+class TransicionPedidoInline(admin.TabularInline):
+    model = TransicionPedido
+    extra = 0
+    can_delete = False
+    fields = ('fecha', 'campo', 'valor_anterior', 'valor_nuevo', 'usuario', 'notas')
+    readonly_fields = fields
+    verbose_name_plural = 'Historial de estados'
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 class ItemPedidoInline(admin.TabularInline):
     model = ItemPedido
     extra = 0
     # Permitir seleccionar producto y cantidad; precios y subtotal, solo lectura
     readonly_fields = ('precio_unitario', 'subtotal_formateado')
     fields = ('producto', 'cantidad', 'precio_unitario', 'subtotal_formateado')
+    autocomplete_fields = ('producto',)
     show_change_link = True
 
 @admin.register(Carrito)
 class CarritoAdmin(admin.ModelAdmin):
     list_display = ('usuario', 'producto', 'cantidad', 'subtotal_formateado', 'created_at')
-    list_filter = ('created_at', 'usuario')
+    list_filter = ('created_at',)
     search_fields = ('usuario__username', 'producto__nombre')
+    autocomplete_fields = ('usuario', 'producto')
+    list_select_related = ('usuario', 'producto__categoria')
     readonly_fields = ('created_at', 'updated_at', 'subtotal_formateado')
-    
-    def get_queryset(self, request):
-        return super().get_queryset(request).select_related('usuario', 'producto')
 
 @admin.register(Pedido)
-class PedidoAdmin(admin.ModelAdmin):
+class PedidoAdmin(ExportarMixin, AutocompletarMixin, admin.ModelAdmin):
     list_display = (
-        'numero_pedido', 'usuario', 'total_formateado', 'estado_pago_display', 
+        'numero_pedido_version', 'usuario', 'total_formateado', 'items_count', 'estado_pago_display', 
         'metodo_pago', 'fecha_creacion', 'comprobante_link'
     )
+    list_select_related = ('usuario',)
+    exportacion = 'pedidos'
     list_filter = ('estado_pago', 'estado', 'metodo_pago', 'fecha_creacion')
     search_fields = ('numero_pedido', 'usuario__username', 'usuario__email')
     readonly_fields = (
@@ -51,7 +109,11 @@ class PedidoAdmin(admin.ModelAdmin):
         'estado_pago_display', 'administrador_pago', 'fecha_pago',
         'descargar_factura'
     )
-    inlines = [ItemPedidoInline]
+    inlines = [ItemPedidoInline, TransicionPedidoInline]
+    form = PedidoAdminForm
+    autocomplete_fields = ('usuario',)
+    autocomplete_search_fields = ('^numero_pedido',)
+    autocomplete_ordering = ('-fecha_creacion',)
 
     class Media:
         js = ('js/admin-pedidos-reporte.js',)
@@ -60,7 +122,7 @@ class PedidoAdmin(admin.ModelAdmin):
 
     fieldsets = (
         ('Información del Pedido', {
-            'fields': ('numero_pedido', 'usuario', 'total', 'total_formateado', 'items_count', 'descargar_factura')
+            'fields': ('numero_pedido', 'usuario', 'total', 'total_formateado', 'items_count', 'descargar_factura', 'version_esperada')
         }),
         ('Estado del Pedido', {
             'fields': ('estado', 'estado_pago_display', 'metodo_pago')
@@ -86,7 +148,7 @@ class PedidoAdmin(admin.ModelAdmin):
 
     actions = ['aprobar_pagos', 'rechazar_pagos', 'marcar_como_procesando', 'marcar_como_completado']
     # Añadir acción para crear reporte PDF de pedidos seleccionados
-    actions += ['crear_reporte_pdf']
+    actions += ['crear_reporte_pdf', 'descargar_facturas_zip']
 
     def get_form(self, request, obj=None, **kwargs):
         form = super().get_form(request, obj, **kwargs)
@@ -94,24 +156,50 @@ class PedidoAdmin(admin.ModelAdmin):
             form.base_fields['total'].required = False
         return form
 
+    def changeform_view(self, request, object_id=None, form_url='', extra_context=None):
+        try:
+            return super().changeform_view(request, object_id, form_url, extra_context)
+        except EdicionConcurrente:
+            # La transacción de la vista ya se revirtió (incluidos los items)
+            self.message_user(request, EdicionConcurrente.mensaje, messages.ERROR)
+            return redirect(request.get_full_path())
+
     def save_model(self, request, obj, form, change):
         # Asegura un valor por defecto para evitar NOT NULL al primer guardado
         if obj.total is None:
             obj.total = Decimal('0.00')
+        anterior = None
+        if change and 'estado' in form.changed_data:
+            anterior = form.initial.get('estado')
+        if change:
+            # UPDATE condicional: solo uno de dos guardados concurrentes con la misma
+            # versión gana; el otro se rechaza en vez de sobrescribir al primero
+            esperada = form.cleaned_data.get('version_esperada')
+            if esperada is None:
+                esperada = obj.version
+            if not Pedido.objects.filter(pk=obj.pk, version=esperada).update(version=F('version') + 1):
+                raise EdicionConcurrente
+            obj.version = esperada + 1
         super().save_model(request, obj, form, change)
+        if anterior and anterior != obj.estado:
+            TransicionPedido.objects.create(
+                pedido=obj, campo='estado', valor_anterior=anterior,
+                valor_nuevo=obj.estado, usuario=request.user, notas='Editado desde admin',
+            )
 
     def save_formset(self, request, form, formset, change):
         instances = formset.save(commit=False)
-        # Completar precios y subtotales en items antes de guardar
+        # Completar precios en items antes de guardar (el subtotal lo calcula la base de datos)
         if formset.model is ItemPedido:
+            tasas = None
             for it in instances:
                 if it.precio_unitario is None and it.producto:
                     it.precio_unitario = it.producto.precio or Decimal('0.00')
-                if it.precio_unitario is not None and it.cantidad:
-                    try:
-                        it.subtotal = it.precio_unitario * int(it.cantidad)
-                    except Exception:
-                        it.subtotal = Decimal('0.00')
+                if it.pk is None:
+                    # Solo los items nuevos toman la tasa vigente; los existentes
+                    # conservan la del momento del pedido
+                    tasas = tasas or TasaCambio.snapshot()
+                    fijar_tasa(it, form.instance.moneda, tasas)
                 it.save()
             for obj_del in formset.deleted_objects:
                 obj_del.delete()
@@ -122,17 +210,59 @@ class PedidoAdmin(admin.ModelAdmin):
                 obj_del.delete()
 
         formset.save_m2m()
-        # Recalcular total del pedido después de guardar items
+        # El total se recalcula con las tasas guardadas en cada item (version_tasas no cambia)
         pedido = form.instance
-        if isinstance(pedido, Pedido):
-            total = pedido.items.aggregate(Sum('subtotal')).get('subtotal__sum') or Decimal('0.00')
-            if pedido.total != total:
-                pedido.total = total
-                pedido.save(update_fields=['total'])
+        if formset.model is ItemPedido and isinstance(pedido, Pedido) and formset.has_changed():
+            recalcular_totales(Pedido.objects.filter(pk=pedido.pk))
+            pedido.refresh_from_db(fields=['total', 'totales_moneda', 'fecha_actualizacion'])
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('usuario', 'administrador_pago').prefetch_related('items')
+        # Subconsulta en lugar de Count() + GROUP BY: las acciones usan select_for_update sobre este queryset
+        items = (
+            ItemPedido.objects.filter(pedido=OuterRef('pk')).order_by()
+            .values('pedido').annotate(n=Count('pk')).values('n')
+        )
+        return super().get_queryset(request).annotate(num_items=Coalesce(Subquery(items), 0))
     
+    def items_count(self, obj):
+        # Anotado en get_queryset: sin consulta por fila en el changelist
+        return obj.num_items
+    items_count.short_description = 'Items'
+    items_count.admin_order_field = 'num_items'
+    
+    def numero_pedido_version(self, obj):
+        # La versión vista viaja con el formulario de acciones (ver _versiones)
+        return format_html(
+            '{}<input type="hidden" name="version_{}" value="{}">', obj.numero_pedido, obj.pk, obj.version,
+        )
+    numero_pedido_version.short_description = 'Número de pedido'
+    numero_pedido_version.admin_order_field = 'numero_pedido'
+
+    def _versiones(self, request):
+        """{pk: versión vista en el changelist} para las acciones, o None.
+
+        Con "seleccionar todos" los pedidos de otras páginas no se vieron: no hay
+        versión esperada que comparar.
+        """
+        if request.POST.get('select_across') == '1':
+            return None
+        versiones = {}
+        for clave, valor in request.POST.items():
+            if clave.startswith('version_'):
+                try:
+                    versiones[int(clave[len('version_'):])] = int(valor)
+                except ValueError:
+                    continue
+        return versiones or None
+
+    def _informar_omitidos(self, request, resultado):
+        if resultado.omitidos:
+            self.message_user(
+                request,
+                f'{len(resultado.omitidos)} pedidos omitidos: su estado no lo permite o cambiaron desde que cargaste la lista.',
+                level=messages.WARNING,
+            )
+
     def comprobante_link(self, obj):
         if obj.comprobante_pago:
             return format_html(
@@ -153,10 +283,12 @@ class PedidoAdmin(admin.ModelAdmin):
     
     def aprobar_pagos(self, request, queryset):
         """Acción para aprobar pagos seleccionados"""
-        count = 0
-        for pedido in queryset.filter(estado_pago='verificando'):
-            pedido.aprobar_pago(request.user, "Pago verificado desde admin")
-            count += 1
+        resultado = estados.aprobar_pagos(
+            queryset.filter(estado_pago='verificando'), request.user, "Pago verificado desde admin",
+            versiones=self._versiones(request),
+        )
+        count = len(resultado.aplicados)
+        self._informar_omitidos(request, resultado)
         
         if count > 0:
             self.message_user(request, f'{count} pagos aprobados exitosamente.')
@@ -166,10 +298,12 @@ class PedidoAdmin(admin.ModelAdmin):
     
     def rechazar_pagos(self, request, queryset):
         """Acción para rechazar pagos seleccionados"""
-        count = 0
-        for pedido in queryset.filter(estado_pago='verificando'):
-            pedido.rechazar_pago(request.user, "Pago rechazado - revisar comprobante")
-            count += 1
+        resultado = estados.rechazar_pagos(
+            queryset.filter(estado_pago='verificando'), request.user, "Pago rechazado - revisar comprobante",
+            versiones=self._versiones(request),
+        )
+        count = len(resultado.aplicados)
+        self._informar_omitidos(request, resultado)
         
         if count > 0:
             self.message_user(request, f'{count} pagos rechazados.')
@@ -179,14 +313,21 @@ class PedidoAdmin(admin.ModelAdmin):
     
     def marcar_como_procesando(self, request, queryset):
         """Marcar pedidos como en proceso"""
-        updated = queryset.filter(estado_pago='pagado').update(estado='procesando')
-        self.message_user(request, f'{updated} pedidos marcados como en proceso.')
+        resultado = estados.aplicar_transicion(
+            queryset.filter(estado_pago='pagado'), 'estado', 'procesando', usuario=request.user,
+            versiones=self._versiones(request),
+        )
+        self.message_user(request, f'{len(resultado.aplicados)} pedidos marcados como en proceso.')
+        self._informar_omitidos(request, resultado)
     marcar_como_procesando.short_description = "🔄 Marcar como en proceso"
     
     def marcar_como_completado(self, request, queryset):
         """Marcar pedidos como completados"""
-        updated = queryset.filter(estado='procesando').update(estado='completado')
-        self.message_user(request, f'{updated} pedidos marcados como completados.')
+        resultado = estados.aplicar_transicion(
+            queryset, 'estado', 'completado', usuario=request.user, versiones=self._versiones(request),
+        )
+        self.message_user(request, f'{len(resultado.aplicados)} pedidos marcados como completados.')
+        self._informar_omitidos(request, resultado)
     marcar_como_completado.short_description = "✅ Marcar como completado"
 
     # --- PDF factura support ---
@@ -206,87 +347,36 @@ class PedidoAdmin(admin.ModelAdmin):
     descargar_factura.short_description = 'Factura'
 
     def factura_view(self, request, pedido_id, *args, **kwargs):
-        """Genera un PDF simple de la factura (usa ReportLab si está disponible)."""
-        pedido = get_object_or_404(Pedido, pk=pedido_id)
+        """Descarga la factura en PDF (usa ReportLab si está disponible).
 
-        if canvas is None or A4 is None:
+        El PDF se cachea por versión del pedido (ver pedidos.facturas) y se sirve
+        con ETag/Last-Modified para responder 304 si el navegador ya lo tiene.
+        """
+        pedido = get_object_or_404(Pedido.objects.select_related('usuario'), pk=pedido_id)
+
+        etag = f'"{facturas.version_factura(pedido)}"'
+        last_modified = int(pedido.fecha_actualizacion.timestamp()) if pedido.fecha_actualizacion else None
+        validadores = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+        if last_modified is not None:
+            validadores['Last-Modified'] = http_date(last_modified)
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            # El 304 repite los validadores para que el cliente los conserve
+            for cabecera, valor in validadores.items():
+                not_modified[cabecera] = valor
+            return not_modified
+
+        if facturas.canvas is None or facturas.A4 is None:
             return HttpResponse('ReportLab no está instalado en el servidor. Instala reportlab para generar PDFs.', status=500)
 
-        buffer = BytesIO()
-        p = canvas.Canvas(buffer, pagesize=A4)
-        width, height = A4
-
-        # Margenes
-        x_margin = 50
-        y = height - 60
-
-        # Title
-        p.setFont('Helvetica-Bold', 20)
-        p.drawString(x_margin, y, 'Ferretería San Benito')
-        y -= 30
-
-        # Order header
-        p.setFont('Helvetica', 10)
-        from django.utils import timezone
-        fecha_str = timezone.localtime(pedido.fecha_creacion).strftime('%Y-%m-%d %H:%M') if pedido.fecha_creacion else ''
-        p.drawString(x_margin, y, f'Fecha: {fecha_str}')
-        p.drawRightString(width - x_margin, y, f'Pedido: {pedido.numero_pedido}')
-        y -= 20
-
-        # Customer
-        p.setFont('Helvetica-Bold', 12)
-        p.drawString(x_margin, y, f'Cliente: {pedido.usuario.get_full_name() or pedido.usuario.username}')
-        y -= 14
-        p.setFont('Helvetica', 10)
-        p.drawString(x_margin, y, f'Teléfono: {pedido.telefono_contacto}')
-        y -= 14
-        p.drawString(x_margin, y, 'Dirección:')
-        y -= 12
-        text = p.beginText(x_margin, y)
-        text.setFont('Helvetica', 10)
-        for line in str(pedido.direccion_entrega).splitlines():
-            text.textLine(line)
-        p.drawText(text)
-        y = text.getY() - 10
-
-        # Table header
-        p.setFont('Helvetica-Bold', 10)
-        p.drawString(x_margin, y, 'Producto')
-        p.drawRightString(width - 200, y, 'Cantidad')
-        p.drawRightString(width - 120, y, 'Precio')
-        p.drawRightString(width - x_margin, y, 'Subtotal')
-        y -= 14
-        p.setFont('Helvetica', 10)
-
-        # Items
-        for item in pedido.items.all():
-            if y < 80:
-                p.showPage()
-                y = height - 60
-            p.drawString(x_margin, y, item.producto.nombre)
-            p.drawRightString(width - 200, y, str(item.cantidad))
-            p.drawRightString(width - 120, y, f'${item.precio_unitario:,.2f}')
-            p.drawRightString(width - x_margin, y, f'${item.subtotal:,.2f}')
-            y -= 14
-
-        # Totals
-        y -= 10
-        p.line(x_margin, y, width - x_margin, y)
-        y -= 16
-        p.setFont('Helvetica-Bold', 11)
-        p.drawRightString(width - 140, y, 'Total:')
-        p.drawRightString(width - x_margin, y, f'${pedido.total:,.2f}')
-
-        # Finish up
-        p.showPage()
-        p.save()
-        pdf = buffer.getvalue()
-        buffer.close()
-
-        response = HttpResponse(content_type='application/pdf')
+        nombre = facturas.obtener_factura(pedido)
         filename = f'factura_{pedido.numero_pedido}.pdf'
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        response.write(pdf)
+        response = FileResponse(
+            default_storage.open(nombre, 'rb'), as_attachment=True,
+            filename=filename, content_type='application/pdf',
+        )
+        for cabecera, valor in validadores.items():
+            response[cabecera] = valor
         return response
 
     def crear_reporte_pdf(self, request, queryset):
@@ -294,117 +384,92 @@ class PedidoAdmin(admin.ModelAdmin):
 
         El reporte incluye un encabezado con el rango de fechas (pedido más antiguo y más reciente)
         y después la información de cada pedido separada por líneas horizontales.
+        Los pedidos se leen por lotes y el PDF se envía desde un archivo temporal
+        (ver pedidos.reportes); las páginas sí se acumulan en memoria hasta el final.
         """
         if not queryset.exists():
             self.message_user(request, 'No se seleccionaron pedidos para generar el reporte.', level=messages.WARNING)
             return None
 
-        if canvas is None or A4 is None:
+        if reportes.canvas is None or reportes.A4 is None:
             return HttpResponse('ReportLab no está instalado en el servidor. Instala reportlab para generar PDFs.', status=500)
 
-        pedidos = queryset.order_by('fecha_creacion')
-        primer = pedidos.first()
-        ultimo = pedidos.last()
-
-        from django.utils import timezone
-        inicio = timezone.localtime(primer.fecha_creacion) if primer and primer.fecha_creacion else None
-        fin = timezone.localtime(ultimo.fecha_creacion) if ultimo and ultimo.fecha_creacion else None
-
-        buffer = BytesIO()
-        p = canvas.Canvas(buffer, pagesize=A4)
-        width, height = A4
-        x_margin = 50
-        y = height - 60
-
-        # Título
-        p.setFont('Helvetica-Bold', 18)
-        p.drawString(x_margin, y, 'Ferreteria San Benito')
-        y -= 26
-
-        # Fecha de reporte
-        p.setFont('Helvetica', 11)
-        inicio_str = inicio.strftime('%Y-%m-%d %H:%M') if inicio else 'N/A'
-        fin_str = fin.strftime('%Y-%m-%d %H:%M') if fin else 'N/A'
-        p.drawString(x_margin, y, f'Reporte de: {inicio_str}  -  {fin_str}')
-        y -= 14
-        p.line(x_margin, y, width - x_margin, y)
-        y -= 18
-
-        p.setFont('Helvetica', 10)
-
-        for idx, pedido in enumerate(pedidos):
-            if y < 120:
-                p.showPage()
-                y = height - 60
-                p.setFont('Helvetica', 10)
-
-            # Encabezado del pedido
-            p.setFont('Helvetica-Bold', 11)
-            p.drawString(x_margin, y, f'Pedido: {pedido.numero_pedido}')
-            p.setFont('Helvetica', 10)
-            p.drawRightString(width - x_margin, y, f'Fecha: {timezone.localtime(pedido.fecha_creacion).strftime("%Y-%m-%d %H:%M") if pedido.fecha_creacion else "N/A"}')
-            y -= 14
-
-            p.drawString(x_margin, y, f'Cliente: {pedido.usuario.get_full_name() or pedido.usuario.username}')
-            p.drawRightString(width - x_margin, y, f'Total: ${pedido.total:,.2f}')
-            y -= 14
-
-            p.drawString(x_margin, y, f'Método pago: {pedido.metodo_pago or "N/A"}    Estado pago: {pedido.estado_pago_display or "N/A"}')
-            y -= 14
-
-            # Dirección y contacto
-            p.drawString(x_margin, y, f'Teléfono: {pedido.telefono_contacto or "-"}')
-            y -= 12
-            text = p.beginText(x_margin, y)
-            text.setFont('Helvetica', 10)
-            dir_text = str(pedido.direccion_entrega or '')
-            for line in dir_text.splitlines():
-                text.textLine(line)
-            p.drawText(text)
-            y = text.getY() - 10
-
-            # Items
-            p.setFont('Helvetica-Bold', 10)
-            p.drawString(x_margin, y, 'Producto')
-            p.drawRightString(width - 200, y, 'Cantidad')
-            p.drawRightString(width - 120, y, 'Precio')
-            p.drawRightString(width - x_margin, y, 'Subtotal')
-            y -= 12
-            p.setFont('Helvetica', 10)
-
-            for item in pedido.items.all():
-                if y < 80:
-                    p.showPage()
-                    y = height - 60
-                p.drawString(x_margin, y, item.producto.nombre)
-                p.drawRightString(width - 200, y, str(item.cantidad))
-                p.drawRightString(width - 120, y, f'${item.precio_unitario:,.2f}')
-                p.drawRightString(width - x_margin, y, f'${item.subtotal:,.2f}')
-                y -= 12
-
-            # Línea separadora entre pedidos
-            y -= 6
-            p.line(x_margin, y, width - x_margin, y)
-            y -= 16
-
-        p.showPage()
-        p.save()
-        pdf = buffer.getvalue()
-        buffer.close()
-
-        response = HttpResponse(content_type='application/pdf')
-        filename = f'reporte_pedidos_{inicio_str}_a_{fin_str}.pdf'
+        return reportes.respuesta_reporte(queryset)
+    crear_reporte_pdf.short_description = 'Crear reporte PDF de pedidos seleccionados'
+
+    def descargar_facturas_zip(self, request, queryset):
+        """Descarga en un ZIP las facturas de los pedidos seleccionados.
+
+        Las facturas se renderizan en el proceso de la petición (sin pool: no se
+        lanzan procesos desde un worker web) y se agregan al ZIP a medida que
+        terminan (ver pedidos.facturas_lote); la respuesta empieza a enviarse
+        antes de que estén todas. Para rangos grandes usar ``generar_facturas``.
+        """
+        if not queryset.exists():
+            self.message_user(request, 'No se seleccionaron pedidos para generar facturas.', level=messages.WARNING)
+            return None
+
+        if facturas.canvas is None or facturas.A4 is None:
+            return HttpResponse('ReportLab no está instalado en el servidor. Instala reportlab para generar PDFs.', status=500)
+
+        total = queryset.count()
+        medidor = facturas_lote.Medidor()
+
+        def contenido():
+            yield from facturas_lote.zip_en_streaming(facturas_lote.generar_facturas(queryset, workers=1), progreso=medidor)
+            logger.info('Facturas en ZIP: %s/%s en %.2fs (%.1f facturas/s)',
+                        medidor.total, total, medidor.segundos, medidor.por_segundo)
+
+        response = StreamingHttpResponse(contenido(), content_type='application/zip')
+        filename = f'facturas_{timezone.localtime():%Y%m%d_%H%M%S}.zip'
         response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        response.write(pdf)
         return response
-    crear_reporte_pdf.short_description = 'Crear reporte PDF de pedidos seleccionados'
+    descargar_facturas_zip.short_description = 'Descargar facturas (ZIP) de pedidos seleccionados'
 
 @admin.register(ItemPedido)
-class ItemPedidoAdmin(admin.ModelAdmin):
+class ItemPedidoAdmin(ExportarMixin, admin.ModelAdmin):
     list_display = ('pedido', 'producto', 'cantidad', 'precio_unitario_formateado', 'subtotal_formateado')
     list_filter = ('pedido__estado', 'pedido__fecha_creacion')
     search_fields = ('pedido__numero_pedido', 'producto__nombre')
     readonly_fields = ('precio_unitario_formateado', 'subtotal_formateado')
-    
-    def get_queryset(self, request):
-        return super().get_queryset(request).select_related('pedido', 'producto')
+    autocomplete_fields = ('pedido', 'producto')
+    list_select_related = ('pedido__usuario', 'producto__categoria')
+    exportacion = 'items'
+
+
+@admin.register(VentaDiaria)
+class VentaDiariaAdmin(admin.ModelAdmin):
+    """Dashboard de ventas construido solo con los resúmenes diarios (ver pedidos.ventas)."""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def _fecha(self, valor, defecto):
+        from datetime import datetime
+        try:
+            return datetime.strptime(valor, '%Y-%m-%d').date() if valor else defecto
+        except ValueError:
+            return defecto
+
+    def changelist_view(self, request, extra_context=None):
+        from datetime import timedelta
+        hoy = timezone.localdate()
+        fin = self._fecha(request.GET.get('hasta'), hoy)
+        inicio = self._fecha(request.GET.get('desde'), fin - timedelta(days=29))
+        if inicio > fin:
+            inicio, fin = fin, inicio
+
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Dashboard de ventas',
+            'opts': self.model._meta,
+            'resumen': ventas.resumen_dashboard(inicio, fin),
+            **(extra_context or {}),
+        }
+        return render(request, 'admin/pedidos/ventadiaria/dashboard.html', context)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class PedidosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'pedidos'
+
+    def ready(self):
+        # Registrar señales (versión de pedido al cambiar items)
+        from . import signals  # noqa: F401
@@ -0,0 +1,218 @@
+"""Servicio de carrito con una única representación por request.
+
+El carrito vive en ``request.session['cart']`` como ``{'<product_id>': cantidad}``.
+Las vistas lo modifican a través de :class:`Cart`; para usuarios autenticados
+los cambios se acumulan en memoria y se escriben en ``pedidos.Carrito`` una
+sola vez al final del request (ver ``pedidos.middleware.CartMiddleware``).
+"""
+
+from django.db import transaction
+from django.db.models import FilteredRelation, Q
+
+from .models import Carrito
+
+
+SESSION_KEY = 'cart'
+
+
+def _get_cart(session):
+    cart = session.get(SESSION_KEY)
+    if cart is None or not isinstance(cart, dict):
+        cart = {}
+        session[SESSION_KEY] = cart
+    return cart
+
+
+def _limitar_stock(producto, cantidad):
+    """Retorna (cantidad, ajustada) limitando la cantidad al stock disponible."""
+    if producto.stock is not None and cantidad > producto.stock:
+        return producto.stock, True
+    return cantidad, False
+
+
+class Cart:
+    """Carrito del request actual.
+
+    Usar ``Cart.for_request(request)`` para obtener siempre la misma instancia
+    durante el request. Las mutaciones actualizan la sesión de inmediato y
+    marcan los productos afectados; ``flush()`` los persiste en un solo lote.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.session = request.session
+        self._data = _get_cart(self.session)
+        self._upserts = set()
+        self._removed = set()
+        self._cleared = False
+
+    @classmethod
+    def for_request(cls, request):
+        cart = getattr(request, '_cart', None)
+        if cart is None:
+            cart = cls(request)
+            request._cart = cart
+        return cart
+
+    # --- Lectura ---
+    def __contains__(self, product_id):
+        return str(product_id) in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def __bool__(self):
+        return bool(self._data)
+
+    def __iter__(self):
+        """Itera pares (product_id, cantidad) como enteros."""
+        for str_id, qty in list(self._data.items()):
+            try:
+                yield int(str_id), int(qty)
+            except (TypeError, ValueError):
+                continue
+
+    def get(self, product_id, default=0):
+        try:
+            return int(self._data.get(str(product_id), default))
+        except (TypeError, ValueError):
+            return default
+
+    @property
+    def product_ids(self):
+        return [pid for pid, _ in self]
+
+    @property
+    def count(self):
+        return sum(qty for _, qty in self)
+
+    # --- Mutaciones ---
+    def add(self, producto, cantidad):
+        """Suma ``cantidad`` al producto. Retorna (cantidad_final, ajustada_por_stock)."""
+        return self.set(producto, self.get(producto.id) + cantidad)
+
+    def set(self, producto, cantidad):
+        """Fija la cantidad del producto. Retorna (cantidad_final, ajustada_por_stock)."""
+        cantidad, ajustada = _limitar_stock(producto, max(0, int(cantidad)))
+        if cantidad <= 0:
+            self.remove(producto.id)
+            return 0, ajustada
+        self._data[str(producto.id)] = cantidad
+        self._upserts.add(producto.id)
+        self._removed.discard(producto.id)
+        self._mark_modified()
+        return cantidad, ajustada
+
+    def remove(self, product_id):
+        try:
+            pid = int(product_id)
+        except (TypeError, ValueError):
+            return
+        self._data.pop(str(pid), None)
+        self._upserts.discard(pid)
+        self._removed.add(pid)
+        self._mark_modified()
+
+    def clear(self):
+        self._data.clear()
+        self._upserts.clear()
+        self._removed.clear()
+        self._cleared = True
+        self._mark_modified()
+
+    def _mark_modified(self):
+        self.session[SESSION_KEY] = self._data
+        self.session.modified = True
+
+    # --- Persistencia ---
+    @property
+    def has_changes(self):
+        return self._cleared or bool(self._upserts) or bool(self._removed)
+
+    def flush(self):
+        """Persiste los cambios pendientes en ``pedidos.Carrito`` (solo usuarios autenticados).
+
+        Los borrados se resuelven con un único DELETE y las altas/cambios con un
+        único INSERT ... ON CONFLICT (``bulk_create`` con ``update_conflicts``).
+        """
+        user = getattr(self.request, 'user', None)
+        if not self.has_changes or user is None or not user.is_authenticated:
+            self._reset_changes()
+            return
+
+        upserts = [
+            Carrito(usuario=user, producto_id=pid, cantidad=self.get(pid))
+            for pid in self._upserts
+        ]
+        delete_qs = None
+        if self._cleared:
+            delete_qs = Carrito.objects.filter(usuario=user)
+        elif self._removed:
+            delete_qs = Carrito.objects.filter(usuario=user, producto_id__in=self._removed)
+
+        if delete_qs is not None and upserts:
+            with transaction.atomic():
+                delete_qs.delete()
+                self._bulk_upsert(upserts)
+        elif delete_qs is not None:
+            delete_qs.delete()
+        elif upserts:
+            self._bulk_upsert(upserts)
+        self._reset_changes()
+
+    @staticmethod
+    def _bulk_upsert(items):
+        Carrito.objects.bulk_create(
+            items,
+            update_conflicts=True,
+            unique_fields=['usuario', 'producto'],
+            update_fields=['cantidad', 'updated_at'],
+        )
+
+    def _reset_changes(self):
+        self._upserts.clear()
+        self._removed.clear()
+        self._cleared = False
+
+
+def merge_session_cart(user, session):
+    """Fusiona el carrito de sesión con el carrito guardado del usuario.
+
+    Una consulta obtiene a la vez los productos válidos del carrito de sesión y
+    las cantidades ya guardadas en DB; un único upsert guarda las sumas. La
+    sesión se regenera con el resultado sin volver a leer la DB.
+    """
+    from catalogo.models import Producto
+
+    pendientes = {}
+    for pid_str, qty in (session.get(SESSION_KEY) or {}).items():
+        try:
+            pid = int(pid_str)
+            qty = max(1, int(qty))
+        except (TypeError, ValueError):
+            continue
+        pendientes[pid] = pendientes.get(pid, 0) + qty
+
+    filas = (
+        Producto.objects
+        .annotate(guardado=FilteredRelation('carrito', condition=Q(carrito__usuario=user)))
+        .filter(Q(id__in=list(pendientes), activo=True) | Q(guardado__isnull=False))
+        .order_by('-guardado__created_at', 'id')
+        .values_list('id', 'activo', 'guardado__cantidad')
+    )
+
+    merged = {}
+    upserts = []
+    for pid, activo, guardado in filas:
+        agregar = pendientes.get(pid, 0) if activo else 0
+        merged[str(pid)] = int(guardado or 0) + agregar
+        if agregar:
+            cantidad = merged[str(pid)]
+            upserts.append(Carrito(usuario=user, producto_id=pid, cantidad=cantidad))
+
+    if upserts:
+        Cart._bulk_upsert(upserts)
+
+    session[SESSION_KEY] = merged
+    session.modified = True
+    return merged
@@ -0,0 +1,137 @@
+"""Máquina de estados de ``Pedido.estado`` y ``Pedido.estado_pago``.
+
+Las transiciones se validan contra ``TRANSICIONES`` y se aplican en bloque:
+un ``SELECT ... FOR UPDATE`` de los candidatos, un ``UPDATE`` por valor de
+origen y un ``bulk_create`` de filas de auditoría (``TransicionPedido``).
+
+Concurrencia optimista: cada transición incrementa ``Pedido.version``. Si se
+pasan ``versiones`` ({pk: version vista por el usuario}), los pedidos cuya
+versión cambió desde entonces se omiten en vez de sobrescribirse. Además el
+``UPDATE`` siempre filtra por el estado de origen, así que dos administradores
+no pueden aplicar transiciones incompatibles sobre el mismo pedido.
+"""
+
+from collections import namedtuple
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Pedido, TransicionPedido
+
+
+TRANSICIONES = {
+    'estado': {
+        'pendiente': ('procesando', 'cancelado'),
+        'procesando': ('completado', 'cancelado'),
+        'completado': (),
+        'cancelado': (),
+    },
+    'estado_pago': {
+        'pendiente': ('verificando', 'pagado', 'rechazado'),
+        'verificando': ('pagado', 'rechazado'),
+        'rechazado': ('verificando', 'pagado'),
+        'pagado': (),
+    },
+}
+
+
+ResultadoTransicion = namedtuple('ResultadoTransicion', ['aplicados', 'omitidos'])
+
+
+class TransicionInvalida(ValueError):
+    """La transición solicitada no está permitida."""
+
+
+def puede_transicionar(campo, origen, destino):
+    return destino in TRANSICIONES.get(campo, {}).get(origen, ())
+
+
+def origenes_para(campo, destino):
+    """Estados desde los que se puede llegar a ``destino``."""
+    if campo not in TRANSICIONES:
+        raise TransicionInvalida(f'Campo de estado desconocido: {campo}')
+    return [origen for origen, destinos in TRANSICIONES[campo].items() if destino in destinos]
+
+
+def aplicar_transicion(queryset, campo, destino, usuario=None, notas='', cambios=None, versiones=None):
+    """Lleva los pedidos de ``queryset`` a ``destino`` en el campo ``campo``.
+
+    - Solo se actualizan los pedidos cuyo estado actual permite la transición.
+    - ``cambios``: campos adicionales a fijar en el mismo UPDATE.
+    - ``versiones``: dict {pk: version esperada} para concurrencia optimista.
+
+    Retorna ``ResultadoTransicion(aplicados, omitidos)`` con listas de pks.
+    """
+    origenes = origenes_para(campo, destino)
+    if not origenes:
+        raise TransicionInvalida(f'Ningún estado puede pasar a {destino!r} en {campo}')
+
+    with transaction.atomic():
+        candidatos = list(
+            queryset.order_by()
+            .select_for_update()
+            .values_list('pk', campo, 'version')
+        )
+        por_origen = {}
+        omitidos = []
+        for pk, actual, version in candidatos:
+            if actual not in origenes:
+                omitidos.append(pk)
+            elif versiones is not None and versiones.get(pk) != version:
+                omitidos.append(pk)
+            else:
+                por_origen.setdefault(actual, []).append(pk)
+
+        ahora = timezone.now()
+        valores = dict(cambios or {})
+        valores.update({campo: destino, 'version': F('version') + 1, 'fecha_actualizacion': ahora})
+
+        aplicados = []
+        auditoria = []
+        for origen, pks in por_origen.items():
+            # Filtrar por el origen protege ante cambios concurrentes sin bloqueo (SQLite)
+            actualizados = Pedido.objects.filter(pk__in=pks, **{campo: origen}).update(**valores)
+            if actualizados != len(pks):
+                pks = list(Pedido.objects.filter(pk__in=pks, **{campo: destino}, fecha_actualizacion=ahora)
+                           .values_list('pk', flat=True))
+            aplicados.extend(pks)
+            auditoria.extend(
+                TransicionPedido(
+                    pedido_id=pk, campo=campo, valor_anterior=origen, valor_nuevo=destino,
+                    usuario=usuario, notas=notas or '', fecha=ahora,
+                )
+                for pk in pks
+            )
+        TransicionPedido.objects.bulk_create(auditoria)
+
+    return ResultadoTransicion(aplicados, omitidos)
+
+
+def aprobar_pagos(queryset, administrador, notas=None, versiones=None):
+    """Marca los pagos como verificados; los pedidos pendientes pasan a procesando."""
+    cambios = {'administrador_pago': administrador, 'fecha_pago': timezone.now()}
+    if notas:
+        cambios['notas_administrador'] = notas
+    with transaction.atomic():
+        resultado = aplicar_transicion(
+            queryset, 'estado_pago', 'pagado',
+            usuario=administrador, notas=notas, cambios=cambios, versiones=versiones,
+        )
+        if resultado.aplicados:
+            aplicar_transicion(
+                Pedido.objects.filter(pk__in=resultado.aplicados, estado='pendiente'),
+                'estado', 'procesando', usuario=administrador, notas=notas,
+            )
+    return resultado
+
+
+def rechazar_pagos(queryset, administrador, notas=None, versiones=None):
+    """Marca los pagos como rechazados."""
+    cambios = {'administrador_pago': administrador}
+    if notas:
+        cambios['notas_administrador'] = notas
+    return aplicar_transicion(
+        queryset, 'estado_pago', 'rechazado',
+        usuario=administrador, notas=notas, cambios=cambios, versiones=versiones,
+    )
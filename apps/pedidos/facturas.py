@@ -0,0 +1,168 @@
+"""Facturas PDF de pedidos con caché en disco.
+
+El PDF se genera una sola vez por versión del pedido y se guarda en el storage
+por defecto (``MEDIA_ROOT/facturas/<pedido_id>/<version>.pdf``). La versión se
+deriva de ``Pedido.fecha_actualizacion``, que se actualiza al guardar el pedido
+o cualquiera de sus items (ver ``pedidos.signals``), así que un pedido sin
+cambios nunca se vuelve a renderizar.
+
+``datos_factura`` extrae datos planos del pedido y ``render_factura`` solo usa
+esos datos, de modo que el render puede ejecutarse en otro proceso.
+"""
+
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+try:
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import A4
+except Exception:
+    canvas = None
+    A4 = None
+
+
+def _directorio():
+    return getattr(settings, 'FACTURAS_DIR', 'facturas')
+
+
+def version_factura(pedido):
+    """Identificador de la versión del pedido usada como clave de caché y ETag."""
+    stamp = int(pedido.fecha_actualizacion.timestamp() * 1_000_000) if pedido.fecha_actualizacion else 0
+    return f'{pedido.pk}-{stamp}'
+
+
+def nombre_factura(pedido):
+    return f'{_directorio()}/{pedido.pk}/{version_factura(pedido)}.pdf'
+
+
+def datos_factura(pedido, items=None):
+    """Datos planos (serializables) necesarios para renderizar la factura."""
+    if items is None:
+        items = pedido.items.select_related('producto')
+    return {
+        'numero_pedido': pedido.numero_pedido,
+        'fecha': timezone.localtime(pedido.fecha_creacion).strftime('%Y-%m-%d %H:%M') if pedido.fecha_creacion else '',
+        'cliente': pedido.usuario.get_full_name() or pedido.usuario.username,
+        'telefono': pedido.telefono_contacto,
+        'direccion': str(pedido.direccion_entrega),
+        'items': [
+            (item.producto.nombre, item.cantidad, item.precio_unitario, item.subtotal, item.simbolo)
+            for item in items
+        ],
+        'total': pedido.total,
+        'simbolo': pedido.simbolo,
+    }
+
+
+def render_factura(datos):
+    """Genera el PDF de la factura a partir de ``datos_factura`` y retorna los bytes."""
+    buffer = BytesIO()
+    p = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+
+    # Margenes
+    x_margin = 50
+    y = height - 60
+
+    # Title
+    p.setFont('Helvetica-Bold', 20)
+    p.drawString(x_margin, y, 'Ferretería San Benito')
+    y -= 30
+
+    # Order header
+    p.setFont('Helvetica', 10)
+    p.drawString(x_margin, y, f'Fecha: {datos["fecha"]}')
+    p.drawRightString(width - x_margin, y, f'Pedido: {datos["numero_pedido"]}')
+    y -= 20
+
+    # Customer
+    p.setFont('Helvetica-Bold', 12)
+    p.drawString(x_margin, y, f'Cliente: {datos["cliente"]}')
+    y -= 14
+    p.setFont('Helvetica', 10)
+    p.drawString(x_margin, y, f'Teléfono: {datos["telefono"]}')
+    y -= 14
+    p.drawString(x_margin, y, 'Dirección:')
+    y -= 12
+    text = p.beginText(x_margin, y)
+    text.setFont('Helvetica', 10)
+    for line in datos['direccion'].splitlines():
+        text.textLine(line)
+    p.drawText(text)
+    y = text.getY() - 10
+
+    # Table header
+    p.setFont('Helvetica-Bold', 10)
+    p.drawString(x_margin, y, 'Producto')
+    p.drawRightString(width - 200, y, 'Cantidad')
+    p.drawRightString(width - 120, y, 'Precio')
+    p.drawRightString(width - x_margin, y, 'Subtotal')
+    y -= 14
+    p.setFont('Helvetica', 10)
+
+    # Items
+    for nombre, cantidad, precio, subtotal, simbolo in datos['items']:
+        if y < 80:
+            p.showPage()
+            y = height - 60
+            p.setFont('Helvetica', 10)
+        p.drawString(x_margin, y, nombre)
+        p.drawRightString(width - 200, y, str(cantidad))
+        p.drawRightString(width - 120, y, f'{simbolo}{precio:,.2f}')
+        p.drawRightString(width - x_margin, y, f'{simbolo}{subtotal:,.2f}')
+        y -= 14
+
+    # Totals
+    y -= 10
+    p.line(x_margin, y, width - x_margin, y)
+    y -= 16
+    p.setFont('Helvetica-Bold', 11)
+    p.drawRightString(width - 140, y, 'Total:')
+    p.drawRightString(width - x_margin, y, f'{datos["simbolo"]}{datos["total"]:,.2f}')
+
+    # Finish up
+    p.showPage()
+    p.save()
+    return buffer.getvalue()
+
+
+def _limpiar_versiones_anteriores(pedido, vigente):
+    directorio = f'{_directorio()}/{pedido.pk}'
+    try:
+        _, archivos = default_storage.listdir(directorio)
+    except (FileNotFoundError, NotImplementedError):
+        return
+    for archivo in archivos:
+        nombre = f'{directorio}/{archivo}'
+        if nombre != vigente:
+            default_storage.delete(nombre)
+
+
+def guardar_factura(pedido, pdf):
+    """Guarda ``pdf`` como la factura vigente del pedido y borra versiones anteriores.
+
+    Si un render concurrente ya guardó esa versión se conserva la suya: el
+    storage guardaría la copia con otro nombre y la limpieza borraría la vigente.
+    """
+    vigente = nombre_factura(pedido)
+    if default_storage.exists(vigente):
+        return vigente
+    nombre = default_storage.save(vigente, ContentFile(pdf))
+    if nombre != vigente:
+        # Se guardó entre exists() y save(): descartar la copia
+        default_storage.delete(nombre)
+        return vigente
+    _limpiar_versiones_anteriores(pedido, vigente)
+    return vigente
+
+
+def obtener_factura(pedido):
+    """Retorna el nombre en storage de la factura vigente, generándola si no existe."""
+    nombre = nombre_factura(pedido)
+    if not default_storage.exists(nombre):
+        nombre = guardar_factura(pedido, render_factura(datos_factura(pedido)))
+    return nombre
@@ -0,0 +1,166 @@
+"""Generación de facturas en lote dentro de un ZIP en streaming.
+
+ReportLab es CPU-bound, así que el render se reparte en un
+``ProcessPoolExecutor``: el proceso principal lee los pedidos por bloques
+(usuario, items y productos precargados), envía a los workers solo los datos
+planos de ``facturas.datos_factura`` y escribe cada PDF en el ZIP en cuanto
+termina. El número de renders en vuelo está acotado, así que la memoria no
+depende del tamaño del rango.
+
+El pool es para ``manage.py generar_facturas``; la acción del admin usa
+``workers=1`` y renderiza dentro de la petición.
+
+Las facturas ya cacheadas para la versión vigente del pedido se leen del
+storage en lugar de renderizarse, y las nuevas se guardan en la caché.
+"""
+
+import os
+import time
+import zipfile
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import Prefetch
+
+from . import facturas
+from .models import ItemPedido
+
+
+CHUNK_SIZE = 200
+PENDIENTES_POR_WORKER = 4
+
+
+def workers_por_defecto():
+    return getattr(settings, 'FACTURAS_WORKERS', None) or os.cpu_count() or 1
+
+
+def pedidos_para_facturas(queryset, chunk_size=CHUNK_SIZE):
+    """Itera los pedidos con usuario, items y productos precargados por bloque."""
+    items = ItemPedido.objects.select_related('producto').only(
+        'pedido_id', 'cantidad', 'precio_unitario', 'subtotal', 'moneda', 'producto__nombre',
+    )
+    return (
+        queryset
+        .order_by('fecha_creacion', 'pk')
+        .select_related('usuario')
+        .prefetch_related(None)
+        .prefetch_related(Prefetch('items', queryset=items))
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def nombre_en_zip(pedido):
+    return f'factura_{pedido.numero_pedido}.pdf'
+
+
+def _leer_cache(pedido):
+    nombre = facturas.nombre_factura(pedido)
+    if not default_storage.exists(nombre):
+        return None
+    with default_storage.open(nombre, 'rb') as fh:
+        return fh.read()
+
+
+def _cosechar(pendientes, usar_cache, todos=False):
+    """Retorna los renders terminados; con ``todos`` espera a que acaben todos."""
+    hechos, _ = wait(pendientes, return_when=ALL_COMPLETED if todos else FIRST_COMPLETED)
+    listos = []
+    for futuro in hechos:
+        pedido = pendientes.pop(futuro)
+        pdf = futuro.result()
+        if usar_cache:
+            facturas.guardar_factura(pedido, pdf)
+        listos.append((nombre_en_zip(pedido), pdf))
+    return listos
+
+
+def generar_facturas(queryset, workers=None, usar_cache=True, chunk_size=CHUNK_SIZE):
+    """Genera ``(nombre_archivo, pdf)`` para cada pedido a medida que se terminan.
+
+    Con ``workers`` <= 1 se renderiza en el proceso actual. El orden de salida
+    no está garantizado cuando hay varios workers.
+    """
+    workers = workers or workers_por_defecto()
+
+    if workers <= 1:
+        for pedido in pedidos_para_facturas(queryset, chunk_size):
+            pdf = _leer_cache(pedido) if usar_cache else None
+            if pdf is None:
+                pdf = facturas.render_factura(facturas.datos_factura(pedido, pedido.items.all()))
+                if usar_cache:
+                    facturas.guardar_factura(pedido, pdf)
+            yield nombre_en_zip(pedido), pdf
+        return
+
+    maximo = workers * PENDIENTES_POR_WORKER
+    pendientes = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for pedido in pedidos_para_facturas(queryset, chunk_size):
+            pdf = _leer_cache(pedido) if usar_cache else None
+            if pdf is not None:
+                yield nombre_en_zip(pedido), pdf
+                continue
+            datos = facturas.datos_factura(pedido, pedido.items.all())
+            pendientes[pool.submit(facturas.render_factura, datos)] = pedido
+            if len(pendientes) >= maximo:
+                yield from _cosechar(pendientes, usar_cache)
+        if pendientes:
+            yield from _cosechar(pendientes, usar_cache, todos=True)
+
+
+class _Sumidero:
+    """Archivo de solo escritura sin ``tell``/``seek``.
+
+    ``zipfile`` lo trata como no posicionable y escribe descriptores de datos
+    tras cada entrada, así que los bytes pueden entregarse apenas se escriben.
+    """
+
+    def __init__(self):
+        self._partes = []
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        partes, self._partes = self._partes, []
+        return partes
+
+
+def zip_en_streaming(archivos, progreso=None):
+    """Escribe ``archivos`` (pares ``(nombre, bytes)``) en un ZIP y lo entrega por bloques.
+
+    ``progreso(n)`` se invoca tras agregar cada archivo con el total acumulado.
+    """
+    sumidero = _Sumidero()
+    with zipfile.ZipFile(sumidero, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for n, (nombre, datos) in enumerate(archivos, start=1):
+            zf.writestr(nombre, datos)
+            if progreso:
+                progreso(n)
+            yield from sumidero.vaciar()
+    yield from sumidero.vaciar()
+
+
+class Medidor:
+    """Cuenta facturas generadas y calcula el rendimiento (facturas/segundo)."""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.total = 0
+
+    def __call__(self, n):
+        self.total = n
+
+    @property
+    def segundos(self):
+        return time.perf_counter() - self.inicio
+
+    @property
+    def por_segundo(self):
+        segundos = self.segundos
+        return self.total / segundos if segundos > 0 else 0.0
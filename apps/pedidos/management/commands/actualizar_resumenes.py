@@ -0,0 +1,34 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pedidos import ventas
+
+
+class Command(BaseCommand):
+    help = (
+        "Actualiza los resúmenes diarios de ventas a partir de la marca de agua. "
+        "Pensado para ejecutarse periódicamente (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--desde", help="Recalcular además desde esta fecha (YYYY-MM-DD)")
+        parser.add_argument("--hasta", help="Recalcular además hasta esta fecha (YYYY-MM-DD)")
+        parser.add_argument("--completo", action="store_true", help="Recalcular todos los días con pedidos")
+
+    def _fecha(self, valor):
+        if not valor:
+            return None
+        try:
+            return datetime.strptime(valor, "%Y-%m-%d").date()
+        except ValueError:
+            raise CommandError(f"Fecha inválida: {valor} (formato YYYY-MM-DD)")
+
+    def handle(self, *args, **options):
+        desde = self._fecha(options["desde"])
+        hasta = self._fecha(options["hasta"])
+        if desde and hasta and desde > hasta:
+            raise CommandError("--desde debe ser anterior a --hasta")
+
+        dias, filas = ventas.actualizar_resumenes(desde=desde, hasta=hasta, completo=options["completo"])
+        self.stdout.write(self.style.SUCCESS(f"Días recalculados: {dias}. Filas de resumen: {filas}"))
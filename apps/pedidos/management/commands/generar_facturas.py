@@ -0,0 +1,92 @@
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from pedidos import facturas, facturas_lote
+from pedidos.models import Pedido
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera en un ZIP las facturas PDF de los pedidos de un rango de fechas. "
+        "Con varios valores en --workers repite la generación con cada uno y "
+        "compara el rendimiento (facturas/segundo)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--desde", help="Fecha inicial (YYYY-MM-DD), inclusive")
+        parser.add_argument("--hasta", help="Fecha final (YYYY-MM-DD), inclusive")
+        parser.add_argument("--workers", default="",
+                            help="Procesos de render; lista separada por comas para comparar (ej. 1,2,4)")
+        parser.add_argument("--salida", default="facturas.zip", help="Ruta del ZIP a escribir")
+        parser.add_argument("--sin-cache", action="store_true",
+                            help="Renderizar siempre, sin leer ni escribir la caché de facturas")
+        parser.add_argument("--cada", type=int, default=50, help="Reportar progreso cada N facturas")
+
+    def _fecha(self, valor, fin=False):
+        if not valor:
+            return None
+        try:
+            dia = datetime.strptime(valor, "%Y-%m-%d").date()
+        except ValueError:
+            raise CommandError(f"Fecha inválida: {valor} (formato YYYY-MM-DD)")
+        return timezone.make_aware(datetime.combine(dia, time.max if fin else time.min))
+
+    def _workers(self, valor):
+        if not valor:
+            return [facturas_lote.workers_por_defecto()]
+        try:
+            workers = [int(w) for w in valor.split(",") if w.strip()]
+        except ValueError:
+            raise CommandError(f"--workers inválido: {valor}")
+        if not workers or any(w < 1 for w in workers):
+            raise CommandError("--workers debe contener enteros positivos")
+        return workers
+
+    def handle(self, *args, **options):
+        if facturas.canvas is None:
+            raise CommandError("ReportLab no está instalado. Instala reportlab para generar PDFs.")
+
+        pedidos = Pedido.objects.all()
+        desde = self._fecha(options["desde"])
+        hasta = self._fecha(options["hasta"], fin=True)
+        if desde:
+            pedidos = pedidos.filter(fecha_creacion__gte=desde)
+        if hasta:
+            pedidos = pedidos.filter(fecha_creacion__lte=hasta)
+
+        total = pedidos.count()
+        if not total:
+            self.stdout.write(self.style.WARNING("No hay pedidos en el rango indicado."))
+            return
+
+        lista_workers = self._workers(options["workers"])
+        usar_cache = not options["sin_cache"]
+        if usar_cache and len(lista_workers) > 1:
+            # Tras la primera pasada todo saldría de la caché y la comparación no mediría el render
+            self.stdout.write("Comparando workers: se desactiva la caché de facturas.")
+            usar_cache = False
+        cada = max(options["cada"], 1)
+        resultados = []
+
+        for workers in lista_workers:
+            self.stdout.write(f"Generando {total} facturas con {workers} worker(s)...")
+            medidor = facturas_lote.Medidor()
+
+            def progreso(n):
+                medidor(n)
+                if n % cada == 0 or n == total:
+                    self.stdout.write(f"  {n}/{total} ({medidor.por_segundo:.1f} facturas/s)")
+
+            archivos = facturas_lote.generar_facturas(pedidos, workers=workers, usar_cache=usar_cache)
+            with open(options["salida"], "wb") as destino:
+                for bloque in facturas_lote.zip_en_streaming(archivos, progreso=progreso):
+                    destino.write(bloque)
+
+            resultados.append((workers, medidor.total, medidor.segundos, medidor.por_segundo))
+
+        self.stdout.write(self.style.SUCCESS(f"ZIP escrito en {options['salida']}"))
+        self.stdout.write("workers  facturas  segundos  facturas/s")
+        for workers, generadas, segundos, por_segundo in resultados:
+            self.stdout.write(f"{workers:>7}  {generadas:>8}  {segundos:>8.2f}  {por_segundo:>10.1f}")
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from pedidos.models import Pedido
+from pedidos.totales import pedidos_descuadrados, recalcular_totales
+
+
+class Command(BaseCommand):
+    help = (
+        "Busca pedidos cuyo total no coincide con la suma de sus items "
+        "(subtotal × tasa) y opcionalmente los corrige."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reparar", action="store_true", help="Recalcular el total de los pedidos descuadrados")
+        parser.add_argument("--mostrar", type=int, default=20, help="Cantidad máxima de pedidos a listar")
+
+    def handle(self, *args, **options):
+        # Una sola consulta agregada sobre pedidos e items
+        descuadrados = list(
+            pedidos_descuadrados(Pedido.objects.order_by())
+            .values_list('pk', 'numero_pedido', 'total', 'total_calculado')
+        )
+        if not descuadrados:
+            self.stdout.write(self.style.SUCCESS("Todos los totales coinciden con sus items."))
+            return
+
+        self.stdout.write(self.style.WARNING(f"Pedidos descuadrados: {len(descuadrados)}"))
+        for _, numero, total, calculado in descuadrados[:options["mostrar"]]:
+            self.stdout.write(f"  {numero}: guardado {total} / calculado {calculado}")
+
+        if options["reparar"]:
+            reparados = recalcular_totales(Pedido.objects.filter(pk__in=[fila[0] for fila in descuadrados]))
+            self.stdout.write(self.style.SUCCESS(f"Totales recalculados: {reparados}"))
+        else:
+            self.stdout.write("Usa --reparar para corregirlos.")
@@ -0,0 +1,28 @@
+import logging
+
+from django.utils.deprecation import MiddlewareMixin
+
+
+logger = logging.getLogger(__name__)
+
+
+class CartMiddleware(MiddlewareMixin):
+    """Persiste al final del request los cambios acumulados en el carrito.
+
+    Las vistas usan ``pedidos.cart.Cart.for_request(request)``; si el carrito
+    se modificó, aquí se escribe en la DB en un solo lote. Debe ubicarse
+    después de AuthenticationMiddleware.
+    """
+
+    def process_response(self, request, response):
+        cart = getattr(request, '_cart', None)
+        if cart is None or not cart.has_changes:
+            return response
+        if response.status_code >= 500:
+            return response
+        try:
+            cart.flush()
+        except Exception:
+            # La sesión ya contiene el carrito; no romper la respuesta por la DB
+            logger.exception('No se pudo persistir el carrito del usuario')
+        return response
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pedido',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Se incrementa en cada cambio de estado (concurrencia optimista)'),
+        ),
+        migrations.CreateModel(
+            name='TransicionPedido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('campo', models.CharField(choices=[('estado', 'Estado del pedido'), ('estado_pago', 'Estado del pago')], help_text='Campo de estado que cambió', max_length=20)),
+                ('valor_anterior', models.CharField(max_length=20)),
+                ('valor_nuevo', models.CharField(max_length=20)),
+                ('notas', models.TextField(blank=True)),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+                ('pedido', models.ForeignKey(help_text='Pedido afectado', on_delete=django.db.models.deletion.CASCADE, related_name='transiciones', to='pedidos.pedido')),
+                ('usuario', models.ForeignKey(blank=True, help_text='Usuario que aplicó la transición', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transiciones_pedido', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Transición de Pedido',
+                'verbose_name_plural': 'Transiciones de Pedidos',
+                'ordering': ['-fecha', '-id'],
+                'indexes': [models.Index(fields=['pedido', 'fecha'], name='pedidos_tra_pedido__36f434_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:06
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0004_comentario'),
+        ('pedidos', '0002_pedido_version_transicionpedido'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarcaResumen',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=50, unique=True)),
+                ('procesado_hasta', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Marca de Resumen',
+                'verbose_name_plural': 'Marcas de Resumen',
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenPedidosDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('metodo_pago', models.CharField(choices=[('efectivo', 'Efectivo'), ('transferencia', 'Transferencia Bancaria'), ('pago_movil', 'Pago Móvil'), ('zelle', 'Zelle'), ('paypal', 'PayPal'), ('binance', 'Binance Pay'), ('tarjeta', 'Tarjeta de Crédito/Débito')], max_length=20)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'En Proceso'), ('completado', 'Completado'), ('cancelado', 'Cancelado')], max_length=20)),
+                ('pedidos', models.PositiveIntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'Resumen Diario de Pedidos',
+                'verbose_name_plural': 'Resúmenes Diarios de Pedidos',
+                'ordering': ['-fecha'],
+                'unique_together': {('fecha', 'metodo_pago', 'estado')},
+            },
+        ),
+        migrations.CreateModel(
+            name='VentaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('metodo_pago', models.CharField(choices=[('efectivo', 'Efectivo'), ('transferencia', 'Transferencia Bancaria'), ('pago_movil', 'Pago Móvil'), ('zelle', 'Zelle'), ('paypal', 'PayPal'), ('binance', 'Binance Pay'), ('tarjeta', 'Tarjeta de Crédito/Débito')], max_length=20)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'En Proceso'), ('completado', 'Completado'), ('cancelado', 'Cancelado')], max_length=20)),
+                ('moneda', models.CharField(max_length=3)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('unidades', models.PositiveIntegerField(default=0)),
+                ('pedidos', models.PositiveIntegerField(default=0)),
+                ('categoria', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ventas_diarias', to='catalogo.categoria')),
+            ],
+            options={
+                'verbose_name': 'Venta Diaria',
+                'verbose_name_plural': 'Ventas Diarias',
+                'ordering': ['-fecha'],
+                'indexes': [models.Index(fields=['fecha', 'categoria'], name='pedidos_ven_fecha_2971fa_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,115 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:08
+
+import django.core.serializers.json
+import django.core.validators
+from decimal import ROUND_HALF_UP, Decimal
+from django.db import migrations, models
+
+
+LOTE = 2000
+# Precisión de ItemPedido.tasa
+PRECISION_TASA = Decimal('0.0000000001')
+
+
+def monedas_items_existentes(apps, schema_editor):
+    """Snapshot de moneda para los pedidos existentes, con las tasas activas al migrar.
+
+    Los items quedan en la moneda actual de su producto y con la tasa de esa
+    moneda a la del pedido; cada pedido guarda su total convertido a las
+    monedas configuradas. Los pares sin tasa activa se dejan fuera de
+    ``totales_moneda`` (``Pedido.total_en`` devuelve None: total desconocido).
+    """
+    ItemPedido = apps.get_model('pedidos', 'ItemPedido')
+    Pedido = apps.get_model('pedidos', 'Pedido')
+    Producto = apps.get_model('catalogo', 'Producto')
+    TasaCambio = apps.get_model('core', 'TasaCambio')
+    ConfiguracionMoneda = apps.get_model('core', 'ConfiguracionMoneda')
+
+    moneda = Producto.objects.filter(pk=models.OuterRef('producto_id')).values('moneda_precio')[:1]
+    ItemPedido.objects.filter(moneda='').update(moneda=models.Subquery(moneda))
+
+    activas = {
+        (origen, destino): tasa
+        for origen, destino, tasa in TasaCambio.objects.filter(activa=True).values_list('moneda_origen', 'moneda_destino', 'tasa')
+    }
+
+    def tasa(origen, destino):
+        if origen == destino:
+            return Decimal('1')
+        if activas.get((origen, destino)):
+            return activas[(origen, destino)]
+        if activas.get((destino, origen)):
+            return Decimal('1') / activas[(destino, origen)]
+        return None
+
+    config = ConfiguracionMoneda.objects.first()
+    monedas = (config.monedas_mostrar if config else None) or ['USD', 'VES', 'COP', 'EUR']
+
+    def por_lotes(queryset, campos, fijar):
+        lote = []
+        for obj in queryset.iterator(chunk_size=LOTE):
+            fijar(obj)
+            lote.append(obj)
+            if len(lote) >= LOTE:
+                queryset.model.objects.bulk_update(lote, campos)
+                lote = []
+        queryset.model.objects.bulk_update(lote, campos)
+
+    def fijar_tasa(item):
+        # Sin tasa activa el item queda 1:1, igual que TasasSnapshot.tasa
+        factor = tasa(item.moneda, item.pedido.moneda) or Decimal('1')
+        item.tasa = factor.quantize(PRECISION_TASA, rounding=ROUND_HALF_UP)
+
+    def fijar_totales(pedido):
+        pedido.totales_moneda = {}
+        for destino in monedas:
+            factor = tasa(pedido.moneda, destino)
+            if destino != pedido.moneda and factor is not None:
+                pedido.totales_moneda[destino] = str((pedido.total * factor).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP))
+        pedido.version_tasas = config.version_tasas if config else None
+
+    por_lotes(ItemPedido.objects.select_related('pedido').only('moneda', 'pedido__moneda'), ['tasa'], fijar_tasa)
+    por_lotes(Pedido.objects.only('moneda', 'total'), ['totales_moneda', 'version_tasas'], fijar_totales)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0004_comentario'),
+        ('core', '0005_configuracionmoneda_version_tasas'),
+        ('pedidos', '0003_resumenes_ventas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itempedido',
+            name='moneda',
+            field=models.CharField(blank=True, help_text='Moneda del precio unitario (la del producto al momento del pedido)', max_length=3),
+        ),
+        migrations.AddField(
+            model_name='itempedido',
+            name='tasa',
+            field=models.DecimalField(decimal_places=10, default=Decimal('1'), help_text='Tasa de la moneda del item a la moneda del pedido al momento del pedido', max_digits=20),
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='moneda',
+            field=models.CharField(default='USD', help_text='Moneda en que está expresado el total', max_length=3),
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='totales_moneda',
+            field=models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, help_text="Total convertido a cada moneda al momento del pedido (ej: {'VES': '3650.00'})"),
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='version_tasas',
+            field=models.PositiveIntegerField(blank=True, help_text='Versión del conjunto de tasas usado al crear el pedido', null=True),
+        ),
+        migrations.AlterField(
+            model_name='pedido',
+            name='total',
+            field=models.DecimalField(decimal_places=2, help_text='Total del pedido (en la moneda del pedido)', max_digits=10, validators=[django.core.validators.MinValueValidator(Decimal('0.01'))]),
+        ),
+        migrations.RunPython(monedas_items_existentes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:10
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0004_snapshot_moneda'),
+    ]
+
+    # Una columna normal no puede convertirse en generada: se reemplaza
+    operations = [
+        migrations.RemoveField(
+            model_name='itempedido',
+            name='subtotal',
+        ),
+        migrations.AddField(
+            model_name='itempedido',
+            name='subtotal',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('precio_unitario'), '*', models.F('cantidad')), help_text='Subtotal de este item (cantidad × precio), calculado por la base de datos', output_field=models.DecimalField(decimal_places=2, max_digits=12)),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-19 14:58
+
+from django.db import migrations, models
+
+
+def recalcular_resumenes(apps, schema_editor):
+    """Los resúmenes existentes mezclan monedas: se descartan y la marca de agua
+    se reinicia para que ``actualizar_resumenes`` recalcule todos los días."""
+    apps.get_model('pedidos', 'ResumenPedidosDiario').objects.all().delete()
+    apps.get_model('pedidos', 'MarcaResumen').objects.filter(nombre='ventas').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0005_itempedido_subtotal_generado'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='resumenpedidosdiario',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='resumenpedidosdiario',
+            name='moneda',
+            field=models.CharField(default='USD', max_length=3),
+        ),
+        migrations.AlterUniqueTogether(
+            name='resumenpedidosdiario',
+            unique_together={('fecha', 'metodo_pago', 'estado', 'moneda')},
+        ),
+        migrations.RunPython(recalcular_resumenes, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 
@@ -90,7 +91,23 @@ class Pedido(models.Model):
         max_digits=10,
         decimal_places=2,
         validators=[MinValueValidator(Decimal('0.01'))],
-        help_text="Total del pedido"
+        help_text="Total del pedido (en la moneda del pedido)"
+    )
+    moneda = models.CharField(
+        max_length=3,
+        default='USD',
+        help_text="Moneda en que está expresado el total"
+    )
+    version_tasas = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Versión del conjunto de tasas usado al crear el pedido"
+    )
+    totales_moneda = models.JSONField(
+        default=dict,
+        blank=True,
+        encoder=DjangoJSONEncoder,
+        help_text="Total convertido a cada moneda al momento del pedido (ej: {'VES': '3650.00'})"
     )
     estado = models.CharField(
         max_length=20,
@@ -155,6 +172,11 @@ class Pedido(models.Model):
         blank=True,
         help_text="Fecha programada de entrega"
     )
+    version = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Se incrementa en cada cambio de estado (concurrencia optimista)"
+    )
     
     class Meta:
         verbose_name = "Pedido"
@@ -178,14 +200,27 @@ class Pedido(models.Model):
             self.numero_pedido = f"PED-{timestamp}"
         super().save(*args, **kwargs)
     
+    @property
+    def simbolo(self):
+        """Símbolo de la moneda del pedido"""
+        from core.models import ConfiguracionMoneda
+        return ConfiguracionMoneda.configuracion_cacheada().simbolos.get(self.moneda, self.moneda)
+    
     @property
     def total_formateado(self):
         """Retorna el total formateado"""
         try:
             total = self.total if self.total is not None else Decimal('0.00')
-            return f"${total:,.2f}"
+            return f"{self.simbolo}{total:,.2f}"
         except Exception:
-            return "$0.00"
+            return f"{self.simbolo}0.00"
+    
+    def total_en(self, moneda):
+        """Total en ``moneda`` con las tasas del momento del pedido, o None si no se guardó"""
+        if moneda == self.moneda:
+            return self.total
+        valor = (self.totales_moneda or {}).get(moneda)
+        return Decimal(valor) if valor is not None else None
     
     @property
     def items_count(self):
@@ -215,25 +250,67 @@ class Pedido(models.Model):
         return estados_pago_emoji.get(self.estado_pago, self.estado_pago)
     
     def aprobar_pago(self, administrador, notas=None):
-        """Aprueba el pago del pedido"""
-        from django.utils import timezone
-        self.estado_pago = 'pagado'
-        self.administrador_pago = administrador
-        self.fecha_pago = timezone.now()
-        if notas:
-            self.notas_administrador = notas
-        # Si el pago se aprueba, el pedido pasa a procesando
-        if self.estado == 'pendiente':
-            self.estado = 'procesando'
-        self.save()
+        """Aprueba el pago del pedido (ver pedidos.estados)"""
+        from .estados import aprobar_pagos
+        resultado = aprobar_pagos(Pedido.objects.filter(pk=self.pk), administrador, notas)
+        self.refresh_from_db()
+        return bool(resultado.aplicados)
     
     def rechazar_pago(self, administrador, notas=None):
-        """Rechaza el pago del pedido"""
-        self.estado_pago = 'rechazado'
-        self.administrador_pago = administrador
+        """Rechaza el pago del pedido (ver pedidos.estados)"""
+        from .estados import aplicar_transicion
+        cambios = {'administrador_pago': administrador}
         if notas:
-            self.notas_administrador = notas
-        self.save()
+            cambios['notas_administrador'] = notas
+        resultado = aplicar_transicion(
+            Pedido.objects.filter(pk=self.pk), 'estado_pago', 'rechazado',
+            usuario=administrador, notas=notas, cambios=cambios,
+        )
+        self.refresh_from_db()
+        return bool(resultado.aplicados)
+
+
+class TransicionPedido(models.Model):
+    """Registro de auditoría de cada cambio de estado de un pedido."""
+    CAMPOS = [
+        ('estado', 'Estado del pedido'),
+        ('estado_pago', 'Estado del pago'),
+    ]
+    
+    pedido = models.ForeignKey(
+        Pedido,
+        on_delete=models.CASCADE,
+        related_name='transiciones',
+        help_text="Pedido afectado"
+    )
+    campo = models.CharField(
+        max_length=20,
+        choices=CAMPOS,
+        help_text="Campo de estado que cambió"
+    )
+    valor_anterior = models.CharField(max_length=20)
+    valor_nuevo = models.CharField(max_length=20)
+    usuario = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='transiciones_pedido',
+        help_text="Usuario que aplicó la transición"
+    )
+    notas = models.TextField(blank=True)
+    fecha = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Transición de Pedido"
+        verbose_name_plural = "Transiciones de Pedidos"
+        ordering = ['-fecha', '-id']
+        indexes = [
+            models.Index(fields=['pedido', 'fecha']),
+        ]
+    
+    def __str__(self):
+        return f"{self.pedido_id}: {self.campo} {self.valor_anterior} → {self.valor_nuevo}"
 
 
 class ItemPedido(models.Model):
@@ -257,10 +334,22 @@ class ItemPedido(models.Model):
         decimal_places=2,
         help_text="Precio del producto al momento del pedido"
     )
-    subtotal = models.DecimalField(
-        max_digits=10,
-        decimal_places=2,
-        help_text="Subtotal de este item (cantidad × precio)"
+    moneda = models.CharField(
+        max_length=3,
+        blank=True,
+        help_text="Moneda del precio unitario (la del producto al momento del pedido)"
+    )
+    tasa = models.DecimalField(
+        max_digits=20,
+        decimal_places=10,
+        default=Decimal('1'),
+        help_text="Tasa de la moneda del item a la moneda del pedido al momento del pedido"
+    )
+    subtotal = models.GeneratedField(
+        expression=models.F('precio_unitario') * models.F('cantidad'),
+        output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        db_persist=True,
+        help_text="Subtotal de este item (cantidad × precio), calculado por la base de datos"
     )
     
     class Meta:
@@ -275,25 +364,102 @@ class ItemPedido(models.Model):
         return f"{self.pedido.numero_pedido} - {self.producto.nombre} (x{self.cantidad})"
     
     def save(self, *args, **kwargs):
-        """Calcula automáticamente el subtotal"""
-        if self.precio_unitario and self.cantidad:
-            self.subtotal = self.precio_unitario * self.cantidad
+        """Fija la moneda del producto (el subtotal lo calcula la base de datos)"""
+        if not self.moneda and self.producto_id:
+            self.moneda = self.producto.moneda_precio
         super().save(*args, **kwargs)
     
+    @property
+    def simbolo(self):
+        """Símbolo de la moneda del item"""
+        from core.models import ConfiguracionMoneda
+        return ConfiguracionMoneda.configuracion_cacheada().simbolos.get(self.moneda, self.moneda or '$')
+    
     @property
     def precio_unitario_formateado(self):
         """Retorna el precio unitario formateado"""
         try:
             val = self.precio_unitario if self.precio_unitario is not None else Decimal('0.00')
-            return f"${val:,.2f}"
+            return f"{self.simbolo}{val:,.2f}"
         except Exception:
-            return "$0.00"
+            return f"{self.simbolo}0.00"
     
     @property
     def subtotal_formateado(self):
         """Retorna el subtotal formateado"""
         try:
             val = self.subtotal if self.subtotal is not None else Decimal('0.00')
-            return f"${val:,.2f}"
+            return f"{self.simbolo}{val:,.2f}"
         except Exception:
-            return "$0.00"
+            return f"{self.simbolo}0.00"
+
+
+class VentaDiaria(models.Model):
+    """Resumen diario de items vendidos por categoría, método de pago y estado.
+
+    Se mantiene de forma incremental con ``manage.py actualizar_resumenes`` (ver
+    ``pedidos.ventas``). Los ingresos se guardan en la moneda del producto, así
+    que hay una fila por moneda. ``pedidos`` cuenta pedidos distintos dentro de
+    la fila; para totales de pedidos usar ``ResumenPedidosDiario``.
+    """
+    fecha = models.DateField()
+    categoria = models.ForeignKey(
+        'catalogo.Categoria',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='ventas_diarias',
+    )
+    metodo_pago = models.CharField(max_length=20, choices=Pedido.METODOS_PAGO)
+    estado = models.CharField(max_length=20, choices=Pedido.ESTADOS)
+    moneda = models.CharField(max_length=3)
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    unidades = models.PositiveIntegerField(default=0)
+    pedidos = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = "Venta Diaria"
+        verbose_name_plural = "Ventas Diarias"
+        ordering = ['-fecha']
+        indexes = [
+            models.Index(fields=['fecha', 'categoria']),
+        ]
+    
+    def __str__(self):
+        return f"{self.fecha} {self.categoria_id} {self.metodo_pago}/{self.estado}: {self.ingresos} {self.moneda}"
+
+
+class ResumenPedidosDiario(models.Model):
+    """Pedidos y total facturado por día, método de pago, estado y moneda (ver ``pedidos.ventas``).
+
+    ``total`` está en la moneda de los pedidos (``Pedido.moneda``), así que hay
+    una fila por moneda, como en ``VentaDiaria``.
+    """
+    fecha = models.DateField()
+    metodo_pago = models.CharField(max_length=20, choices=Pedido.METODOS_PAGO)
+    estado = models.CharField(max_length=20, choices=Pedido.ESTADOS)
+    moneda = models.CharField(max_length=3, default='USD')
+    pedidos = models.PositiveIntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    
+    class Meta:
+        verbose_name = "Resumen Diario de Pedidos"
+        verbose_name_plural = "Resúmenes Diarios de Pedidos"
+        ordering = ['-fecha']
+        unique_together = ['fecha', 'metodo_pago', 'estado', 'moneda']
+    
+    def __str__(self):
+        return f"{self.fecha} {self.metodo_pago}/{self.estado}: {self.pedidos} ({self.moneda})"
+
+
+class MarcaResumen(models.Model):
+    """Marca de agua de los resúmenes: pedidos modificados después de ``procesado_hasta`` están pendientes."""
+    nombre = models.CharField(max_length=50, unique=True)
+    procesado_hasta = models.DateTimeField()
+    
+    class Meta:
+        verbose_name = "Marca de Resumen"
+        verbose_name_plural = "Marcas de Resumen"
+    
+    def __str__(self):
+        return f"{self.nombre}: {self.procesado_hasta}"
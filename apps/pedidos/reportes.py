@@ -0,0 +1,152 @@
+"""Reporte PDF de ventas.
+
+Los pedidos se recorren con ``.iterator(chunk_size=...)`` trayendo usuario,
+items y productos en consultas por lote (sin N+1), así que la lectura de la
+base de datos no crece con la selección. El PDF no: ``canvas.Canvas`` guarda
+cada página terminada (comprimida) hasta ``save()``, de modo que la memoria
+crece con el número de páginas del reporte. El archivo temporal solo evita
+tener además el PDF final en memoria; ``FileResponse`` lo envía por bloques.
+"""
+
+import tempfile
+
+from django.db.models import Max, Min, Prefetch
+from django.http import FileResponse
+from django.utils import timezone
+
+from .models import ItemPedido
+
+try:
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import A4
+except Exception:
+    canvas = None
+    A4 = None
+
+
+CHUNK_SIZE = 500
+
+
+def _fecha(valor, formato='%Y-%m-%d %H:%M', vacio='N/A'):
+    return timezone.localtime(valor).strftime(formato) if valor else vacio
+
+
+def pedidos_para_reporte(queryset, chunk_size=CHUNK_SIZE):
+    """Itera los pedidos del queryset en bloques con usuario, items y productos precargados."""
+    items = ItemPedido.objects.select_related('producto').only(
+        'pedido_id', 'cantidad', 'precio_unitario', 'subtotal', 'moneda', 'producto__nombre',
+    )
+    return (
+        queryset
+        .order_by('fecha_creacion', 'pk')
+        .select_related('usuario')
+        .only(
+            'numero_pedido', 'fecha_creacion', 'total', 'moneda', 'metodo_pago', 'estado_pago',
+            'telefono_contacto', 'direccion_entrega',
+            'usuario__username', 'usuario__first_name', 'usuario__last_name',
+        )
+        .prefetch_related(None)
+        .prefetch_related(Prefetch('items', queryset=items))
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def escribir_reporte(queryset, destino, chunk_size=CHUNK_SIZE):
+    """Escribe el reporte de ventas de ``queryset`` en el archivo ``destino``.
+
+    Retorna ``(inicio, fin)`` con las fechas del primer y último pedido.
+    """
+    rango = queryset.order_by().aggregate(inicio=Min('fecha_creacion'), fin=Max('fecha_creacion'))
+    inicio_str = _fecha(rango['inicio'])
+    fin_str = _fecha(rango['fin'])
+
+    p = canvas.Canvas(destino, pagesize=A4, pageCompression=1)
+    width, height = A4
+    x_margin = 50
+    y = height - 60
+
+    # Título
+    p.setFont('Helvetica-Bold', 18)
+    p.drawString(x_margin, y, 'Ferreteria San Benito')
+    y -= 26
+
+    # Fecha de reporte
+    p.setFont('Helvetica', 11)
+    p.drawString(x_margin, y, f'Reporte de: {inicio_str}  -  {fin_str}')
+    y -= 14
+    p.line(x_margin, y, width - x_margin, y)
+    y -= 18
+
+    p.setFont('Helvetica', 10)
+
+    for pedido in pedidos_para_reporte(queryset, chunk_size):
+        if y < 120:
+            p.showPage()
+            y = height - 60
+            p.setFont('Helvetica', 10)
+
+        # Encabezado del pedido
+        p.setFont('Helvetica-Bold', 11)
+        p.drawString(x_margin, y, f'Pedido: {pedido.numero_pedido}')
+        p.setFont('Helvetica', 10)
+        p.drawRightString(width - x_margin, y, f'Fecha: {_fecha(pedido.fecha_creacion)}')
+        y -= 14
+
+        p.drawString(x_margin, y, f'Cliente: {pedido.usuario.get_full_name() or pedido.usuario.username}')
+        p.drawRightString(width - x_margin, y, f'Total: {pedido.total_formateado}')
+        y -= 14
+
+        p.drawString(x_margin, y, f'Método pago: {pedido.metodo_pago or "N/A"}    Estado pago: {pedido.estado_pago_display or "N/A"}')
+        y -= 14
+
+        # Dirección y contacto
+        p.drawString(x_margin, y, f'Teléfono: {pedido.telefono_contacto or "-"}')
+        y -= 12
+        text = p.beginText(x_margin, y)
+        text.setFont('Helvetica', 10)
+        for line in str(pedido.direccion_entrega or '').splitlines():
+            text.textLine(line)
+        p.drawText(text)
+        y = text.getY() - 10
+
+        # Items
+        p.setFont('Helvetica-Bold', 10)
+        p.drawString(x_margin, y, 'Producto')
+        p.drawRightString(width - 200, y, 'Cantidad')
+        p.drawRightString(width - 120, y, 'Precio')
+        p.drawRightString(width - x_margin, y, 'Subtotal')
+        y -= 12
+        p.setFont('Helvetica', 10)
+
+        for item in pedido.items.all():
+            if y < 80:
+                p.showPage()
+                y = height - 60
+                p.setFont('Helvetica', 10)
+            p.drawString(x_margin, y, item.producto.nombre)
+            p.drawRightString(width - 200, y, str(item.cantidad))
+            p.drawRightString(width - 120, y, item.precio_unitario_formateado)
+            p.drawRightString(width - x_margin, y, item.subtotal_formateado)
+            y -= 12
+
+        # Línea separadora entre pedidos
+        y -= 6
+        p.line(x_margin, y, width - x_margin, y)
+        y -= 16
+
+    p.showPage()
+    p.save()
+    return inicio_str, fin_str
+
+
+def respuesta_reporte(queryset, chunk_size=CHUNK_SIZE):
+    """Genera el reporte en un archivo temporal y lo devuelve como descarga en streaming."""
+    destino = tempfile.TemporaryFile(suffix='.pdf')
+    try:
+        inicio_str, fin_str = escribir_reporte(queryset, destino, chunk_size)
+    except Exception:
+        destino.close()
+        raise
+    destino.seek(0)
+    filename = f'reporte_pedidos_{inicio_str}_a_{fin_str}.pdf'
+    return FileResponse(destino, as_attachment=True, filename=filename, content_type='application/pdf')
@@ -0,0 +1,15 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import ItemPedido, Pedido
+
+
+@receiver(post_save, sender=ItemPedido)
+@receiver(post_delete, sender=ItemPedido)
+def tocar_pedido(sender, instance, **kwargs):
+    """Actualiza Pedido.fecha_actualizacion cuando cambian sus items.
+
+    La fecha funciona como versión del pedido (p. ej. para la caché de facturas).
+    """
+    Pedido.objects.filter(pk=instance.pedido_id).update(fecha_actualizacion=timezone.now())
@@ -1,3 +1,714 @@
-from django.test import TestCase
+import csv
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipIf
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.cache import SessionStore
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.db.models.fields.files import FieldFile
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from catalogo.models import Categoria, Producto
+from core import exportar
+from core.models import ConfiguracionMoneda, TasaCambio
+from . import estados, facturas, facturas_lote, reportes, ventas
+from .cart import Cart
+from .models import Carrito, ItemPedido, Pedido, ResumenPedidosDiario, TransicionPedido, VentaDiaria
+from .totales import calcular_totales, pedidos_descuadrados, recalcular_totales, totales_pedido
+
+
+def crear_producto(categoria, nombre='Martillo', precio='10.00', stock=10, **kwargs):
+    return Producto.objects.create(
+        nombre=nombre,
+        descripcion=f'{nombre} de prueba',
+        precio=Decimal(precio),
+        categoria=categoria,
+        stock=stock,
+        imagen='productos/prueba.jpg',
+        **kwargs,
+    )
+
+
+class CartServiceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.categoria = Categoria.objects.create(nombre='Herramientas')
+        cls.producto = crear_producto(cls.categoria, stock=5)
+        cls.user = User.objects.create_user('cliente', password='clave-segura-123')
+
+    def test_agregar_anonimo_solo_sesion(self):
+        self.client.post(reverse('pedidos:carrito_agregar'), {'product_id': self.producto.id, 'quantity': 2})
+        self.assertEqual(self.client.session['cart'], {str(self.producto.id): 2})
+        self.assertFalse(Carrito.objects.exists())
+
+    def test_agregar_autenticado_persiste_en_un_lote(self):
+        self.client.force_login(self.user)
+        url = reverse('pedidos:carrito_agregar')
+        self.client.post(url, {'product_id': self.producto.id, 'quantity': 2})
+        self.client.post(url, {'product_id': self.producto.id, 'quantity': 1})
+        item = Carrito.objects.get(usuario=self.user, producto=self.producto)
+        self.assertEqual(item.cantidad, 3)
+        self.assertEqual(self.client.session['cart'], {str(self.producto.id): 3})
+
+    def test_agregar_limita_al_stock(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse('pedidos:carrito_agregar'), {'product_id': self.producto.id, 'quantity': 9})
+        self.assertEqual(Carrito.objects.get(usuario=self.user).cantidad, 5)
+
+    def test_actualizar_a_cero_elimina(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse('pedidos:carrito_agregar'), {'product_id': self.producto.id, 'quantity': 2})
+        self.client.post(reverse('pedidos:carrito_actualizar'), {'product_id': self.producto.id, 'quantity': 0})
+        self.assertFalse(Carrito.objects.filter(usuario=self.user).exists())
+        self.assertEqual(self.client.session['cart'], {})
+
+    def test_limpiar_borra_carrito_en_db(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse('pedidos:carrito_agregar'), {'product_id': self.producto.id, 'quantity': 1})
+        self.client.post(reverse('pedidos:carrito_limpiar'))
+        self.assertFalse(Carrito.objects.filter(usuario=self.user).exists())
+
+    def test_flush_usa_un_solo_upsert(self):
+        request = RequestFactory().post('/')
+        request.session = SessionStore()
+        request.user = self.user
+        cart = Cart.for_request(request)
+        cart.add(self.producto, 1)
+        with self.assertNumQueries(1):
+            cart.flush()
+        self.assertFalse(cart.has_changes)
+
+
+class CartEndpointsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.categoria = Categoria.objects.create(nombre='Herramientas')
+        cls.producto = crear_producto(cls.categoria, precio='2.50', stock=5)
+
+    def test_agregar_json(self):
+        resp = self.client.post(
+            reverse('pedidos:carrito_agregar'),
+            {'product_id': self.producto.id, 'quantity': 2},
+            HTTP_ACCEPT='application/json',
+        )
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()
+        self.assertEqual(data['cart_count'], 2)
+        self.assertEqual(data['total_convertido'], '5.00')
+        self.assertEqual(data['totales_por_moneda'], [{'moneda': 'USD', 'subtotal': '5.00', 'convertido': '5.00'}])
+        self.assertEqual(data['items'][0]['subtotal'], '5.00')
+        self.assertEqual(len(data['messages']), 1)
+
+    def test_agregar_json_producto_invalido(self):
+        resp = self.client.post(
+            reverse('pedidos:carrito_agregar'), {'product_id': 'x'}, HTTP_ACCEPT='application/json',
+        )
+        self.assertEqual(resp.status_code, 400)
+        self.assertFalse(resp.json()['ok'])
+
+    def test_actualizar_fragmento(self):
+        self.client.post(reverse('pedidos:carrito_agregar'), {'product_id': self.producto.id})
+        resp = self.client.post(
+            reverse('pedidos:carrito_actualizar'),
+            {'product_id': self.producto.id, 'quantity': 3},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp['X-Cart-Count'], '3')
+        self.assertContains(resp, self.producto.nombre)
+        self.assertNotContains(resp, '<html')
+
+    def test_sin_js_redirige(self):
+        resp = self.client.post(reverse('pedidos:carrito_limpiar'))
+        self.assertRedirects(resp, reverse('pedidos:carrito_ver'))
+
+
+class TotalesPorMonedaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.categoria = Categoria.objects.create(nombre='Herramientas')
+        cls.usd = crear_producto(cls.categoria, nombre='Taladro', precio='10.00')
+        cls.ves = crear_producto(cls.categoria, nombre='Clavos', precio='73.00', moneda_precio='VES')
+        TasaCambio.objects.create(moneda_origen='USD', moneda_destino='VES', tasa=Decimal('36.50'))
+        cls.user = User.objects.create_user('cliente', password='clave-segura-123')
+
+    def test_calcular_totales_agrupa_y_convierte_una_vez(self):
+        tasas = TasaCambio.snapshot()
+        lineas = [('USD', Decimal('10.00')), ('VES', Decimal('73.00')), ('USD', Decimal('5.00'))]
+        totales = calcular_totales(lineas, 'USD', tasas)
+        self.assertEqual([(g['moneda'], g['subtotal']) for g in totales['por_moneda']],
+                         [('USD', Decimal('15.00')), ('VES', Decimal('73.00'))])
+        self.assertEqual(totales['total_convertido'], Decimal('17.00'))
+        self.assertEqual(calcular_totales(lineas, 'VES', tasas)['total_convertido'], Decimal('620.50'))
+
+    def test_snapshot_lee_tasas_en_una_consulta(self):
+        with self.assertNumQueries(1):
+            tasas = TasaCambio.snapshot()
+        self.assertEqual(tasas.tasa('VES', 'USD'), Decimal('1') / Decimal('36.50'))
+        self.assertEqual(tasas.tasa('USD', 'COP'), Decimal('1.000000'))
+
+    def test_snapshot_cacheado_se_invalida_al_cambiar_tasas(self):
+        cache.clear()
+        self.assertEqual(TasaCambio.snapshot_cacheado().tasa('USD', 'VES'), Decimal('36.50'))
+        with self.assertNumQueries(0):
+            TasaCambio.snapshot_cacheado()
+        tasa = TasaCambio.objects.get(moneda_origen='USD', moneda_destino='VES')
+        tasa.tasa = Decimal('40.00')
+        tasa.save()
+        self.assertEqual(TasaCambio.snapshot_cacheado().tasa('USD', 'VES'), Decimal('40.00'))
+
+    def test_checkout_carrito_mixto_guarda_total_en_moneda_principal(self):
+        self.client.force_login(self.user)
+        url = reverse('pedidos:carrito_agregar')
+        self.client.post(url, {'product_id': self.usd.id, 'quantity': 1})
+        self.client.post(url, {'product_id': self.ves.id, 'quantity': 1})
+        resp = self.client.post(reverse('pedidos:checkout'), {
+            'direccion_entrega': 'Calle 1', 'telefono_contacto': '04120000000',
+        })
+        pedido = Pedido.objects.get(usuario=self.user)
+        self.assertRedirects(resp, reverse('pedidos:pedido_confirmacion', args=[pedido.numero_pedido]))
+        self.assertEqual(pedido.total, Decimal('12.00'))
+        self.assertEqual(
+            list(Producto.objects.filter(pk__in=[self.usd.pk, self.ves.pk]).values_list('stock', flat=True)), [9, 9]
+        )
+
+    def test_checkout_congela_moneda_tasas_y_totales(self):
+        version = ConfiguracionMoneda.obtener_configuracion().version_tasas
+        self.client.force_login(self.user)
+        url = reverse('pedidos:carrito_agregar')
+        self.client.post(url, {'product_id': self.usd.id, 'quantity': 1})
+        self.client.post(url, {'product_id': self.ves.id, 'quantity': 1})
+        self.client.post(reverse('pedidos:checkout'), {
+            'direccion_entrega': 'Calle 1', 'telefono_contacto': '04120000000',
+        })
+        pedido = Pedido.objects.get(usuario=self.user)
+        self.assertEqual((pedido.moneda, pedido.version_tasas), ('USD', version))
+        self.assertEqual(pedido.total_en('VES'), Decimal('438.00'))
+        item_ves = pedido.items.get(producto=self.ves)
+        self.assertEqual((item_ves.moneda, item_ves.tasa), ('VES', Decimal('0.0273972603')))
+
+        # Un cambio de tasa crea una nueva versión pero no altera el pedido
+        TasaCambio.objects.filter(moneda_destino='VES').get().delete()
+        TasaCambio.objects.create(moneda_origen='USD', moneda_destino='VES', tasa=Decimal('50.00'))
+        self.assertGreater(ConfiguracionMoneda.obtener_configuracion().version_tasas, version)
+
+        pedido = Pedido.objects.get(pk=pedido.pk)
+        with self.assertNumQueries(1):
+            totales = totales_pedido(pedido, 'VES')
+        self.assertEqual(totales['total_convertido'], Decimal('438.00'))
+        self.assertEqual(pedido.total_formateado, '$12.00')
+
+    def _datos_admin(self, resp):
+        """POST del change form con los valores que muestra el admin (formulario e inlines)."""
+        datos = {}
+        formularios = [resp.context['adminform'].form]
+        for inline in resp.context['inline_admin_formsets']:
+            formset = inline.formset
+            datos.update({formset.management_form.add_prefix(k): v for k, v in formset.management_form.initial.items()})
+            formularios += list(formset.forms)
+        for formulario in formularios:
+            for nombre, campo in formulario.fields.items():
+                valor = formulario[nombre].value()
+                if valor is not None and not isinstance(valor, FieldFile):
+                    datos[formulario.add_prefix(nombre)] = valor
+        return datos
+
+    def test_admin_agregar_item_conserva_tasas_guardadas(self):
+        admin = User.objects.create_superuser('root', 'root@example.com', 'clave-segura-123')
+        pedido = Pedido.objects.create(
+            usuario=self.user, numero_pedido='PED-A1', total=Decimal('2.00'), version_tasas=3,
+            totales_moneda={'VES': '73.00'}, direccion_entrega='-', telefono_contacto='-',
+        )
+        viejo = ItemPedido.objects.create(
+            pedido=pedido, producto=self.ves, cantidad=1, precio_unitario=Decimal('73.00'),
+            moneda='VES', tasa=Decimal('0.0273972603'),
+        )
+        TasaCambio.objects.filter(moneda_destino='VES').update(tasa=Decimal('50.00'))
+
+        self.client.force_login(admin)
+        self.client.cookies['admin_sessionid'] = self.client.cookies['sessionid'].value
+        url = reverse('admin:pedidos_pedido_change', args=[pedido.pk])
+        datos = self._datos_admin(self.client.get(url))
+        datos.update({'items-TOTAL_FORMS': 2, 'items-1-producto': self.usd.pk, 'items-1-cantidad': 1})
+        resp = self.client.post(url, datos)
+        self.assertEqual(resp.status_code, 302)
+
+        viejo.refresh_from_db()
+        nuevo = pedido.items.exclude(pk=viejo.pk).get()
+        pedido.refresh_from_db()
+        self.assertEqual((viejo.moneda, viejo.tasa), ('VES', Decimal('0.0273972603')))
+        self.assertEqual((nuevo.moneda, nuevo.tasa), ('USD', Decimal('1')))
+        self.assertEqual((pedido.total, pedido.version_tasas), (Decimal('12.00'), 3))
+        self.assertEqual(pedido.total_en('VES'), Decimal('438.00'))
+        # El admin deja el mismo invariante que comprueba verificar_totales
+        self.assertFalse(pedidos_descuadrados(Pedido.objects.all()).exists())
+
+    def test_simbolos_configurados(self):
+        config = ConfiguracionMoneda.obtener_configuracion()
+        config.simbolos_monedas = {'USD': 'US$', 'VES': 'Bs.'}
+        config.save()
+        pedido = Pedido.objects.create(
+            usuario=self.user, numero_pedido='PED-S1', total=Decimal('12.00'),
+            direccion_entrega='-', telefono_contacto='-',
+        )
+        item = ItemPedido.objects.create(pedido=pedido, producto=self.ves, cantidad=1, precio_unitario=Decimal('73.00'))
+        self.assertEqual((pedido.simbolo, item.simbolo), ('US$', 'Bs.'))
+
+
+class TransicionesPedidoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', password='clave-segura-123', is_staff=True)
+        cls.cliente = User.objects.create_user('cliente', password='clave-segura-123')
+
+    def _pedidos(self, n, **kwargs):
+        return [
+            Pedido.objects.create(
+                usuario=self.cliente, numero_pedido=f'PED-T{i}-{kwargs.get("estado_pago", "x")}',
+                total=Decimal('1.00'), direccion_entrega='-', telefono_contacto='-', **kwargs,
+            )
+            for i in range(n)
+        ]
+
+    def test_aprobar_en_bloque_con_auditoria(self):
+        pedidos = self._pedidos(3, estado_pago='verificando')
+        resultado = estados.aprobar_pagos(Pedido.objects.all(), self.admin, 'ok')
+        self.assertEqual(sorted(resultado.aplicados), sorted(p.pk for p in pedidos))
+        self.assertEqual(Pedido.objects.filter(estado_pago='pagado', estado='procesando').count(), 3)
+        self.assertEqual(TransicionPedido.objects.filter(campo='estado_pago').count(), 3)
+        self.assertEqual(TransicionPedido.objects.filter(campo='estado').count(), 3)
+
+    def test_consultas_independientes_del_numero_de_pedidos(self):
+        self._pedidos(2, estado_pago='verificando')
+        with CaptureQueriesContext(connection) as pocos:
+            estados.rechazar_pagos(Pedido.objects.all(), self.admin)
+        Pedido.objects.all().delete()
+        self._pedidos(40, estado_pago='verificando')
+        with CaptureQueriesContext(connection) as muchos:
+            estados.rechazar_pagos(Pedido.objects.all(), self.admin)
+        self.assertEqual(len(pocos), len(muchos))
+
+    def test_transicion_no_permitida_se_omite(self):
+        completado, = self._pedidos(1, estado='completado')
+        resultado = estados.aplicar_transicion(Pedido.objects.all(), 'estado', 'procesando')
+        self.assertEqual(resultado.aplicados, [])
+        self.assertEqual(resultado.omitidos, [completado.pk])
+
+    def test_version_desactualizada_no_sobrescribe(self):
+        pedido, = self._pedidos(1, estado_pago='verificando')
+        vista = {pedido.pk: pedido.version}
+        estados.aplicar_transicion(Pedido.objects.all(), 'estado_pago', 'rechazado', usuario=self.admin)
+        estados.aplicar_transicion(Pedido.objects.all(), 'estado_pago', 'verificando', usuario=self.admin)
+        resultado = estados.aprobar_pagos(Pedido.objects.all(), self.admin, versiones=vista)
+        self.assertEqual(resultado.omitidos, [pedido.pk])
+        pedido.refresh_from_db()
+        self.assertEqual(pedido.estado_pago, 'verificando')
+        self.assertEqual(pedido.version, 2)
+
+    def test_admin_guardado_concurrente_no_sobrescribe(self):
+        from django.contrib.admin.sites import site
+        from .admin import EdicionConcurrente
+
+        pedido, = self._pedidos(1, estado_pago='verificando')
+        modelo_admin = site._registry[Pedido]
+        request = RequestFactory().post('/')
+        request.user = self.admin
+        Formulario = modelo_admin.get_form(request, pedido, fields=['notas', 'version_esperada'])
+        formulario = Formulario({'notas': 'primero', 'version_esperada': pedido.version}, instance=pedido)
+        self.assertTrue(formulario.is_valid())
+        # Otro administrador guarda entre la validación y el guardado
+        estados.aplicar_transicion(Pedido.objects.all(), 'estado_pago', 'rechazado', usuario=self.admin)
+        with self.assertRaises(EdicionConcurrente):
+            modelo_admin.save_model(request, formulario.save(commit=False), formulario, True)
+        pedido.refresh_from_db()
+        self.assertEqual((pedido.notas, pedido.estado_pago, pedido.version), ('', 'rechazado', 1))
+
+    def test_accion_admin_omite_pedidos_con_version_vieja(self):
+        vigente, viejo = self._pedidos(2, estado_pago='verificando')
+        Pedido.objects.filter(pk=viejo.pk).update(version=5)
+        self.client.force_login(User.objects.create_superuser('root', 'root@example.com', 'clave-segura-123'))
+        self.client.cookies['admin_sessionid'] = self.client.cookies['sessionid'].value
+        self.client.post(reverse('admin:pedidos_pedido_changelist'), {
+            'action': 'aprobar_pagos', '_selected_action': [vigente.pk, viejo.pk],
+            f'version_{vigente.pk}': 0, f'version_{viejo.pk}': 4,
+        })
+        self.assertEqual(Pedido.objects.get(pk=vigente.pk).estado_pago, 'pagado')
+        self.assertEqual(Pedido.objects.get(pk=viejo.pk).estado_pago, 'verificando')
+
+
+class ReportePedidosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        categoria = Categoria.objects.create(nombre='Herramientas')
+        producto = crear_producto(categoria)
+        cliente = User.objects.create_user('cliente', password='clave-segura-123')
+        for i in range(30):
+            pedido = Pedido.objects.create(
+                usuario=cliente, numero_pedido=f'PED-R{i}', total=Decimal('20.00'),
+                direccion_entrega='Calle 1', telefono_contacto='0412',
+            )
+            ItemPedido.objects.create(pedido=pedido, producto=producto, cantidad=2, precio_unitario=Decimal('10.00'))
+
+    def test_reporte_sin_consultas_por_pedido(self):
+        buffer = BytesIO()
+        # rango + pedidos + items por bloque, independientemente del número de pedidos
+        with self.assertNumQueries(3):
+            reportes.escribir_reporte(Pedido.objects.all(), buffer)
+        self.assertTrue(buffer.getvalue().startswith(b'%PDF'))
+
+    def test_respuesta_en_streaming(self):
+        resp = reportes.respuesta_reporte(Pedido.objects.all())
+        self.assertTrue(resp.streaming)
+        self.assertTrue(b''.join(resp.streaming_content).startswith(b'%PDF'))
+
+
+class FacturaCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        categoria = Categoria.objects.create(nombre='Herramientas')
+        cls.producto = crear_producto(categoria)
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'clave-segura-123')
+        cls.pedido = Pedido.objects.create(
+            usuario=cls.admin, numero_pedido='PED-F1', total=Decimal('20.00'),
+            direccion_entrega='Calle 1', telefono_contacto='0412',
+        )
+        ItemPedido.objects.create(pedido=cls.pedido, producto=cls.producto, cantidad=2, precio_unitario=Decimal('10.00'))
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = self.settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.client.force_login(self.admin)
+        self.client.cookies['admin_sessionid'] = self.client.cookies['sessionid'].value
+        self.url = reverse('admin:pedidos_pedido_factura', args=[self.pedido.pk])
+
+    def _archivos(self):
+        return sorted(os.listdir(os.path.join(self.media, 'facturas', str(self.pedido.pk))))
+
+    def test_reutiliza_pdf_y_responde_304(self):
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(b''.join(resp.streaming_content).startswith(b'%PDF'))
+        etag = resp['ETag']
+        self.assertEqual(len(self._archivos()), 1)
+
+        with mock.patch.object(facturas, 'render_factura') as render:
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+            render.assert_not_called()
+        no_modificado = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(no_modificado.status_code, 304)
+        self.assertEqual((no_modificado['ETag'], no_modificado['Last-Modified']), (etag, resp['Last-Modified']))
+        # Last-Modified tiene resolución de segundos: devolverlo tal cual también valida
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=resp['Last-Modified']).status_code, 304)
+
+    def test_render_concurrente_conserva_la_factura_vigente(self):
+        vigente = facturas.obtener_factura(self.pedido)
+        # Otro worker terminó el mismo render después: no debe duplicarla ni borrarla
+        self.assertEqual(facturas.guardar_factura(self.pedido, b'%PDF-otro'), vigente)
+        self.assertEqual(self._archivos(), [os.path.basename(vigente)])
+
+    def test_regenera_al_cambiar_items(self):
+        primera = self.client.get(self.url)['ETag']
+        antes = self._archivos()
+        ItemPedido.objects.create(pedido=self.pedido, producto=self.producto, cantidad=1, precio_unitario=Decimal('10.00'))
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=primera)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp['ETag'], primera)
+        self.assertEqual(len(self._archivos()), 1)
+        self.assertNotEqual(self._archivos(), antes)
+
+    def test_zip_de_facturas_en_paralelo(self):
+        otro = Pedido.objects.create(
+            usuario=self.admin, numero_pedido='PED-F2', total=Decimal('10.00'),
+            direccion_entrega='Calle 2', telefono_contacto='0414',
+        )
+        ItemPedido.objects.create(pedido=otro, producto=self.producto, cantidad=1, precio_unitario=Decimal('10.00'))
+        archivos = facturas_lote.generar_facturas(Pedido.objects.all(), workers=2)
+        contenido = b''.join(facturas_lote.zip_en_streaming(archivos))
+        with zipfile.ZipFile(BytesIO(contenido)) as zf:
+            self.assertEqual(sorted(zf.namelist()), ['factura_PED-F1.pdf', 'factura_PED-F2.pdf'])
+            self.assertTrue(zf.read('factura_PED-F2.pdf').startswith(b'%PDF'))
+        # Las facturas renderizadas quedan en caché para la versión vigente
+        self.assertEqual(len(self._archivos()), 1)
+
+    def test_accion_admin_descarga_zip(self):
+        with mock.patch.object(facturas_lote, 'ProcessPoolExecutor', side_effect=AssertionError('pool en la petición')):
+            resp = self.client.post(reverse('admin:pedidos_pedido_changelist'), {
+                'action': 'descargar_facturas_zip', '_selected_action': [self.pedido.pk],
+            })
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual(resp['Content-Type'], 'application/zip')
+            with zipfile.ZipFile(BytesIO(b''.join(resp.streaming_content))) as zf:
+                self.assertEqual(zf.namelist(), ['factura_PED-F1.pdf'])
+
+
+class ResumenesVentasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.herramientas = Categoria.objects.create(nombre='Herramientas')
+        cls.pinturas = Categoria.objects.create(nombre='Pinturas')
+        cls.martillo = crear_producto(cls.herramientas, precio='10.00')
+        cls.pintura = crear_producto(cls.pinturas, nombre='Pintura', precio='5.00')
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'clave-segura-123')
+
+    def _pedido(self, numero, dias_atras=0, metodo='efectivo', lineas=()):
+        pedido = Pedido.objects.create(
+            usuario=self.admin, numero_pedido=numero, total=Decimal('1.00'),
+            metodo_pago=metodo, direccion_entrega='Calle 1', telefono_contacto='0412',
+        )
+        total = Decimal('0.00')
+        for producto, cantidad in lineas:
+            item = ItemPedido.objects.create(pedido=pedido, producto=producto, cantidad=cantidad, precio_unitario=producto.precio)
+            total += item.subtotal
+        fecha = timezone.now() - timedelta(days=dias_atras)
+        Pedido.objects.filter(pk=pedido.pk).update(total=total, fecha_creacion=fecha)
+        return pedido
+
+    def test_actualizacion_incremental(self):
+        self._pedido('PED-V1', 1, lineas=[(self.martillo, 2), (self.pintura, 1)])
+        self._pedido('PED-V2', 1, metodo='zelle', lineas=[(self.martillo, 1)])
+        hoy = self._pedido('PED-V3', 0, lineas=[(self.pintura, 4)])
+
+        dias, _ = ventas.actualizar_resumenes()
+        self.assertEqual(dias, 2)
+        ayer = timezone.localdate() - timedelta(days=1)
+        fila = VentaDiaria.objects.get(fecha=ayer, categoria=self.herramientas, metodo_pago='efectivo')
+        self.assertEqual((fila.ingresos, fila.unidades, fila.pedidos), (Decimal('20.00'), 2, 1))
+        self.assertEqual(ResumenPedidosDiario.objects.filter(fecha=ayer).aggregate(n=Sum('pedidos'))['n'], 2)
+
+        # Un pedido en bolívares tiene su propia fila: los totales no se mezclan
+        Pedido.objects.filter(numero_pedido='PED-V2').update(moneda='VES', total=Decimal('400.00'), fecha_actualizacion=timezone.now())
+        ventas.actualizar_resumenes()
+        resumen = ventas.resumen_dashboard(ayer, timezone.localdate())
+        self.assertEqual(
+            [(f['moneda'], f['pedidos'], f['total']) for f in resumen['totales_por_moneda']],
+            [('USD', 2, Decimal('45.00')), ('VES', 1, Decimal('400.00'))],
+        )
+
+        # Sin cambios no hay días pendientes
+        self.assertEqual(ventas.actualizar_resumenes(), (0, 0))
+
+        estados.aplicar_transicion(Pedido.objects.filter(pk=hoy.pk), 'estado', 'cancelado')
+        dias, _ = ventas.actualizar_resumenes()
+        self.assertEqual(dias, 1)
+        self.assertEqual(
+            set(VentaDiaria.objects.filter(fecha=timezone.localdate()).values_list('estado', flat=True)),
+            {'cancelado'},
+        )
+
+    def test_dashboard_lee_solo_resumenes(self):
+        self._pedido('PED-V1', 0, lineas=[(self.martillo, 3)])
+        ventas.actualizar_resumenes()
+        cache.clear()
+        self.client.force_login(self.admin)
+        self.client.cookies['admin_sessionid'] = self.client.cookies['sessionid'].value
+
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(reverse('admin:pedidos_ventadiaria_changelist'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, 'Herramientas')
+        sql = ' '.join(q['sql'] for q in ctx.captured_queries)
+        self.assertNotIn('"pedidos_itempedido"', sql)
+        self.assertNotIn('"pedidos_pedido"', sql)
+
+
+class MantenimientoTotalesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        categoria = Categoria.objects.create(nombre='Herramientas')
+        cls.producto = crear_producto(categoria, precio='2.50')
+        cls.usuario = User.objects.create_user('cliente', password='clave-segura-123')
+
+    def _pedido(self, numero, total='0.00'):
+        return Pedido.objects.create(
+            usuario=self.usuario, numero_pedido=numero, total=Decimal(total),
+            direccion_entrega='Calle 1', telefono_contacto='0412',
+        )
+
+    def test_subtotal_generado_con_operaciones_en_bloque(self):
+        pedido = self._pedido('PED-M1')
+        ItemPedido.objects.bulk_create([
+            ItemPedido(pedido=pedido, producto=self.producto, cantidad=2, precio_unitario=Decimal('2.50'), moneda='USD'),
+        ])
+        ItemPedido.objects.filter(pedido=pedido).update(cantidad=4)
+        self.assertEqual(ItemPedido.objects.get(pedido=pedido).subtotal, Decimal('10.00'))
+
+        self.assertEqual(recalcular_totales(Pedido.objects.filter(pk=pedido.pk)), 1)
+        pedido.refresh_from_db()
+        self.assertEqual(pedido.total, Decimal('10.00'))
+
+    def test_total_en_medio_centavo_no_se_descuadra(self):
+        # 617,56 × 0,4155 + 1,00 × 0,48882 = 257,085: en coma flotante queda por debajo
+        pedido = self._pedido('PED-M5', '257.09')
+        for precio, tasa in (('617.56', '0.4155'), ('1.00', '0.48882')):
+            ItemPedido.objects.create(
+                pedido=pedido, producto=self.producto, cantidad=1, precio_unitario=Decimal(precio), tasa=Decimal(tasa),
+            )
+        self.assertFalse(pedidos_descuadrados(Pedido.objects.all()).exists())
+        recalcular_totales(Pedido.objects.filter(pk=pedido.pk))
+        pedido.refresh_from_db()
+        self.assertEqual(pedido.total, Decimal('257.09'))
+
+    def test_verificar_y_reparar_totales(self):
+        bien = self._pedido('PED-M2', '5.00')
+        mal = self._pedido('PED-M3', '99.00')
+        for pedido in (bien, mal):
+            ItemPedido.objects.create(pedido=pedido, producto=self.producto, cantidad=2, precio_unitario=Decimal('2.50'))
+        vacio = self._pedido('PED-M4', '1.00')
+        Pedido.objects.filter(pk=mal.pk).update(totales_moneda={'VES': '3960.00'})
+        Pedido.objects.filter(pk=vacio.pk).update(totales_moneda={'VES': '40.00'})
+
+        with self.assertNumQueries(1):
+            descuadrados = set(pedidos_descuadrados(Pedido.objects.all()).values_list('numero_pedido', flat=True))
+        self.assertEqual(descuadrados, {mal.numero_pedido, vacio.numero_pedido})
+
+        salida = StringIO()
+        call_command('verificar_totales', '--reparar', stdout=salida)
+        self.assertIn('Totales recalculados: 2', salida.getvalue())
+        self.assertFalse(pedidos_descuadrados(Pedido.objects.all()).exists())
+        mal.refresh_from_db()
+        self.assertEqual(mal.total, Decimal('5.00'))
+        # Los totales en otras monedas siguen la misma tasa del pedido
+        self.assertEqual(mal.total_en('VES'), Decimal('200.00'))
+        vacio.refresh_from_db()
+        self.assertEqual(vacio.total_en('VES'), Decimal('0.00'))
+
+
+class ConsultasChangelistTests(TestCase):
+    """El changelist ejecuta el mismo número de consultas con 1 o 500 filas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'clave-segura-123')
+        cls.categoria = Categoria.objects.create(nombre='Herramientas')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+        self.client.cookies['admin_sessionid'] = self.client.cookies['sessionid'].value
+
+    def _consultas(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        return len(ctx)
+
+    def _crear(self, desde, hasta):
+        usuarios = User.objects.bulk_create([User(username=f'cliente{i}') for i in range(desde, hasta)])
+        productos = Producto.objects.bulk_create([
+            Producto(
+                nombre=f'Producto {i}', descripcion='-', precio=Decimal('2.00'), categoria=self.categoria,
+                stock=10, imagen='productos/p.jpg', slug=f'producto-{i}',
+            )
+            for i in range(desde, hasta)
+        ])
+        Carrito.objects.bulk_create([Carrito(usuario=u, producto=p) for u, p in zip(usuarios, productos)])
+        pedidos = Pedido.objects.bulk_create([
+            Pedido(
+                usuario=u, numero_pedido=f'PED-C{u.pk}', total=Decimal('4.00'),
+                direccion_entrega='-', telefono_contacto='-',
+            )
+            for u in usuarios
+        ])
+        ItemPedido.objects.bulk_create([
+            ItemPedido(pedido=pe, producto=p, cantidad=2, precio_unitario=Decimal('2.00'), moneda='USD')
+            for pe, p in zip(pedidos, productos)
+        ])
+
+    def test_presupuesto_con_1_y_500_filas(self):
+        presupuestos = {
+            'admin:pedidos_carrito_changelist': 10,
+            'admin:pedidos_pedido_changelist': 10,
+            'admin:pedidos_itempedido_changelist': 10,
+        }
+        self._crear(0, 1)
+        for nombre in presupuestos:
+            # Primera visita: crea la configuración de moneda y llena la caché
+            self.client.get(reverse(nombre))
+        con_uno = {nombre: self._consultas(reverse(nombre)) for nombre in presupuestos}
+        self._crear(1, 500)
+        for nombre, presupuesto in presupuestos.items():
+            with self.subTest(nombre):
+                con_500 = self._consultas(reverse(nombre))
+                self.assertEqual(con_uno[nombre], con_500)
+                self.assertLessEqual(con_500, presupuesto)
+        # La columna de items sale de la anotación num_items
+        resp = self.client.get(reverse('admin:pedidos_pedido_changelist'))
+        self.assertContains(resp, '<td class="field-items_count">1</td>', count=100)
+
+
+class ExportacionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        categoria = Categoria.objects.create(nombre='Herramientas')
+        producto = crear_producto(categoria)
+        cliente = User.objects.create_user('cliente', password='clave-segura-123')
+        for i, estado in enumerate(['pendiente', 'completado', 'completado']):
+            pedido = Pedido.objects.create(
+                usuario=cliente, numero_pedido=f'PED-E{i}', total=Decimal('20.00'), estado=estado,
+                direccion_entrega='Calle 1', telefono_contacto='0412',
+            )
+            ItemPedido.objects.create(pedido=pedido, producto=producto, cantidad=2, precio_unitario=Decimal('10.00'))
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'clave-segura-123')
+
+    def test_csv_con_campos_relacionados_en_una_consulta(self):
+        with self.assertNumQueries(1):
+            lineas = list(exportar.lineas_csv('items', ItemPedido.objects.all(), chunk_size=1))
+        self.assertTrue(lineas[0].startswith(exportar.BOM + 'Pedido,'))
+        self.assertEqual(lineas[1].strip(), 'PED-E0,%s,pendiente,USD,martillo-herramientas,Martillo,Herramientas,2,10.00,USD,1.0000000000,20.00' % (
+            timezone.localtime(Pedido.objects.get(numero_pedido='PED-E0').fecha_creacion).strftime('%Y-%m-%d %H:%M:%S')
+        ))
+
+    def test_accion_exporta_el_changelist_filtrado(self):
+        self.client.force_login(self.admin)
+        self.client.cookies['admin_sessionid'] = self.client.cookies['sessionid'].value
+        resp = self.client.post(reverse('admin:pedidos_pedido_changelist') + '?estado__exact=completado', {
+            'action': 'exportar_csv', 'select_across': '1', '_selected_action': [Pedido.objects.first().pk],
+        })
+        self.assertTrue(resp.streaming)
+        self.assertEqual(resp['Content-Type'], 'text/csv; charset=utf-8')
+        contenido = b''.join(resp.streaming_content).decode('utf-8')
+        self.assertIn('PED-E1', contenido)
+        self.assertIn('PED-E2', contenido)
+        self.assertNotIn('PED-E0', contenido)
+
+    def test_csv_neutraliza_formulas(self):
+        Pedido.objects.filter(numero_pedido='PED-E0').update(direccion_entrega='=HYPERLINK("http://x")', telefono_contacto='+58412')
+        lineas = list(exportar.lineas_csv('pedidos', Pedido.objects.filter(numero_pedido='PED-E0')))
+        fila = next(csv.reader(lineas[1:]))
+        self.assertEqual(fila[-2:], ['\'=HYPERLINK("http://x")', "'+58412"])
+        self.assertEqual(fila[8], '20.00')
+
+    @skipIf(exportar.Workbook is None, 'openpyxl no está instalado')
+    def test_xlsx_ida_y_vuelta(self):
+        from openpyxl import load_workbook
+
+        destino = BytesIO()
+        exportar.escribir_xlsx('pedidos', Pedido.objects.all(), destino, chunk_size=1)
+        destino.seek(0)
+        hoja = load_workbook(destino, read_only=True).active
+        filas = list(hoja.iter_rows(values_only=True))
+        self.assertEqual(filas[0], tuple(encabezado for encabezado, _ in exportar.columnas('pedidos')))
+        self.assertEqual([fila[0] for fila in filas[1:]], ['PED-E0', 'PED-E1', 'PED-E2'])
+        self.assertEqual((filas[1][4], filas[1][8], filas[1][9]), ('pendiente', 20.0, None))
+
+    def test_comando_con_filtros(self):
+        salida = StringIO()
+        call_command('exportar', 'pedidos', '--filtro', 'estado=pendiente', stdout=salida)
+        lineas = salida.getvalue().splitlines()
+        self.assertEqual(len(lineas), 2)
+        self.assertTrue(lineas[1].startswith('PED-E0,'))
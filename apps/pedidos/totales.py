@@ -0,0 +1,268 @@
+"""Totales de carrito y pedidos agrupados por moneda.
+
+Las líneas se agrupan por la moneda en que está expresado su precio; cada grupo
+se suma en su moneda nativa (``Decimal`` exacto) y se convierte una sola vez con
+un ``TasasSnapshot``. El total convertido se redondea a centavos al final, de
+modo que no se acumulan errores de redondeo por línea.
+
+Este es el único camino de cálculo para carrito, checkout y confirmación.
+Al crear un pedido, ``congelar_totales`` guarda en el pedido y sus items la
+moneda, las tasas usadas y el total en cada moneda; a partir de ahí
+``totales_pedido`` no vuelve a consultar tasas.
+
+``Pedido.total`` es siempre ``Σ item.subtotal × item.tasa`` redondeado a
+centavos. ``recalcular_totales`` lo reaplica en un solo UPDATE (por ejemplo
+tras ``bulk_create``/``update()`` de items) y reescala ``totales_moneda``;
+``pedidos_descuadrados`` detecta los pedidos que no lo cumplen con una sola
+consulta agregada. Ambos redondean igual que ``cuantizar`` también en SQLite,
+donde la base de datos suma en coma flotante.
+"""
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import connections
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Abs, Coalesce, Round
+from django.utils import timezone
+
+
+CENTAVOS = Decimal('0.01')
+# Precisión con que se guarda ``ItemPedido.tasa``
+PRECISION_TASA = Decimal('0.0000000001')
+# Margen de ``pedidos_descuadrados`` sin decimal exacto (medio centavo más el error de la coma flotante)
+MEDIO_CENTAVO = Decimal('0.005000001')
+
+
+def cuantizar(monto):
+    """Redondea un monto a centavos (ROUND_HALF_UP)."""
+    return Decimal(monto).quantize(CENTAVOS, rounding=ROUND_HALF_UP)
+
+
+def calcular_totales(lineas, moneda_destino, tasas, simbolos=None):
+    """Suma ``lineas`` (pares ``(moneda, subtotal)``) por moneda y convierte cada grupo.
+
+    Retorna un dict con:
+      - ``moneda``: moneda destino.
+      - ``por_moneda``: lista de grupos ``{'moneda', 'simbolo', 'subtotal', 'tasa', 'convertido'}``
+        en orden de aparición.
+      - ``total_convertido``: suma de los grupos convertidos, redondeada a centavos.
+    """
+    simbolos = simbolos or {}
+    grupos = {}
+    for moneda, subtotal in lineas:
+        grupos[moneda] = grupos.get(moneda, Decimal('0.00')) + subtotal
+
+    por_moneda = []
+    total = Decimal('0.00')
+    for moneda, subtotal in grupos.items():
+        tasa = tasas.tasa(moneda, moneda_destino)
+        convertido = subtotal if moneda == moneda_destino else subtotal * tasa
+        total += convertido
+        por_moneda.append({
+            'moneda': moneda,
+            'simbolo': simbolos.get(moneda, moneda),
+            'subtotal': subtotal,
+            'tasa': tasa,
+            'convertido': convertido,
+        })
+
+    return {
+        'moneda': moneda_destino,
+        'por_moneda': por_moneda,
+        'total_convertido': cuantizar(total),
+    }
+
+
+def lineas_carrito(cart, productos, moneda_destino, tasas, simbolos=None):
+    """Construye las líneas del carrito para templates.
+
+    ``productos`` es un dict ``{id: Producto}`` ya cargado; los productos que no
+    estén en él se omiten.
+    """
+    simbolos = simbolos or {}
+    items = []
+    for pid, qty in cart:
+        producto = productos.get(pid)
+        if not producto:
+            continue
+        precio_convertido = producto.obtener_precio_en_moneda(moneda_destino, tasas=tasas)
+        items.append({
+            'producto': producto,
+            'cantidad': qty,
+            'simbolo': simbolos.get(producto.moneda_precio, producto.moneda_precio),
+            'subtotal': producto.precio * qty,
+            'precio_convertido': precio_convertido,
+            'subtotal_convertido': precio_convertido * qty,
+        })
+    return items
+
+
+def totales_items(items, moneda_destino, tasas, simbolos=None):
+    """Totales para las líneas construidas por ``lineas_carrito``."""
+    return calcular_totales(
+        ((it['producto'].moneda_precio, it['subtotal']) for it in items),
+        moneda_destino, tasas, simbolos,
+    )
+
+
+def fijar_tasa(item, moneda_pedido, tasas):
+    """Fija en ``item`` (sin guardarlo) su moneda, la del producto si falta, y la tasa a ``moneda_pedido``."""
+    if not item.moneda:
+        item.moneda = item.producto.moneda_precio
+    item.tasa = tasas.tasa(item.moneda, moneda_pedido).quantize(PRECISION_TASA, rounding=ROUND_HALF_UP)
+
+
+def congelar_totales(pedido, items, tasas, version=None, monedas=()):
+    """Fija en ``pedido`` e ``items`` (sin guardarlos) las tasas y totales del momento.
+
+    - Cada item guarda su moneda y la tasa de esa moneda a ``pedido.moneda``.
+    - ``pedido.total`` queda en ``pedido.moneda`` y ``pedido.totales_moneda``
+      con el total convertido a cada una de ``monedas``.
+    - ``version`` identifica el conjunto de tasas usado.
+    """
+    lineas = []
+    total = Decimal('0.00')
+    for item in items:
+        fijar_tasa(item, pedido.moneda, tasas)
+        subtotal = item.precio_unitario * item.cantidad
+        lineas.append((item.moneda, subtotal))
+        total += subtotal * item.tasa
+
+    # Igual que recalcular_totales: con la tasa guardada en cada item
+    pedido.total = cuantizar(total)
+    pedido.totales_moneda = {
+        moneda: calcular_totales(lineas, moneda, tasas)['total_convertido']
+        for moneda in monedas if moneda != pedido.moneda
+    }
+    pedido.version_tasas = version
+    return pedido.total
+
+
+def totales_pedido(pedido, moneda_destino, tasas=None, simbolos=None):
+    """Totales de un pedido existente con las tasas guardadas al crearlo.
+
+    Los items se agrupan por su moneda. Si el pedido no tiene guardado el total
+    en ``moneda_destino`` (pedidos anteriores al snapshot) se convierte con
+    ``tasas``; sin ``tasas`` se usa la moneda del pedido.
+    """
+    items = list(pedido.items.all())
+    total = pedido.total_en(moneda_destino)
+    if total is None:
+        if tasas is not None:
+            return calcular_totales(((it.moneda, it.subtotal) for it in items), moneda_destino, tasas, simbolos)
+        moneda_destino, total = pedido.moneda, pedido.total
+
+    simbolos = simbolos or {}
+    grupos = {}
+    for it in items:
+        grupo = grupos.setdefault(it.moneda, {
+            'moneda': it.moneda,
+            'simbolo': simbolos.get(it.moneda, it.moneda),
+            'subtotal': Decimal('0.00'),
+            'tasa': it.tasa if moneda_destino == pedido.moneda else None,
+            'convertido': Decimal('0.00') if moneda_destino == pedido.moneda else None,
+        })
+        grupo['subtotal'] += it.subtotal
+        if grupo['convertido'] is not None:
+            grupo['convertido'] += it.subtotal * it.tasa
+
+    return {
+        'moneda': moneda_destino,
+        'por_moneda': list(grupos.values()),
+        'total_convertido': cuantizar(total),
+    }
+
+
+def _exacto(queryset):
+    """Indica si la base de datos de ``queryset`` suma y redondea en decimal exacto.
+
+    PostgreSQL usa ``numeric`` (``ROUND`` redondea la mitad hacia arriba, como
+    ``cuantizar``); SQLite opera en coma flotante y una suma que cae en ,xx5
+    puede redondearse al centavo de abajo.
+    """
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+def _producto_items(prefijo=''):
+    producto = F(f'{prefijo}subtotal') * F(f'{prefijo}tasa')
+    return Sum(ExpressionWrapper(producto, output_field=DecimalField(max_digits=30, decimal_places=12)))
+
+
+def _suma_items(prefijo=''):
+    """``Σ subtotal × tasa`` redondeada a centavos; ``prefijo='items__'`` para agregar desde Pedido."""
+    return Round(_producto_items(prefijo), 2, output_field=DecimalField(max_digits=10, decimal_places=2))
+
+
+def _cero():
+    return Value(Decimal('0.00'), output_field=DecimalField(max_digits=10, decimal_places=2))
+
+
+def _recalcular_en_python(pks):
+    """Como el UPDATE de ``recalcular_totales``, sumando en ``Decimal`` (bases sin decimal exacto)."""
+    from .models import ItemPedido, Pedido
+    sumas = {}
+    items = ItemPedido.objects.filter(pedido__in=pks).values_list('pedido_id', 'subtotal', 'tasa').iterator()
+    for pedido_id, subtotal, tasa in items:
+        sumas[pedido_id] = sumas.get(pedido_id, Decimal('0.00')) + subtotal * tasa
+    ahora = timezone.now()
+    Pedido.objects.bulk_update(
+        [Pedido(pk=pk, total=cuantizar(sumas.get(pk, 0)), fecha_actualizacion=ahora) for pk in pks],
+        ['total', 'fecha_actualizacion'], batch_size=500,
+    )
+    return len(pks)
+
+
+def recalcular_totales(queryset):
+    """Recalcula ``total`` de los pedidos de ``queryset`` en un solo UPDATE. Retorna filas actualizadas.
+
+    ``totales_moneda`` se reescala con la tasa implícita guardada en el pedido
+    (``totales_moneda[m] / total`` anterior); si el total anterior era cero esa
+    tasa no se conoce y se vacía, de modo que ``total_en`` devuelve None. Fuera
+    de PostgreSQL la suma se hace en Python para redondear igual que ``cuantizar``.
+    """
+    from .models import ItemPedido, Pedido
+    previos = {
+        pk: (total, totales)
+        for pk, total, totales in queryset.order_by().values_list('pk', 'total', 'totales_moneda').iterator()
+    }
+    if _exacto(queryset):
+        suma = (
+            ItemPedido.objects
+            .filter(pedido=OuterRef('pk'))
+            .order_by()
+            .values('pedido')
+            .annotate(total=_suma_items())
+            .values('total')
+        )
+        # fecha_actualizacion invalida facturas cacheadas y marca el día para los resúmenes
+        filas = queryset.order_by().update(total=Coalesce(Subquery(suma), _cero()), fecha_actualizacion=timezone.now())
+    else:
+        filas = _recalcular_en_python(list(previos))
+
+    con_totales = [pk for pk, (_, totales) in previos.items() if totales]
+    cambios = []
+    for pk, total in Pedido.objects.filter(pk__in=con_totales).values_list('pk', 'total').iterator():
+        anterior, totales = previos[pk]
+        if total == anterior:
+            continue
+        totales = {
+            moneda: cuantizar(total * Decimal(valor) / anterior) for moneda, valor in totales.items()
+        } if anterior else {}
+        cambios.append(Pedido(pk=pk, totales_moneda=totales))
+    Pedido.objects.bulk_update(cambios, ['totales_moneda'], batch_size=500)
+    return filas
+
+
+def pedidos_descuadrados(queryset):
+    """Pedidos cuyo ``total`` no coincide con sus items, anotados con ``total_calculado``.
+
+    Sin decimal exacto se compara con la suma sin redondear: un total bien
+    redondeado nunca se aleja de ella más de medio centavo, así que la coma
+    flotante no marca como descuadrados pedidos correctos.
+    """
+    queryset = queryset.annotate(total_calculado=Coalesce(_suma_items('items__'), _cero()))
+    if _exacto(queryset):
+        return queryset.exclude(total=F('total_calculado'))
+    return queryset.annotate(
+        diferencia=Abs(F('total') - Coalesce(_producto_items('items__'), _cero())),
+    ).filter(diferencia__gt=MEDIO_CENTAVO)
@@ -0,0 +1,180 @@
+"""Resúmenes diarios de ventas mantenidos de forma incremental.
+
+``VentaDiaria`` (día × categoría × método de pago × estado × moneda) y
+``ResumenPedidosDiario`` (día × método de pago × estado × moneda) se recalculan por día
+completo: se borran las filas de los días afectados y se insertan de nuevo con
+una agregación agrupada, así que recalcular es idempotente.
+
+Los días afectados son los de creación de los pedidos cuya
+``fecha_actualizacion`` es posterior a la marca de agua (``MarcaResumen``).
+Cambios de estado e items actualizan esa fecha (ver ``pedidos.estados`` y
+``pedidos.signals``). Los pedidos borrados no dejan rastro: para reflejarlos
+hay que recalcular el rango con ``desde``/``hasta``.
+
+El dashboard del admin solo lee estas tablas y cachea el resultado con la marca
+de agua en la clave, de modo que se invalida solo al correr la actualización.
+"""
+
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ItemPedido, MarcaResumen, Pedido, ResumenPedidosDiario, VentaDiaria
+
+
+MARCA = 'ventas'
+CACHE_TIMEOUT = 60 * 60
+
+
+def marca_actual():
+    return MarcaResumen.objects.filter(nombre=MARCA).values_list('procesado_hasta', flat=True).first()
+
+
+def dias_afectados(desde=None):
+    """Días de creación de los pedidos modificados después de ``desde`` (todos si es None)."""
+    pedidos = Pedido.objects.all()
+    if desde is not None:
+        pedidos = pedidos.filter(fecha_actualizacion__gt=desde)
+    return set(
+        pedidos.order_by()
+        .annotate(dia=TruncDate('fecha_creacion'))
+        .values_list('dia', flat=True)
+        .distinct()
+    )
+
+
+def rango_dias(inicio, fin):
+    return {inicio + timedelta(days=n) for n in range((fin - inicio).days + 1)}
+
+
+def recalcular_dias(dias):
+    """Reconstruye los resúmenes de ``dias``. Retorna el número de filas insertadas."""
+    dias = sorted(dias)
+    if not dias:
+        return 0
+
+    items = (
+        ItemPedido.objects
+        .filter(pedido__fecha_creacion__date__in=dias)
+        .annotate(dia=TruncDate('pedido__fecha_creacion'))
+        .values('dia', 'producto__categoria', 'pedido__metodo_pago', 'pedido__estado', 'moneda')
+        .annotate(ingresos=Sum('subtotal'), unidades=Sum('cantidad'), pedidos=Count('pedido', distinct=True))
+        .order_by()
+    )
+    ventas = [
+        VentaDiaria(
+            fecha=fila['dia'], categoria_id=fila['producto__categoria'],
+            metodo_pago=fila['pedido__metodo_pago'], estado=fila['pedido__estado'],
+            moneda=fila['moneda'], ingresos=fila['ingresos'] or 0,
+            unidades=fila['unidades'] or 0, pedidos=fila['pedidos'],
+        )
+        for fila in items
+    ]
+
+    pedidos = (
+        Pedido.objects
+        .filter(fecha_creacion__date__in=dias)
+        .annotate(dia=TruncDate('fecha_creacion'))
+        .values('dia', 'metodo_pago', 'estado', 'moneda')
+        .annotate(pedidos=Count('pk'), total=Sum('total'))
+        .order_by()
+    )
+    resumenes = [
+        ResumenPedidosDiario(
+            fecha=fila['dia'], metodo_pago=fila['metodo_pago'], estado=fila['estado'],
+            moneda=fila['moneda'], pedidos=fila['pedidos'], total=fila['total'] or 0,
+        )
+        for fila in pedidos
+    ]
+
+    with transaction.atomic():
+        VentaDiaria.objects.filter(fecha__in=dias).delete()
+        ResumenPedidosDiario.objects.filter(fecha__in=dias).delete()
+        VentaDiaria.objects.bulk_create(ventas, batch_size=1000)
+        ResumenPedidosDiario.objects.bulk_create(resumenes, batch_size=1000)
+    return len(ventas) + len(resumenes)
+
+
+def actualizar_resumenes(desde=None, hasta=None, completo=False):
+    """Recalcula los días pendientes desde la marca de agua y la avanza.
+
+    ``desde``/``hasta`` (fechas) fuerzan además el recálculo de ese rango;
+    ``completo`` recalcula todos los días con pedidos.
+    Retorna ``(dias_recalculados, filas_insertadas)``.
+    """
+    # La nueva marca se toma antes de leer: lo modificado durante el recálculo queda pendiente
+    ahora = timezone.now()
+    marca = None if completo else marca_actual()
+    dias = dias_afectados(marca)
+    if desde or hasta:
+        hoy = timezone.localdate()
+        dias |= rango_dias(desde or hasta, hasta or hoy)
+    if completo:
+        dias |= set(VentaDiaria.objects.values_list('fecha', flat=True).distinct())
+        dias |= set(ResumenPedidosDiario.objects.values_list('fecha', flat=True).distinct())
+
+    filas = recalcular_dias(dias)
+    MarcaResumen.objects.update_or_create(nombre=MARCA, defaults={'procesado_hasta': ahora})
+    return len(dias), filas
+
+
+def _agrupar(filas, claves, campos):
+    resultado = {}
+    for fila in filas:
+        grupo = resultado.setdefault(tuple(fila[clave] for clave in claves), dict.fromkeys(campos, 0))
+        for campo in campos:
+            grupo[campo] += fila[campo] or 0
+    return resultado
+
+
+def resumen_dashboard(inicio, fin):
+    """Datos del dashboard entre las fechas ``inicio`` y ``fin`` (inclusive), solo desde los resúmenes."""
+    marca = marca_actual()
+    clave = f'pedidos:dashboard:{marca.timestamp() if marca else 0}:{inicio}:{fin}'
+    datos = cache.get(clave)
+    if datos is not None:
+        return datos
+
+    ventas = VentaDiaria.objects.filter(fecha__range=(inicio, fin)).order_by()
+    resumenes = ResumenPedidosDiario.objects.filter(fecha__range=(inicio, fin)).order_by()
+
+    por_categoria = list(
+        ventas.values('categoria__nombre', 'moneda')
+        .annotate(ingresos=Sum('ingresos'), unidades=Sum('unidades'))
+        .order_by('-ingresos')
+    )
+    ingresos_por_moneda = list(
+        ventas.values('moneda').annotate(ingresos=Sum('ingresos'), unidades=Sum('unidades')).order_by('moneda')
+    )
+    filas_pedidos = list(resumenes.values('fecha', 'metodo_pago', 'estado', 'moneda', 'pedidos', 'total'))
+
+    # Los totales de pedidos en monedas distintas no se suman entre sí
+    metodos = dict(Pedido.METODOS_PAGO)
+    estados = dict(Pedido.ESTADOS)
+    campos = ('pedidos', 'total')
+    por_moneda = _agrupar(filas_pedidos, ('moneda',), campos)
+    por_metodo = _agrupar(filas_pedidos, ('metodo_pago', 'moneda'), campos)
+    por_estado = _agrupar(filas_pedidos, ('estado', 'moneda'), campos)
+    por_dia = _agrupar(filas_pedidos, ('fecha', 'moneda'), campos)
+
+    datos = {
+        'inicio': inicio,
+        'fin': fin,
+        'actualizado': marca,
+        'pedidos': sum(f['pedidos'] for f in filas_pedidos),
+        'totales_por_moneda': [{'moneda': m, **v} for (m,), v in sorted(por_moneda.items())],
+        'ingresos_por_moneda': ingresos_por_moneda,
+        'por_categoria': por_categoria,
+        'por_metodo': [
+            {'nombre': metodos.get(k, k), 'moneda': m, **v}
+            for (k, m), v in sorted(por_metodo.items(), key=lambda kv: (kv[0][1], -kv[1]['total']))
+        ],
+        'por_estado': [{'nombre': estados.get(k, k), 'moneda': m, **v} for (k, m), v in por_estado.items()],
+        'por_dia': [{'fecha': k, 'moneda': m, **v} for (k, m), v in sorted(por_dia.items())],
+    }
+    cache.set(clave, datos, CACHE_TIMEOUT)
+    return datos
@@ -2,55 +2,105 @@ from decimal import Decimal
 
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.views.decorators.http import require_POST
 
 from catalogo.models import Producto
-from core.models import ConfiguracionMoneda, TasaCambio
-from .models import ItemPedido, Pedido, Carrito
+from core import metricas
+from core.models import ConfiguracionMoneda, TasaCambio, TasasSnapshot
+from .cart import Cart
+from .models import ItemPedido, Pedido
+from .totales import congelar_totales, lineas_carrito, totales_items, totales_pedido
 
 
-def _get_cart(session):
-    cart = session.get('cart')
-    if cart is None or not isinstance(cart, dict):
-        cart = {}
-        session['cart'] = cart
-    return cart
+def _wants_json(request):
+    return 'application/json' in request.headers.get('Accept', '')
 
 
-def carrito_ver(request):
-    cart = _get_cart(request.session)
-    items = []
-    total = Decimal('0.00')
+def _wants_fragment(request):
+    return request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+
+
+def _cart_context(request, solo_activos=False):
+    """Líneas y totales del carrito actual para templates y respuestas JSON."""
+    cart = Cart.for_request(request)
     config = ConfiguracionMoneda.obtener_configuracion()
     moneda_actual = request.session.get('moneda', config.moneda_principal)
+    simbolos = config.simbolos
 
+    items = []
+    tasas = TasasSnapshot({})
     if cart:
-        ids = [int(pid) for pid in cart.keys()]
-        productos = {p.id: p for p in Producto.objects.filter(id__in=ids)}
-        for str_id, qty in cart.items():
-            pid = int(str_id)
-            producto = productos.get(pid)
-            if not producto:
-                continue
-            qty = int(qty)
-            subtotal = producto.precio * qty
-            total += subtotal
-            precio_convertido = producto.obtener_precio_en_moneda(moneda_actual)
-            items.append({
-                'producto': producto,
-                'cantidad': qty,
-                'subtotal': subtotal,
-                'precio_convertido': precio_convertido,
-                'subtotal_convertido': precio_convertido * qty,
-            })
-
-    total_convertido = sum([i['subtotal_convertido'] for i in items]) if items else Decimal('0.00')
-    return render(request, 'pedidos/carrito.html', {
+        productos_qs = Producto.objects.filter(id__in=cart.product_ids).select_related('categoria')
+        if solo_activos:
+            productos_qs = productos_qs.filter(activo=True)
+        productos = {p.id: p for p in productos_qs}
+        tasas = TasaCambio.snapshot()
+        items = lineas_carrito(cart, productos, moneda_actual, tasas, simbolos)
+
+    totales = totales_items(items, moneda_actual, tasas, simbolos)
+    return {
         'items': items,
-        'total': total,
-        'total_convertido': total_convertido,
-    })
+        'totales': totales,
+        'total_convertido': totales['total_convertido'],
+        'moneda_actual': moneda_actual,
+        'simbolo_moneda': simbolos.get(moneda_actual, moneda_actual),
+        'tasas': tasas,
+        'config': config,
+    }
+
+
+def _money(value):
+    return str(Decimal(value).quantize(Decimal('0.01')))
+
+
+def _cart_payload(request, ok=True):
+    ctx = _cart_context(request)
+    return {
+        'ok': ok,
+        'cart_count': Cart.for_request(request).count,
+        'moneda': ctx['moneda_actual'],
+        'simbolo': ctx['simbolo_moneda'],
+        'items': [
+            {
+                'product_id': it['producto'].id,
+                'cantidad': it['cantidad'],
+                'moneda': it['producto'].moneda_precio,
+                'subtotal': _money(it['subtotal']),
+                'subtotal_convertido': _money(it['subtotal_convertido']),
+            }
+            for it in ctx['items']
+        ],
+        'totales_por_moneda': [
+            {'moneda': g['moneda'], 'subtotal': _money(g['subtotal']), 'convertido': _money(g['convertido'])}
+            for g in ctx['totales']['por_moneda']
+        ],
+        'total_convertido': _money(ctx['total_convertido']),
+        'messages': [{'level': m.tags, 'text': str(m)} for m in messages.get_messages(request)],
+    }
+
+
+def _cart_response(request, fallback, ok=True):
+    """Responde a una mutación del carrito según lo que pida el cliente.
+
+    - ``Accept: application/json``: payload compacto con líneas, totales y contador.
+    - ``X-Requested-With: XMLHttpRequest``: fragmento HTML del carrito.
+    - Sin JS: redirect como siempre.
+    """
+    if _wants_json(request):
+        return JsonResponse(_cart_payload(request, ok), status=200 if ok else 400)
+    if _wants_fragment(request):
+        ctx = _cart_context(request)
+        ctx['parcial'] = True
+        response = render(request, 'pedidos/_carrito_contenido.html', ctx)
+        response['X-Cart-Count'] = str(Cart.for_request(request).count)
+        return response
+    return redirect(fallback)
+
+
+def carrito_ver(request):
+    return render(request, 'pedidos/carrito.html', _cart_context(request))
 
 
 @require_POST
@@ -62,194 +112,141 @@ def carrito_agregar(request):
         quantity = max(1, int(quantity))
     except Exception:
         messages.error(request, 'Producto inválido.')
-        return redirect(request.META.get('HTTP_REFERER', 'core:index'))
-
-    cart = _get_cart(request.session)
-    current = int(cart.get(str(product_id), 0))
-    nuevo_total = current + quantity
-
-    # Validar stock
-    if producto.stock is not None and nuevo_total > producto.stock:
-        cart[str(product_id)] = producto.stock
-        request.session.modified = True
-        # Sincronizar DB si autenticado
-        if request.user.is_authenticated:
-            item, _ = Carrito.objects.get_or_create(usuario=request.user, producto=producto)
-            item.cantidad = producto.stock
-            item.save(update_fields=['cantidad'])
-        messages.warning(request, f'Solo hay {producto.stock} unidades disponibles de {producto.nombre}.')
-        return redirect(request.META.get('HTTP_REFERER', 'pedidos:carrito_ver'))
+        return _cart_response(request, request.META.get('HTTP_REFERER', 'core:index'), ok=False)
 
-    cart[str(product_id)] = nuevo_total
-    request.session.modified = True
-    # Sincronizar DB si autenticado
-    if request.user.is_authenticated:
-        item, created = Carrito.objects.get_or_create(usuario=request.user, producto=producto)
-        item.cantidad = nuevo_total
-        item.save(update_fields=['cantidad'])
-    messages.success(request, f'Se añadió {producto.nombre} al carrito.')
-    return redirect(request.META.get('HTTP_REFERER', 'pedidos:carrito_ver'))
+    cart = Cart.for_request(request)
+    cantidad, ajustada = cart.add(producto, quantity)
+    if ajustada:
+        messages.warning(request, f'Solo hay {producto.stock} unidades disponibles de {producto.nombre}.')
+    else:
+        messages.success(request, f'Se añadió {producto.nombre} al carrito.')
+    return _cart_response(request, request.META.get('HTTP_REFERER', 'pedidos:carrito_ver'))
 
 
 @require_POST
 def carrito_actualizar(request):
     product_id = request.POST.get('product_id')
     quantity = request.POST.get('quantity', '1')
-    cart = _get_cart(request.session)
+    cart = Cart.for_request(request)
     if product_id in cart:
         try:
             producto = Producto.objects.get(id=int(product_id), activo=True)
-        except Producto.DoesNotExist:
+        except (Producto.DoesNotExist, ValueError):
             # Producto no válido: eliminar del carrito si existe
-            cart.pop(product_id, None)
-            request.session.modified = True
+            cart.remove(product_id)
             messages.error(request, 'Producto no encontrado.')
-            return redirect('pedidos:carrito_ver')
-
-        qty = max(0, int(quantity))
-        # Si qty es 0, eliminar
-        if qty == 0:
-            cart.pop(product_id, None)
-            if request.user.is_authenticated:
-                Carrito.objects.filter(usuario=request.user, producto_id=int(product_id)).delete()
-            request.session.modified = True
-            return redirect('pedidos:carrito_ver')
-
-        # Validar stock disponible
-        if producto.stock is not None and qty > producto.stock:
-            # Ajustar al stock disponible
-            cart[product_id] = producto.stock
-            request.session.modified = True
-            if request.user.is_authenticated:
-                Carrito.objects.update_or_create(
-                    usuario=request.user, producto=producto, defaults={'cantidad': producto.stock}
-                )
-            messages.warning(request, f'Solo hay {producto.stock} unidades disponibles de {producto.nombre}. Se ajustó la cantidad en tu carrito.')
-            return redirect('pedidos:carrito_ver')
+            return _cart_response(request, 'pedidos:carrito_ver', ok=False)
 
-        # Cantidad válida
-        cart[product_id] = qty
-        if request.user.is_authenticated:
-            Carrito.objects.update_or_create(
-                usuario=request.user, producto_id=int(product_id), defaults={'cantidad': qty}
-            )
-        request.session.modified = True
-    return redirect('pedidos:carrito_ver')
+        try:
+            qty = max(0, int(quantity))
+        except (TypeError, ValueError):
+            return _cart_response(request, 'pedidos:carrito_ver', ok=False)
+
+        # Si qty es 0 se elimina; si supera el stock se ajusta al disponible
+        cantidad, ajustada = cart.set(producto, qty)
+        if ajustada:
+            messages.warning(request, f'Solo hay {producto.stock} unidades disponibles de {producto.nombre}. Se ajustó la cantidad en tu carrito.')
+    return _cart_response(request, 'pedidos:carrito_ver')
 
 
 @require_POST
 def carrito_eliminar(request):
     product_id = request.POST.get('product_id')
-    cart = _get_cart(request.session)
-    cart.pop(product_id, None)
-    request.session.modified = True
-    if request.user.is_authenticated:
-        try:
-            Carrito.objects.filter(usuario=request.user, producto_id=int(product_id)).delete()
-        except Exception:
-            pass
-    return redirect('pedidos:carrito_ver')
+    Cart.for_request(request).remove(product_id)
+    return _cart_response(request, 'pedidos:carrito_ver')
 
 
 @require_POST
 def carrito_limpiar(request):
-    request.session['cart'] = {}
-    request.session.modified = True
-    if request.user.is_authenticated:
-        Carrito.objects.filter(usuario=request.user).delete()
-    return redirect('pedidos:carrito_ver')
+    Cart.for_request(request).clear()
+    return _cart_response(request, 'pedidos:carrito_ver')
+
+
+def _crear_pedido(request, ctx, datos, comprobante=None):
+    """Crea el pedido y sus items desde el carrito, y descuenta el stock."""
+    # El pedido guarda su moneda, la versión de tasas y los totales convertidos
+    config = ctx['config']
+    pedido = Pedido(usuario=request.user, moneda=config.moneda_principal, **datos)
+    lineas = [
+        ItemPedido(
+            producto=it['producto'],
+            cantidad=it['cantidad'],
+            precio_unitario=it['producto'].precio,
+            moneda=it['producto'].moneda_precio,
+        )
+        for it in ctx['items']
+    ]
+    monedas = [codigo for codigo, _ in ConfiguracionMoneda.MONEDAS_DISPONIBLES]
+    congelar_totales(pedido, lineas, ctx['tasas'], version=config.version_tasas, monedas=monedas)
+    if comprobante:
+        pedido.comprobante_pago = comprobante
+    pedido.save()
+
+    # El subtotal lo calcula la base de datos, así que bulk_create es seguro
+    for item in lineas:
+        item.pedido = pedido
+    ItemPedido.objects.bulk_create(lineas)
+    cantidades = {}
+    for item in lineas:
+        cantidades[item.producto_id] = cantidades.get(item.producto_id, 0) + item.cantidad
+    try:
+        Producto.reducir_stock_en_lote(cantidades)
+    except Exception:
+        pass
+    return pedido
 
 
 @login_required
 def checkout(request):
-    cart = _get_cart(request.session)
+    cart = Cart.for_request(request)
     if not cart:
         messages.info(request, 'Tu carrito está vacío.')
         return redirect('catalogo:productos_lista')
 
-    # Recalcular items y total
-    items = []
-    total = Decimal('0.00')
-    ids = [int(pid) for pid in cart.keys()]
-    productos = {p.id: p for p in Producto.objects.filter(id__in=ids, activo=True)}
-    for str_id, qty in cart.items():
-        pid = int(str_id)
-        producto = productos.get(pid)
-        if not producto:
-            continue
-        qty = max(1, int(qty))
-        subtotal = producto.precio * qty
-        total += subtotal
-        items.append({'producto': producto, 'cantidad': qty, 'subtotal': subtotal})
+    # Recalcular items y totales por moneda con una sola lectura de tasas
+    ctx = _cart_context(request, solo_activos=True)
 
     if request.method == 'POST':
         direccion = request.POST.get('direccion_entrega', '').strip()
         telefono = request.POST.get('telefono_contacto', '').strip()
-        metodo_pago = request.POST.get('metodo_pago', 'efectivo')
-        notas_pago = request.POST.get('notas_pago', '')
-        comprobante = request.FILES.get('comprobante_pago')
 
         if not direccion or not telefono:
+            metricas.registrar_evento('checkout', 'invalido')
             messages.error(request, 'Dirección de entrega y teléfono son obligatorios.')
-            return render(request, 'pedidos/checkout.html', {
-                'items': items,
-                'total': total,
+            ctx.update({
                 'direccion_entrega': direccion,
                 'telefono_contacto': telefono,
             })
+            return render(request, 'pedidos/checkout.html', ctx)
+
+        datos = {
+            'metodo_pago': request.POST.get('metodo_pago', 'efectivo'),
+            'notas_pago': request.POST.get('notas_pago', ''),
+            'direccion_entrega': direccion,
+            'telefono_contacto': telefono,
+        }
+        try:
+            pedido = _crear_pedido(request, ctx, datos, request.FILES.get('comprobante_pago'))
+        except Exception:
+            metricas.registrar_evento('checkout', 'error')
+            raise
+        metricas.registrar_evento('checkout', 'ok')
 
-        pedido = Pedido.objects.create(
-            usuario=request.user,
-            total=total,
-            metodo_pago=metodo_pago,
-            notas_pago=notas_pago,
-            direccion_entrega=direccion,
-            telefono_contacto=telefono,
-        )
-        if comprobante:
-            pedido.comprobante_pago = comprobante
-            pedido.save(update_fields=['comprobante_pago'])
-
-        for it in items:
-            producto = it['producto']
-            cantidad = it['cantidad']
-            ItemPedido.objects.create(
-                pedido=pedido,
-                producto=producto,
-                cantidad=cantidad,
-                precio_unitario=producto.precio,
-                subtotal=producto.precio * cantidad,
-            )
-            try:
-                producto.reducir_stock(cantidad)
-            except Exception:
-                pass
-
-        request.session['cart'] = {}
-        request.session.modified = True
+        cart.clear()
         return redirect('pedidos:pedido_confirmacion', numero_pedido=pedido.numero_pedido)
 
-    # Calcular equivalente en moneda seleccionada
-    config = ConfiguracionMoneda.obtener_configuracion()
-    moneda_actual = request.session.get('moneda', config.moneda_principal)
-    total_convertido = total
-    try:
-        if items:
-            moneda_origen = items[0]['producto'].moneda_precio
-            if moneda_origen != moneda_actual:
-                tasa = TasaCambio.obtener_tasa(moneda_origen, moneda_actual)
-                total_convertido = total * tasa
-    except Exception:
-        total_convertido = total
-
-    return render(request, 'pedidos/checkout.html', {
-        'items': items,
-        'total': total,
-        'total_convertido': total_convertido,
-    })
+    return render(request, 'pedidos/checkout.html', ctx)
 
 
 @login_required
 def pedido_confirmacion(request, numero_pedido):
     pedido = get_object_or_404(Pedido, numero_pedido=numero_pedido, usuario=request.user)
-    return render(request, 'pedidos/confirmacion.html', {'pedido': pedido})
+    config = ConfiguracionMoneda.obtener_configuracion()
+    moneda_actual = request.session.get('moneda', config.moneda_principal)
+    # Sin consultar tasas: el pedido tiene sus totales por moneda del momento de la compra
+    totales = totales_pedido(pedido, moneda_actual, simbolos=config.simbolos)
+    return render(request, 'pedidos/confirmacion.html', {
+        'pedido': pedido,
+        'totales': totales,
+        'simbolo_total': config.simbolos.get(totales['moneda'], totales['moneda']),
+    })
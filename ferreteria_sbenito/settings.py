@@ -56,6 +56,12 @@ JAZZMIN_SETTINGS = {'site_title': 'San Benito Admin','site_header': 'FerreterÃ
 
 
 MIDDLEWARE = [
+    # Cabecera Server-Timing por request (solo si SERVER_TIMING está activo)
+    'core.middleware.ServerTimingMiddleware',
+    # Métricas por vista para core:metricas (solo si METRICAS está activo)
+    'core.middleware.MetricasMiddleware',
+    # Vista asociada a cada consulta lenta (solo si CONSULTAS_LENTAS_MS > 0)
+    'core.middleware.ConsultasLentasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     # Localización: traducir la interfaz (admin y otros) según LANGUAGE_CODE
@@ -64,6 +70,10 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Perfil cProfile bajo demanda para staff (solo si PERFILADOR_CLAVE está definida)
+    'core.middleware.PerfiladorMiddleware',
+    # Persiste el carrito en DB una sola vez al final del request
+    'pedidos.middleware.CartMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -188,6 +198,11 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 # Media files (user uploads)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Facturas PDF cacheadas por versión de pedido (relativo a MEDIA_ROOT)
+FACTURAS_DIR = 'facturas'
+# Directorio local con las imágenes que referencia la columna "imagen" al
+# importar productos desde el admin (ver catalogo.importar). Vacío: sin imágenes
+IMPORTACION_IMAGENES_DIR = os.environ.get('IMPORTACION_IMAGENES_DIR', '')
 
 # Business contact
 # WhatsApp in international format digits only (no +, no spaces)
@@ -196,6 +211,27 @@ WHATSAPP_PHONE = '584127715553'
 # Maps (used in Ubicación page)
 MAPS_QUERY = 'Junco Páramo parte alta, referencia subiendo por la escuela Baldomera Jara, San Benito, Venezuela'
 
+# Perfil por request en la cabecera Server-Timing (ver core.middleware.ServerTimingMiddleware)
+SERVER_TIMING = os.environ.get('SERVER_TIMING') == '1'
+
+# Métricas en formato Prometheus en /metricas/ (ver core.metricas). Cada worker
+# escribe su archivo en METRICAS_DIR (vaciarlo en cada despliegue); METRICAS_TOKEN
+# permite leerlas sin sesión
+METRICAS = os.environ.get('METRICAS') == '1'
+METRICAS_DIR = os.environ.get('METRICAS_DIR', '')
+METRICAS_TOKEN = os.environ.get('METRICAS_TOKEN', '')
+
+# Registro de consultas lentas con su EXPLAIN (ver core.consultas_lentas). 0 lo
+# desactiva; CONSULTAS_LENTAS_ANALYZE=1 usa EXPLAIN ANALYZE en PostgreSQL
+CONSULTAS_LENTAS_MS = float(os.environ.get('CONSULTAS_LENTAS_MS', '0') or 0)
+CONSULTAS_LENTAS_ANALYZE = os.environ.get('CONSULTAS_LENTAS_ANALYZE') == '1'
+CONSULTAS_LENTAS_ARCHIVO = os.environ.get('CONSULTAS_LENTAS_ARCHIVO', str(BASE_DIR / 'logs' / 'consultas_lentas.log'))
+
+# Perfil cProfile de un request de staff con la cabecera X-Perfilar o ?perfilar=
+# igual a PERFILADOR_CLAVE (ver core.perfilador). Vacía lo desactiva
+PERFILADOR_CLAVE = os.environ.get('PERFILADOR_CLAVE', '')
+PERFILADOR_DIR = os.environ.get('PERFILADOR_DIR', str(BASE_DIR / 'logs' / 'perfiles'))
+
 # Split sessions: admin y sitio
 ADMIN_URL_PREFIX = '/admin/'
 ADMIN_SESSION_COOKIE_NAME = 'admin_sessionid'
@@ -0,0 +1,77 @@
+// Envío asíncrono de los formularios del carrito (data-cart-form).
+// Sin JS los formularios siguen funcionando con el redirect normal.
+document.addEventListener('DOMContentLoaded', function() {
+  if (!window.fetch || !window.FormData) return;
+
+  function actualizarBadges(count) {
+    if (count === null || count === undefined) return;
+    document.querySelectorAll('[data-cart-count]').forEach(function(el) {
+      el.textContent = count;
+    });
+  }
+
+  function mostrarMensajes(mensajes) {
+    if (!mensajes || !mensajes.length) return;
+    var box = document.getElementById('cart-toast');
+    if (!box) {
+      box = document.createElement('div');
+      box.id = 'cart-toast';
+      box.className = 'fixed bottom-4 right-4 z-50 space-y-2';
+      document.body.appendChild(box);
+    }
+    mensajes.forEach(function(m) {
+      var item = document.createElement('div');
+      var error = m.level && (m.level.indexOf('error') !== -1 || m.level.indexOf('warning') !== -1);
+      item.className = error
+        ? 'rounded-xl border border-danger/30 bg-white p-3 text-sm text-danger shadow-card'
+        : 'rounded-xl border border-base-border bg-white px-4 py-2 text-sm text-base-fg shadow-card';
+      item.textContent = m.text;
+      box.appendChild(item);
+      setTimeout(function() { item.remove(); }, 4000);
+    });
+  }
+
+  document.addEventListener('submit', function(e) {
+    var form = e.target;
+    if (!form.matches || !form.matches('form[data-cart-form]')) return;
+    e.preventDefault();
+
+    var contenedor = document.getElementById('carrito-contenido');
+    var parcial = contenedor && contenedor.contains(form);
+    var headers = {'X-Requested-With': 'XMLHttpRequest'};
+    headers['Accept'] = parcial ? 'text/html' : 'application/json';
+
+    fetch(form.action, {
+      method: 'POST',
+      body: new FormData(form),
+      headers: headers,
+      credentials: 'same-origin'
+    }).then(function(resp) {
+      // 400 trae los mensajes de validación; otro error HTTP: la petición no se
+      // procesó, así que se repite con el envío tradicional
+      if (!resp.ok && resp.status !== 400) {
+        console.error('cart.js', 'HTTP ' + resp.status);
+        form.submit();
+        return;
+      }
+      var procesar = parcial
+        ? resp.text().then(function(html) {
+            actualizarBadges(resp.headers.get('X-Cart-Count'));
+            contenedor.innerHTML = html;
+          })
+        : resp.json().then(function(data) {
+            actualizarBadges(data.cart_count);
+            mostrarMensajes(data.messages);
+          });
+      return procesar.catch(function(err) {
+        // El servidor ya aplicó el cambio: reenviar el formulario lo duplicaría
+        console.error('cart.js', err);
+        mostrarMensajes([{level: 'error', text: 'No se pudo actualizar la página. Recárgala para ver tu carrito.'}]);
+      });
+    }, function(err) {
+      // Sin respuesta del servidor (error de red): volver al envío tradicional
+      console.error('cart.js', err);
+      form.submit();
+    });
+  });
+});